@@ -0,0 +1,107 @@
+# =============================
+# bench/bench_downloader.py
+# =============================
+"""
+Mide el ciclo de descarga de DescargadorFacturas contra un buzón simulado
+(bench/fake_outlook.py), sin Outlook ni Windows.
+
+Uso (desde facret/):
+    poetry run python bench/bench_downloader.py --messages 20000
+    poetry run python bench/bench_downloader.py --messages 20000 --latency-us 0 50 200
+
+Para cada latencia por llamada COM hace una corrida completa y luego una
+incremental con --new correos nuevos (usa la marca de agua de la primera), y
+reporta mensajes/s, adjuntos/s y la cantidad de llamadas COM del ciclo; la latencia real de Outlook vía COM
+fuera de proceso suele estar en decenas o cientos de µs por llamada.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_outlook import DEFAULT_FOLDER, DEFAULT_SENDER, FakeOutlook   # noqa: E402
+from logic import facs_downloader                                     # noqa: E402
+from logic.mail_sources import ENUMERATIONS, OutlookSource            # noqa: E402
+
+
+def _quiet(_msg: str):
+    pass
+
+
+def bench_download(outlook: FakeOutlook, messages: int, work: str, enumeration: str) -> dict:
+    """Una corrida de descarga; work conserva destino y estado entre corridas."""
+    dest = os.path.join(work, "descargas")
+    descargador = facs_downloader.DescargadorFacturas(
+        log_callback=_quiet, state_path=os.path.join(work, "downloads.sqlite"),
+        source=OutlookSource(outlook, enumeration=enumeration),
+    )
+    outlook.reset_calls()
+    t0 = time.perf_counter()
+    saved = descargador.descargar_facturas_etapa(DEFAULT_FOLDER, dest, DEFAULT_SENDER)
+    elapsed = time.perf_counter() - t0
+    return {
+        "seconds":       round(elapsed, 4),
+        "messages":      messages,
+        "attachments":   saved,
+        "com_calls":     outlook.calls,
+        "messages_per_s":    round(messages / elapsed, 1),
+        "attachments_per_s": round(saved / elapsed, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=20_000)
+    ap.add_argument("--latency-us", type=float, nargs="*", default=[0.0, 50.0],
+                    help="latencia simulada por llamada COM, en µs")
+    ap.add_argument("--enum", nargs="*", choices=ENUMERATIONS,
+                    default=list(ENUMERATIONS), help="formas de enumerar a comparar")
+    ap.add_argument("--sender-ratio", type=float, default=0.9)
+    ap.add_argument("--attachment-bytes", type=int, default=4_096)
+    ap.add_argument("--new", type=int, default=100,
+                    help="correos nuevos para la segunda corrida (sincronización incremental)")
+    ap.add_argument("--out", help="guardar resultados en JSON")
+    args = ap.parse_args()
+
+    # El resumen del dashboard se guarda en el almacén real; en el benchmark no.
+    facs_downloader.record_download = lambda *a, **k: None
+
+    print(f"Buzón simulado: {args.messages} mensajes en {DEFAULT_FOLDER}")
+    results = []
+    for latency_us in args.latency_us:
+        for enumeration in args.enum:
+            outlook = FakeOutlook.generate(
+                messages=args.messages, sender_ratio=args.sender_ratio,
+                attachment_bytes=args.attachment_bytes, latency=latency_us / 1e6,
+            )
+            work = tempfile.mkdtemp(prefix="facret_dl_")
+            try:
+                full = bench_download(outlook, args.messages, work, enumeration)
+                outlook.latency = 0.0
+                outlook.add_mail(args.new, sender_ratio=args.sender_ratio, attachment_bytes=args.attachment_bytes)
+                outlook.latency = latency_us / 1e6
+                incremental = bench_download(outlook, args.new, work, enumeration)
+            finally:
+                shutil.rmtree(work, ignore_errors=True)
+            for label, r in (("completa", full), (f"+{args.new} nuevos", incremental)):
+                r.update(latency_us=latency_us, run=label, enumeration=enumeration)
+                results.append(r)
+                print(
+                    f"  {enumeration:<5} latencia {latency_us:7.1f} µs  {label:<13} {r['seconds']:8.2f} s  "
+                    f"{r['messages_per_s']:9.0f} msg/s  {r['attachments_per_s']:9.0f} adj/s  "
+                    f"{r['com_calls']:>9} llamadas COM"
+                )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# =============================
+# bench/bench_facs_manager.py
+# =============================
+"""
+Benchmarks de logic/facs_manager sobre un corpus sintético (bench/sri_corpus.py).
+
+Uso (desde facret/):
+    poetry run python bench/bench_facs_manager.py --scale 10k
+    poetry run python bench/bench_facs_manager.py --scale 10k --save-baseline bench/baseline_10k.json
+    poetry run python bench/bench_facs_manager.py --scale 10k --baseline bench/baseline_10k.json
+
+Cada operación corre en un proceso nuevo sobre una copia fresca del corpus
+(las operaciones modifican la carpeta), así el pico de RSS medido es el de
+esa operación. Se reporta el mejor tiempo de N repeticiones, archivos/s y
+pico de RSS; con --baseline se compara contra una corrida anterior y se
+marcan como regresión las que empeoran más de --tolerance.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from sri_corpus import SCALES, generate_corpus   # noqa: E402
+
+
+def _quiet(_msg: str):
+    pass
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2**20
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB; macOS, bytes.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+# ── Operaciones ───────────────────────────────────────────────────────────────
+# Cada una recibe la carpeta de trabajo (copia del corpus) y el número de
+# workers; retorna la cantidad de archivos que procesó.
+
+def _xml_names(folder: str) -> list:
+    return sorted(f for f in os.listdir(folder) if f.endswith(".xml"))
+
+def op_extract_fac_register(work: str, workers: int) -> int:
+    from logic.facs_manager import extract_fac_register
+    folder = os.path.join(work, "facturas")
+    count = 0
+    for name in _xml_names(folder):
+        extract_fac_register(os.path.join(folder, name))
+        count += 1
+    return count
+
+def op_process_all_xml_facs(work: str, workers: int) -> int:
+    from logic.facs_manager import process_all_xml_facs
+    folder = os.path.join(work, "facturas")
+    n = len(_xml_names(folder))
+    process_all_xml_facs(folder, _quiet, workers=workers)
+    return n
+
+def op_process_all_xml_facs_cached(work: str, workers: int) -> int:
+    # Corrida en frío (todo fallo) y luego con la caché completa (todo acierto):
+    # el pico de RSS cubre las dos y no debe crecer con la carpeta.
+    from logic.facs_manager import process_all_xml_facs
+    folder = os.path.join(work, "facturas")
+    cache_path = os.path.join(work, "parse_cache.sqlite")
+    n = len(_xml_names(folder))
+    for _ in range(2):
+        process_all_xml_facs(folder, _quiet, workers=workers, use_cache=True, cache_path=cache_path)
+    return 2 * n
+
+def op_process_all_xml_rets(work: str, workers: int) -> int:
+    from logic.facs_manager import process_all_xml_rets
+    folder = os.path.join(work, "retenciones")
+    n = len(_xml_names(folder))
+    process_all_xml_rets(folder, _quiet, workers=workers)
+    return n
+
+def op_clean_xml_files(work: str, workers: int) -> int:
+    from logic.facs_manager import clean_xml_files
+    folder = os.path.join(work, "retenciones")
+    n = len(_xml_names(folder))
+    clean_xml_files(folder, _quiet)
+    return n
+
+def op_remove_duplicate_files(work: str, workers: int) -> int:
+    from logic.facs_manager import remove_duplicate_files
+    folder = os.path.join(work, "facturas")
+    n = len(os.listdir(folder))
+    remove_duplicate_files(folder, _quiet, workers=max(workers, 1))
+    return n
+
+def op_rename_files_with_attributes(work: str, workers: int) -> int:
+    from logic.facs_manager import rename_files_with_attributes
+    folder = os.path.join(work, "facturas")
+    # Sin quitar RIDE_ los PDFs no se emparejan; se hace antes de medir (ver _prepare).
+    n = len(os.listdir(folder))
+    rename_files_with_attributes(folder, _quiet, workers=workers)
+    return n
+
+OPERATIONS = {
+    "extract_fac_register":        op_extract_fac_register,
+    "process_all_xml_facs":        op_process_all_xml_facs,
+    "process_all_xml_facs_cached": op_process_all_xml_facs_cached,
+    "process_all_xml_rets":        op_process_all_xml_rets,
+    "clean_xml_files":             op_clean_xml_files,
+    "remove_duplicate_files":      op_remove_duplicate_files,
+    "rename_files_with_attributes": op_rename_files_with_attributes,
+}
+
+def _prepare(name: str, work: str):
+    if name == "rename_files_with_attributes":
+        from logic.facs_manager import remove_prefix_files_pdf
+        remove_prefix_files_pdf(os.path.join(work, "facturas"), "RIDE_", _quiet)
+
+
+# ── Ejecución ─────────────────────────────────────────────────────────────────
+
+def _child(name: str, work: str, workers: int, queue):
+    try:
+        _prepare(name, work)
+        t0 = time.perf_counter()
+        files = OPERATIONS[name](work, workers)
+        elapsed = time.perf_counter() - t0
+        queue.put({"seconds": elapsed, "files": files, "peak_rss_mb": _peak_rss_mb()})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+def run_operation(name: str, corpus: str, workers: int, repeat: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    best = None
+    for _ in range(repeat):
+        # La copia se hace acá: en el hijo sumaría su propio pico al RSS medido.
+        work = tempfile.mkdtemp(prefix="facret_bench_")
+        try:
+            for sub in ("facturas", "retenciones"):
+                shutil.copytree(os.path.join(corpus, sub), os.path.join(work, sub))
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_child, args=(name, work, workers, queue))
+            proc.start()
+            result = queue.get()
+            proc.join()
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        if "error" in result:
+            return result
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    best["files_per_s"] = best["files"] / best["seconds"] if best["seconds"] else None
+    return best
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Operaciones cuyo tiempo o RSS empeoró más de tolerance (0.10 = 10 %)."""
+    regressions = []
+    for name, cur in results.items():
+        ref = baseline.get("operations", {}).get(name)
+        if not ref or "error" in cur or "error" in ref:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if cur.get(metric) and ref.get(metric):
+                delta = cur[metric] / ref[metric] - 1
+                cur[f"{metric}_delta"] = round(delta, 4)
+                if delta > tolerance:
+                    regressions.append(f"{name}: {metric} {ref[metric]:.3f} → {cur[metric]:.3f} (+{delta:.0%})")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scale", default="1k", help="1k, 10k, 100k o una cantidad de facturas")
+    ap.add_argument("--corpus", help="carpeta del corpus (se genera si no existe)")
+    ap.add_argument("--only", nargs="*", choices=list(OPERATIONS), help="operaciones a medir")
+    ap.add_argument("--workers", type=int, default=1, help="workers para las operaciones que los aceptan (0 = CPUs)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", help="JSON de resultados (por defecto bench/results_<escala>.json)")
+    ap.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    ap.add_argument("--save-baseline", help="además guarda esta corrida como baseline")
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    args = ap.parse_args()
+
+    n = SCALES.get(args.scale) or int(args.scale)
+    corpus = args.corpus or os.path.join(tempfile.gettempdir(), f"facret_corpus_{n}")
+    if not os.path.exists(os.path.join(corpus, "corpus.json")):
+        print(f"Generando corpus de {n} facturas en {corpus} ...")
+        generate_corpus(corpus, n)
+    with open(os.path.join(corpus, "corpus.json")) as f:
+        corpus_info = json.load(f)
+
+    print(f"Corpus: {corpus_info} · mejor de {args.repeat} · workers={args.workers}")
+    results = {}
+    for name in args.only or OPERATIONS:
+        r = run_operation(name, corpus, args.workers, args.repeat)
+        results[name] = r
+        if "error" in r:
+            print(f"  {name:<30} ERROR {r['error']}")
+            continue
+        rss = f"{r['peak_rss_mb']:8.1f} MB" if r["peak_rss_mb"] is not None else "      — MB"
+        print(f"  {name:<30} {r['seconds']:8.3f} s  {r['files_per_s']:10.0f} archivos/s  {rss}")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": corpus_info,
+        "workers": args.workers,
+        "repeat": args.repeat,
+        "operations": results,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        if regressions:
+            print("Regresiones respecto del baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            exit_code = 1
+        else:
+            print(f"Sin regresiones (tolerancia {args.tolerance:.0%}).")
+
+    out = args.out or os.path.join(BENCH_DIR, f"results_{args.scale}.json")
+    for path in filter(None, (out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+    print(f"Resultados en: {out}")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
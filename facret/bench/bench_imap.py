@@ -0,0 +1,109 @@
+# =============================
+# bench/bench_imap.py
+# =============================
+"""
+Mide la descarga desde IMAP (ImapSource) contra el servidor local de
+bench/fake_imap.py, con un buzón sembrado y latencia de red simulada.
+
+Uso (desde facret/):
+    poetry run python bench/bench_imap.py --messages 2000
+    poetry run python bench/bench_imap.py --messages 2000 --latency-ms 0 20 --batch 1 50
+
+Para cada latencia por comando y tamaño de lote hace una corrida completa y
+luego una incremental con --new correos nuevos (marca UIDVALIDITY/UID de la
+primera), y reporta mensajes/s, comandos IMAP y bytes recibidos frente al
+tamaño del buzón. --batch 1 equivale a pedir correo por correo.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_imap import DEFAULT_MAILBOX, DEFAULT_SENDER, FakeImapServer   # noqa: E402
+from logic import facs_downloader                                      # noqa: E402
+from logic.mail_sources import IMAP_BATCH, ImapSource                  # noqa: E402
+
+
+def _quiet(_msg: str):
+    pass
+
+
+def bench_download(server: FakeImapServer, source: ImapSource, messages: int, work: str) -> dict:
+    """Una corrida de descarga; work conserva destino y estado entre corridas."""
+    dest = os.path.join(work, "descargas")
+    descargador = facs_downloader.DescargadorFacturas(
+        log_callback=_quiet, state_path=os.path.join(work, "downloads.sqlite"), source=source,
+    )
+    server.reset_counters()
+    t0 = time.perf_counter()
+    saved = descargador.descargar_facturas_etapa(carpeta_guardar=dest, correo_remitente=DEFAULT_SENDER)
+    elapsed = time.perf_counter() - t0
+    return {
+        "seconds":        round(elapsed, 4),
+        "messages":       messages,
+        "attachments":    saved,
+        "imap_commands":  server.commands,
+        "bytes_received": server.bytes_sent,
+        "messages_per_s": round(messages / elapsed, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=2_000)
+    ap.add_argument("--latency-ms", type=float, nargs="*", default=[0.0, 20.0],
+                    help="latencia simulada por comando IMAP, en ms")
+    ap.add_argument("--batch", type=int, nargs="*", default=[1, IMAP_BATCH],
+                    help="correos por UID FETCH a comparar")
+    ap.add_argument("--sender-ratio", type=float, default=0.9)
+    ap.add_argument("--attachment-bytes", type=int, default=4_096)
+    ap.add_argument("--new", type=int, default=100,
+                    help="correos nuevos para la segunda corrida (sincronización incremental)")
+    ap.add_argument("--out", help="guardar resultados en JSON")
+    args = ap.parse_args()
+
+    # El resumen del dashboard se guarda en el almacén real; en el benchmark no.
+    facs_downloader.record_download = lambda *a, **k: None
+
+    print(f"Buzón IMAP simulado: {args.messages} mensajes en {DEFAULT_MAILBOX}")
+    results = []
+    for latency_ms in args.latency_ms:
+        for batch in args.batch:
+            server = FakeImapServer.generate(
+                messages=args.messages, sender_ratio=args.sender_ratio, attachment_bytes=args.attachment_bytes,
+            ).start()
+            mailbox_bytes = sum(len(m.raw) for m in server.mailboxes[DEFAULT_MAILBOX])
+            work = tempfile.mkdtemp(prefix="facret_imap_")
+            try:
+                server.latency = latency_ms / 1e3
+                source = ImapSource("127.0.0.1", server.user, server.password, port=server.port,
+                                    ssl=False, batch=batch, log_fn=_quiet)
+                full = bench_download(server, source, args.messages, work)
+                server.add_mail(args.new, sender_ratio=args.sender_ratio, attachment_bytes=args.attachment_bytes)
+                incremental = bench_download(server, source, args.new, work)
+                source.close()
+            finally:
+                server.stop()
+                shutil.rmtree(work, ignore_errors=True)
+            for label, r in (("completa", full), (f"+{args.new} nuevos", incremental)):
+                r.update(latency_ms=latency_ms, batch=batch, run=label, mailbox_bytes=mailbox_bytes)
+                results.append(r)
+                print(
+                    f"  lote {batch:>4}  latencia {latency_ms:6.1f} ms  {label:<13} {r['seconds']:8.2f} s  "
+                    f"{r['messages_per_s']:9.0f} msg/s  {r['imap_commands']:>6} comandos  "
+                    f"{r['bytes_received'] / 1e6:7.2f} MB (buzón {mailbox_bytes / 1e6:.2f} MB)"
+                )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
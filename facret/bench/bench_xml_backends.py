@@ -0,0 +1,80 @@
+# =============================
+# bench/bench_xml_backends.py
+# =============================
+"""
+Compara los backends XML (lxml vs ElementTree) sobre la misma carpeta de XMLs.
+
+Uso (desde facret/):
+    poetry run python bench/bench_xml_backends.py <carpeta> [--repeat 3]
+
+Para cada backend disponible mide archivos/s de logic.xml_schema.extract_document
+(mejor de N repeticiones) y verifica que los resultados sean idénticos.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from logic import xml_backend                     # noqa: E402
+from logic.xml_schema import extract_document     # noqa: E402
+
+
+def _extract_all(paths: list) -> list:
+    out = []
+    for path in paths:
+        try:
+            out.append(extract_document(path))
+        except SyntaxError:
+            # ET.ParseError y lxml.etree.XMLSyntaxError derivan de SyntaxError
+            out.append(("error", "SyntaxError"))
+        except Exception as e:
+            out.append(("error", type(e).__name__))
+    return out
+
+
+def bench_backend(name: str, paths: list, repeat: int):
+    xml_backend.set_backend(name)
+    best, results = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        results = _extract_all(paths)
+        best = min(best, time.perf_counter() - t0)
+    return best, results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("folder")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    paths = [
+        os.path.join(args.folder, f)
+        for f in sorted(os.listdir(args.folder))
+        if f.lower().endswith(".xml")
+    ]
+    if not paths:
+        sys.exit(f"No hay XMLs en {args.folder}")
+
+    print(f"{len(paths)} XML · mejor de {args.repeat} repetición(es)")
+    timings, reference = {}, None
+    for name in xml_backend.available_backends():
+        elapsed, results = bench_backend(name, paths, args.repeat)
+        timings[name] = elapsed
+        print(f"  {name:<6} {elapsed:8.3f} s  {len(paths) / elapsed:10.0f} archivos/s")
+        if reference is None:
+            reference = results
+        elif results != reference:
+            diffs = sum(a != b for a, b in zip(results, reference))
+            print(f"  ¡{name} difiere en {diffs} archivo(s)!")
+
+    if "lxml" in timings:
+        print(f"Aceleración lxml: {timings['etree'] / timings['lxml']:.2f}x")
+    else:
+        print("lxml no está instalado: solo se midió ElementTree.")
+
+
+if __name__ == "__main__":
+    main()
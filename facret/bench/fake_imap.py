@@ -0,0 +1,457 @@
+# =============================
+# bench/fake_imap.py
+# =============================
+"""
+Servidor IMAP4rev1 mínimo en 127.0.0.1 con un buzón sembrado, para correr
+ImapSource (logic/mail_sources.py) sin un servidor de correo real.
+
+Atiende lo que usa ImapSource, sobre un socket de verdad (imaplib sin SSL):
+    CAPABILITY, LOGIN, SELECT/EXAMINE (UIDVALIDITY, UIDNEXT), NOOP, CLOSE, LOGOUT
+    UID SEARCH con FROM, SINCE, BEFORE, UID <conjunto>, ALL
+    UID FETCH con UID, FLAGS, INTERNALDATE, RFC822.SIZE, BODYSTRUCTURE,
+        BODY[...] y BODY.PEEK[...] (secciones 1.2..., HEADER, TEXT,
+        HEADER.FIELDS (...), y parciales <inicio.largo>)
+
+Cada comando cuenta en FakeImapServer.commands y espera `latency` segundos
+antes de responder (ida y vuelta de red); bytes_sent suma lo enviado.
+
+    with FakeImapServer.generate(messages=500, latency=0.02) as server:
+        source = ImapSource("127.0.0.1", server.user, server.password,
+                            port=server.port, ssl=False)
+        DescargadorFacturas(source=source).descargar_facturas_etapa(...)
+"""
+import random
+import re
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from email import message_from_bytes
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import format_datetime, parseaddr
+
+DEFAULT_MAILBOX = "INBOX"
+DEFAULT_SENDER = "info@comunicados-etapa.com"
+
+_TOKEN = re.compile(rb'"((?:[^"\\]|\\.)*)"|(\()|(\))|([^\s()"\[]+(?:\[[^\]]*\][^\s()"]*)?)')
+_SECTION = re.compile(r"^(BODY(?:\.PEEK)?)\[([^\]]*)\](?:<(\d+)(?:\.(\d+))?>)?$", re.I)
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _tokens(line: bytes) -> list:
+    """Argumentos de un comando como listas anidadas de str."""
+    stack = [[]]
+    for quoted, open_, close, atom in _TOKEN.findall(line):
+        if open_:
+            stack.append([])
+        elif close:
+            done = stack.pop()
+            stack[-1].append(done)
+        elif atom:
+            stack[-1].append(atom.decode("utf-8", "replace"))
+        else:
+            stack[-1].append(re.sub(rb"\\(.)", rb"\1", quoted).decode("utf-8", "replace"))
+    return stack[0]
+
+def _astring(value) -> bytes:
+    if value is None:
+        return b"NIL"
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    if value.isascii() and b"\r" not in value and b"\n" not in value:
+        return b'"' + value.replace(b"\\", b"\\\\").replace(b'"', b'\\"') + b'"'
+    return b"{%d}\r\n" % len(value) + value
+
+def _literal(value: bytes) -> bytes:
+    return b"{%d}\r\n" % len(value) + value
+
+def _internaldate(value: datetime) -> bytes:
+    offset = value.utcoffset() or timedelta(0)
+    minutes = int(offset.total_seconds() // 60)
+    sign = "-" if minutes < 0 else "+"
+    zone = f"{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+    return f'"{value.day:2d}-{_MONTHS[value.month - 1]}-{value.year} {value:%H:%M:%S} {zone}"'.encode()
+
+def _search_date(value: str):
+    day, month, year = value.split("-")
+    return datetime(int(year), _MONTHS.index(month.title()) + 1, int(day)).date()
+
+
+# ── Buzón ─────────────────────────────────────────────────────────────────────
+
+class _Mail:
+    def __init__(self, uid: int, received: datetime, raw: bytes):
+        self.uid = uid
+        self.received = received
+        self.raw = raw
+        self.message = message_from_bytes(raw)
+        self.sender = parseaddr(self.message.get("From", ""))[1].lower()
+
+
+def _payload(part) -> bytes:
+    payload = part.get_payload()
+    return payload.encode("utf-8", "surrogateescape") if isinstance(payload, str) else b""
+
+_PARAM = re.compile(r';\s*([^=\s;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;\s]+)')
+
+def _params(part, header: str = "content-type") -> bytes:
+    """Parámetros tal como vienen en el encabezado (sin decodificar RFC 2047/2231, como un servidor)."""
+    params = []
+    for key, value in _PARAM.findall(str(part.get(header, ""))):
+        if value.startswith('"'):
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        params.append(_astring(key.upper()) + b" " + _astring(value))
+    return b"(" + b" ".join(params) + b")" if params else b"NIL"
+
+def _bodystructure(part) -> bytes:
+    maintype, subtype = part.get_content_maintype(), part.get_content_subtype()
+    if part.get_content_type() == "message/rfc822":
+        inner = part.get_payload()[0]
+        body = inner.as_bytes()
+        envelope = b"(" + b" ".join([b"NIL"] * 10) + b")"
+        return (b'("MESSAGE" "RFC822" ' + _params(part) + b" NIL NIL "
+                + _astring((part.get("Content-Transfer-Encoding") or "7BIT").upper())
+                + b" %d " % len(body) + envelope + b" " + _bodystructure(inner)
+                + b" %d NIL NIL NIL NIL)" % body.count(b"\n"))
+    if part.is_multipart():
+        children = b"".join(_bodystructure(p) for p in part.get_payload())
+        return b"(" + children + b" " + _astring(subtype.upper()) + b" " + _params(part) + b" NIL NIL NIL)"
+    body = _payload(part)
+    fields = [
+        _astring(maintype.upper()), _astring(subtype.upper()), _params(part), b"NIL", b"NIL",
+        _astring((part.get("Content-Transfer-Encoding") or "7BIT").upper()), b"%d" % len(body),
+    ]
+    if maintype == "text":
+        fields.append(b"%d" % body.count(b"\n"))
+    disposition = part.get("Content-Disposition")
+    if disposition:
+        kind = str(disposition).split(";")[0].strip()
+        disposition = b"(" + _astring(kind.upper()) + b" " + _params(part, "content-disposition") + b")"
+    fields += [b"NIL", disposition or b"NIL", b"NIL", b"NIL"]
+    return b"(" + b" ".join(fields) + b")"
+
+def _section(mail: _Mail, spec: str) -> bytes:
+    """Contenido de BODY[spec]."""
+    raw = mail.raw
+    header_end = raw.find(b"\r\n\r\n")
+    header_end = len(raw) if header_end < 0 else header_end + 4
+    upper = spec.upper()
+    if not spec:
+        return raw
+    if upper == "HEADER":
+        return raw[:header_end]
+    if upper == "TEXT":
+        return raw[header_end:]
+    if upper.startswith("HEADER.FIELDS"):
+        wanted = {name.lower() for name in _tokens(spec.encode())[1]}
+        lines = b"".join(
+            f"{name}: {value}\r\n".encode("utf-8") for name, value in mail.message.items() if name.lower() in wanted
+        )
+        return lines + b"\r\n"
+    part = mail.message
+    for number in (int(n) for n in spec.split(".")):
+        if part.get_content_type() == "message/rfc822":
+            part = part.get_payload()[0]
+        if part.is_multipart():
+            children = part.get_payload()
+            if not 1 <= number <= len(children):
+                return b""
+            part = children[number - 1]
+        elif number != 1:
+            return b""
+    if part.is_multipart():
+        return part.as_bytes()
+    return _payload(part)
+
+
+class FakeImapServer:
+    def __init__(self, user: str = "facret", password: str = "facret", uidvalidity: int = 1, latency: float = 0.0):
+        self.user = user
+        self.password = password
+        self.latency = latency
+        self.uidvalidity = uidvalidity
+        self.mailboxes: dict = {DEFAULT_MAILBOX: []}
+        self.commands = 0
+        self.bytes_sent = 0
+        self._next_uid: dict = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._rng = random.Random(2024)
+        self._generated = 0
+        self._last_received = datetime(2022, 1, 1, 8, 0)
+
+    # ── Arranque ────────────────────────────────────────────────────────────
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> "FakeImapServer":
+        fake = self
+
+        class Handler(_Handler):
+            server_state = fake
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start() if self._server is None else self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counters(self):
+        self.commands = self.bytes_sent = 0
+
+    # ── Buzón sembrado ──────────────────────────────────────────────────────
+
+    def add_message(self, mailbox: str, sender: str, subject: str, received: datetime, files, message_id=None):
+        msg = EmailMessage()
+        msg["From"] = sender
+        msg["To"] = "facturacion@example.com"
+        msg["Subject"] = subject
+        received = received if received.tzinfo else received.astimezone()
+        msg["Date"] = format_datetime(received)
+        msg["Message-ID"] = message_id or f"<{received:%Y%m%d%H%M%S}.{self._generated}.{len(self.mailboxes.get(mailbox, []))}@fake-imap>"
+        msg.set_content("Adjunto encontrará su comprobante electrónico.\n")
+        for filename, payload in files:
+            maintype, subtype = {
+                ".xml": ("application", "xml"), ".pdf": ("application", "pdf"), ".png": ("image", "png"),
+            }.get(filename[filename.rfind("."):].lower(), ("application", "octet-stream"))
+            msg.add_attachment(payload, maintype=maintype, subtype=subtype, filename=filename)
+        self.append(mailbox, msg.as_bytes(policy=SMTP), received)
+
+    def append(self, mailbox: str, raw: bytes, received: datetime):
+        with self._lock:
+            mails = self.mailboxes.setdefault(mailbox, [])
+            uid = self._next_uid.get(mailbox, 1)
+            self._next_uid[mailbox] = uid + 1
+            mails.append(_Mail(uid, received if received.tzinfo else received.astimezone(), raw))
+
+    def renumber(self):
+        """Recrea los buzones: nuevo UIDVALIDITY y UID desde 1 (como una migración)."""
+        with self._lock:
+            self.uidvalidity += 1
+            for mailbox, mails in self.mailboxes.items():
+                for uid, mail in enumerate(mails, start=1):
+                    mail.uid = uid
+                self._next_uid[mailbox] = len(mails) + 1
+
+    @classmethod
+    def generate(
+        cls,
+        messages: int = 1_000,
+        mailbox: str = DEFAULT_MAILBOX,
+        sender: str = DEFAULT_SENDER,
+        sender_ratio: float = 0.9,
+        attachment_bytes: int = 4_096,
+        extra_attachments: float = 0.1,
+        latency: float = 0.0,
+        seed: int = 2024,
+    ) -> "FakeImapServer":
+        """
+        Buzón con `messages` correos, como FakeOutlook.generate: una fracción
+        sender_ratio de `sender` con XML + PDF adjuntos y el resto de otros
+        remitentes; extra_attachments agrega un logo que no es XML/PDF.
+        """
+        server = cls(latency=latency)
+        server._rng = random.Random(seed)
+        server.add_mail(messages, mailbox, sender, sender_ratio, attachment_bytes, extra_attachments)
+        return server
+
+    def add_mail(
+        self,
+        messages: int,
+        mailbox: str = DEFAULT_MAILBOX,
+        sender: str = DEFAULT_SENDER,
+        sender_ratio: float = 0.9,
+        attachment_bytes: int = 4_096,
+        extra_attachments: float = 0.1,
+    ):
+        """Agrega correos posteriores al último generado (simula correo nuevo)."""
+        rng, received = self._rng, self._last_received
+        for i in range(self._generated, self._generated + messages):
+            received += timedelta(seconds=rng.randint(30, 5_400))
+            if rng.random() < sender_ratio:
+                stem = "".join(rng.choices("0123456789", k=49))
+                xml_payload = f'<?xml version="1.0"?><factura clave="{stem}"/>'.encode().ljust(attachment_bytes, b" ")
+                pdf_payload = f"%PDF-1.4\n%{stem}\n".encode().ljust(attachment_bytes, b"\0")
+                files = [(f"{stem}.xml", xml_payload), (f"{stem}.pdf", pdf_payload)]
+                msg_sender, subject = sender, f"Factura electrónica {i + 1:09d}"
+            else:
+                files = [(f"adjunto_{i}.docx", b"PK")]
+                msg_sender, subject = f"otro{i % 37}@example.com", f"Correo {i}"
+            if rng.random() < extra_attachments:
+                files.append(("logo.png", b"\x89PNG"))
+            self.add_message(mailbox, msg_sender, subject, received, files, message_id=f"<{i}.{rng.getrandbits(48):x}@fake-imap>")
+        self._last_received = received
+        self._generated += messages
+
+    # ── Comandos ────────────────────────────────────────────────────────────
+
+    def _uid_set(self, spec: str, mails: list) -> set:
+        top = mails[-1].uid if mails else 0
+        uids = set()
+        for piece in spec.split(","):
+            low, _, high = piece.partition(":")
+            low = top if low == "*" else int(low)
+            high = low if not high else top if high == "*" else int(high)
+            low, high = min(low, high), max(low, high)
+            uids.update(m.uid for m in mails if low <= m.uid <= high)
+        return uids
+
+    def search(self, mails: list, args: list) -> list:
+        result = list(mails)
+        i = 0
+        while i < len(args):
+            key = args[i].upper()
+            if key == "ALL":
+                i += 1
+                continue
+            value = args[i + 1]
+            if key == "FROM":
+                result = [m for m in result if value.lower() in m.message.get("From", "").lower()]
+            elif key == "SINCE":
+                result = [m for m in result if m.received.date() >= _search_date(value)]
+            elif key == "BEFORE":
+                result = [m for m in result if m.received.date() < _search_date(value)]
+            elif key == "UID":
+                wanted = self._uid_set(value, mails)
+                result = [m for m in result if m.uid in wanted]
+            else:
+                raise ValueError(f"criterio no soportado: {key}")
+            i += 2
+        return [m.uid for m in result]
+
+    def fetch(self, mail: _Mail, items: list) -> bytes:
+        out = [b"UID %d" % mail.uid]
+        for item in items:
+            name = item.upper()
+            if name == "UID":
+                continue
+            if name == "FLAGS":
+                out.append(b"FLAGS ()")
+            elif name == "INTERNALDATE":
+                out.append(b"INTERNALDATE " + _internaldate(mail.received))
+            elif name == "RFC822.SIZE":
+                out.append(b"RFC822.SIZE %d" % len(mail.raw))
+            elif name in ("BODYSTRUCTURE", "BODY"):
+                out.append(name.encode() + b" " + _bodystructure(mail.message))
+            elif name == "RFC822":
+                out.append(b"RFC822 " + _literal(mail.raw))
+            elif (m := _SECTION.match(item)) is not None:
+                data = _section(mail, m.group(2))
+                label = f"BODY[{m.group(2)}]"
+                if m.group(3) is not None:
+                    start = int(m.group(3))
+                    data = data[start:start + int(m.group(4))] if m.group(4) else data[start:]
+                    label += f"<{start}>"
+                out.append(label.encode() + b" " + _literal(data))
+            else:
+                raise ValueError(f"atributo no soportado: {item}")
+        return b"(" + b" ".join(out) + b")"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server_state: FakeImapServer = None
+    # Respuesta entera en un solo envío (flush por comando): con escrituras
+    # chicas, Nagle + ACK demorado agregan ~40 ms por comando.
+    wbufsize = 1 << 16
+    disable_nagle_algorithm = True
+
+    def send(self, data: bytes):
+        self.server_state.bytes_sent += len(data)
+        self.wfile.write(data)
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        # Literales del cliente: "{n}" al final de la línea.
+        while (m := re.search(rb"\{(\d+)\}\r\n$", line)) is not None:
+            self.send(b"+ listo\r\n")
+            line = line[:m.start()] + _astring(self.rfile.read(int(m.group(1)))) + self.rfile.readline()
+        return line.rstrip(b"\r\n")
+
+    def handle(self):
+        state = self.server_state
+        self.mailbox = None
+        self.send(b"* OK [CAPABILITY IMAP4rev1] FakeImap listo\r\n")
+        self.wfile.flush()
+        while (line := self.read_command()) is not None:
+            tag, _, rest = line.partition(b" ")
+            command, _, rest = rest.partition(b" ")
+            command = command.decode("ascii", "replace").upper()
+            state.commands += 1
+            if state.latency:
+                time.sleep(state.latency)
+            try:
+                done = self.dispatch(tag, command, rest)
+            except Exception as e:
+                self.send(tag + b" BAD " + str(e).encode("utf-8", "replace") + b"\r\n")
+                done = False
+            self.wfile.flush()
+            if done:
+                break
+
+    def dispatch(self, tag: bytes, command: str, rest: bytes) -> bool:
+        state = self.server_state
+        args = _tokens(rest)
+        if command == "CAPABILITY":
+            self.send(b"* CAPABILITY IMAP4rev1\r\n" + tag + b" OK CAPABILITY completado\r\n")
+        elif command == "NOOP":
+            self.send(tag + b" OK NOOP completado\r\n")
+        elif command == "LOGIN":
+            if args[:2] != [state.user, state.password]:
+                self.send(tag + b" NO [AUTHENTICATIONFAILED] credenciales invalidas\r\n")
+            else:
+                self.send(tag + b" OK LOGIN completado\r\n")
+        elif command == "LOGOUT":
+            self.send(b"* BYE FakeImap cerrando\r\n" + tag + b" OK LOGOUT completado\r\n")
+            return True
+        elif command in ("SELECT", "EXAMINE"):
+            mailbox = args[0] if args else ""
+            mailbox = DEFAULT_MAILBOX if mailbox.upper() == DEFAULT_MAILBOX else mailbox
+            if mailbox not in state.mailboxes:
+                self.mailbox = None
+                self.send(tag + b" NO no existe el buzon\r\n")
+                return False
+            self.mailbox = mailbox
+            mails = state.mailboxes[mailbox]
+            self.send(
+                b"* %d EXISTS\r\n* 0 RECENT\r\n* FLAGS (\\Seen)\r\n" % len(mails)
+                + b"* OK [UIDVALIDITY %d] UIDs validos\r\n" % state.uidvalidity
+                + b"* OK [UIDNEXT %d] proximo UID\r\n" % state._next_uid.get(mailbox, 1)
+                + tag + b" OK [READ-ONLY] " + command.encode() + b" completado\r\n"
+            )
+        elif command == "CLOSE":
+            self.mailbox = None
+            self.send(tag + b" OK CLOSE completado\r\n")
+        elif command == "UID" and self.mailbox is not None:
+            sub, args = args[0].upper(), args[1:]
+            mails = state.mailboxes[self.mailbox]
+            if sub == "SEARCH":
+                uids = state.search(mails, args)
+                self.send(b"* SEARCH" + b"".join(b" %d" % uid for uid in uids) + b"\r\n")
+            elif sub == "FETCH":
+                wanted = state._uid_set(args[0], mails)
+                items = args[1] if isinstance(args[1], list) else args[1:]
+                for seq, mail in enumerate(mails, start=1):
+                    if mail.uid in wanted:
+                        self.send(b"* %d FETCH " % seq + state.fetch(mail, items) + b"\r\n")
+            else:
+                raise ValueError(f"UID {sub} no soportado")
+            self.send(tag + b" OK UID " + sub.encode() + b" completado\r\n")
+        else:
+            self.send(tag + b" BAD comando no soportado: " + command.encode() + b"\r\n")
+        return False
@@ -0,0 +1,463 @@
+# =============================
+# bench/fake_outlook.py
+# =============================
+"""
+Sustituto en memoria de Outlook.Application para correr DescargadorFacturas
+fuera de Windows.
+
+Reproduce la forma de los objetos COM que usa OutlookSource (logic/mail_sources.py):
+    outlook.GetNamespace("MAPI") → namespace
+    namespace.CurrentUser.Name, namespace.GetDefaultFolder(6)
+    namespace.GetFolderFromID(entry_id, store_id)
+    folder.Folders["Sub"], folder.EntryID, folder.StoreID
+    folder.Items (iterable, Count, Item(i) 1-based, Restrict(filtro DASL), Sort)
+    folder.GetTable(filtro) → table.Columns.RemoveAll/Add, table.GetArray(n),
+        table.EndOfTable; namespace.GetItemFromID(entry_id, store_id)
+    message.SenderEmailAddress, .Subject, .ReceivedTime, .EntryID, .Attachments
+    attachment.FileName, .Size, attachment.SaveAsFile(ruta)
+
+Cada acceso a una propiedad o método de un objeto "COM" cuenta como una
+llamada entre procesos: suma a FakeOutlook.calls y espera `latency`
+segundos, para estimar cuánto tarda una carpeta grande con Outlook real.
+
+    outlook = FakeOutlook.generate(messages=20_000, latency=50e-6)
+    DescargadorFacturas(outlook=outlook).descargar_facturas_etapa(...)
+"""
+import operator
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+OL_FOLDER_INBOX = 6
+DEFAULT_FOLDER = "Inbox\\CONTRACT\\ETAPA\\FACS"
+DEFAULT_SENDER = "info@comunicados-etapa.com"
+STORE_ID = "FAKESTORE0001"
+
+_DASL_CLAUSE = re.compile(r'"([^"]+)"\s*(>=|<=|<>|=|>|<|like)\s*\'((?:[^\']|\'\')*)\'', re.IGNORECASE)
+_DASL_OPS = {"=": operator.eq, "<>": operator.ne, ">": operator.gt, ">=": operator.ge,
+             "<": operator.lt, "<=": operator.le}
+_DASL_PROPS = {
+    "urn:schemas:httpmail:datereceived":                   "_received",
+    "http://schemas.microsoft.com/mapi/proptag/0x0C1F001F": "_sender",   # PR_SENDER_EMAIL_ADDRESS
+}
+_DASL_DATE = "%Y-%m-%d %H:%M"
+
+class _Clock:
+    """Contador de llamadas COM + latencia simulada."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def tick(self):
+        self.calls += 1
+        if self.latency:
+            # time.sleep no baja de ~50 µs; para latencias menores se hace espera activa.
+            if self.latency >= 1e-3:
+                time.sleep(self.latency)
+            else:
+                end = time.perf_counter() + self.latency
+                while time.perf_counter() < end:
+                    pass
+
+
+def _com(attr: str):
+    """Propiedad que cuesta una llamada COM."""
+    def getter(self):
+        self._clock.tick()
+        return getattr(self, attr)
+    return property(getter)
+
+
+class FakeAttachment:
+    def __init__(self, clock: _Clock, filename: str, payload: bytes):
+        self._clock = clock
+        self._filename = filename
+        self._payload = payload
+
+    FileName = _com("_filename")
+
+    @property
+    def Size(self):
+        self._clock.tick()
+        return len(self._payload)
+
+    def SaveAsFile(self, path: str):
+        self._clock.tick()
+        with open(path, "wb") as f:
+            f.write(self._payload)
+
+
+class FakeCollection:
+    """Colección COM: iterable, Count e Item(i) con índice desde 1."""
+
+    def __init__(self, clock: _Clock, items: list):
+        self._clock = clock
+        self._items = items
+
+    @property
+    def Count(self):
+        self._clock.tick()
+        return len(self._items)
+
+    def Item(self, index):
+        self._clock.tick()
+        return self._items[index - 1]
+
+    def __iter__(self):
+        # Cada paso del enumerador COM (IEnumVARIANT.Next) es una llamada.
+        for item in self._items:
+            self._clock.tick()
+            yield item
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _dasl_predicate(dasl: str):
+    """
+    Subconjunto de filtros DASL: @SQL="prop" op 'valor' unidos con AND. Las
+    fechas vienen en UTC y se comparan con la hora local de cada correo;
+    like solo admite '%subcadena%'.
+    """
+    if not dasl.startswith("@SQL="):
+        raise ValueError(f"Filtro no soportado por el simulador (se espera DASL): {dasl!r}")
+    clauses = []
+    for part in re.split(r"\s+AND\s+", dasl[len("@SQL="):].strip(), flags=re.IGNORECASE):
+        m = _DASL_CLAUSE.fullmatch(part.strip())
+        if m is None:
+            raise ValueError(f"Filtro DASL no soportado por el simulador: {part!r}")
+        prop, op, raw = m.group(1), m.group(2).lower(), m.group(3).replace("''", "'")
+        attr = _DASL_PROPS.get(prop)
+        if attr is None:
+            raise ValueError(f"Propiedad no simulada en Restrict: {prop}")
+        if op == "like":
+            if not (len(raw) >= 2 and raw[0] == raw[-1] == "%" and "%" not in raw[1:-1]):
+                raise ValueError(f"Patrón like no simulado: {raw!r}")
+            needle = raw[1:-1].lower()
+            clauses.append((attr, lambda value, needle=needle: needle in value))
+            continue
+        if attr == "_received":
+            utc = datetime.strptime(raw, _DASL_DATE).replace(tzinfo=timezone.utc)
+            value = utc.astimezone().replace(tzinfo=None)
+        else:
+            value = raw.lower()
+        clauses.append((attr, lambda current, op=_DASL_OPS[op], value=value: op(current, value)))
+
+    def matches(msg) -> bool:
+        for attr, test in clauses:
+            current = getattr(msg, attr)
+            if isinstance(current, datetime):
+                # Outlook compara con precisión de minutos.
+                current = current.replace(second=0, microsecond=0)
+            elif isinstance(current, str):
+                current = current.lower()
+            if not test(current):
+                return False
+        return True
+    return matches
+
+
+class FakeItems(FakeCollection):
+    """Folder.Items: además de iterar, filtra y ordena del lado de Outlook."""
+
+    def Restrict(self, dasl: str) -> "FakeItems":
+        # Una sola llamada: el filtrado ocurre en el proceso de Outlook.
+        self._clock.tick()
+        matches = _dasl_predicate(dasl)
+        return FakeItems(self._clock, [m for m in self._items if matches(m)])
+
+    def Sort(self, prop: str, descending: bool = False):
+        self._clock.tick()
+        attr = {"[ReceivedTime]": "_received", "[SenderEmailAddress]": "_sender"}[prop]
+        self._items = sorted(self._items, key=lambda m: getattr(m, attr), reverse=descending)
+
+
+_PROPTAG_COLUMNS = {
+    "http://schemas.microsoft.com/mapi/proptag/0x5D01001F": lambda m: m._sender,        # PR_SENDER_SMTP_ADDRESS
+    "http://schemas.microsoft.com/mapi/proptag/0x0E1B000B": lambda m: bool(m._attachments),  # PR_HASATTACH
+}
+_NAMED_COLUMNS = {
+    "EntryID":            lambda m: m._entry_id,
+    "SenderEmailAddress": lambda m: m._sender,
+    "Subject":            lambda m: m._subject,
+    "ReceivedTime":       lambda m: m._received,
+}
+
+
+class _Columns:
+    def __init__(self, clock: _Clock):
+        self._clock = clock
+        self.names: list = list(("EntryID", "Subject", "ReceivedTime"))
+
+    def RemoveAll(self):
+        self._clock.tick()
+        self.names = []
+
+    def Add(self, name: str):
+        self._clock.tick()
+        if name not in _NAMED_COLUMNS and name not in _PROPTAG_COLUMNS:
+            raise ValueError(f"Columna no simulada: {name}")
+        self.names.append(name)
+
+
+class FakeTable:
+    """Folder.GetTable: filas con columnas elegidas, leídas en bloque con GetArray."""
+
+    def __init__(self, clock: _Clock, messages: list):
+        self._clock = clock
+        self._messages = messages
+        self._pos = 0
+        self._columns = _Columns(clock)
+
+    @property
+    def Columns(self):
+        self._clock.tick()
+        return self._columns
+
+    @property
+    def EndOfTable(self):
+        self._clock.tick()
+        return self._pos >= len(self._messages)
+
+    def GetArray(self, max_rows: int):
+        # Un bloque de filas = una llamada COM, sin importar cuántas filas trae.
+        self._clock.tick()
+        getters = [_NAMED_COLUMNS.get(n) or _PROPTAG_COLUMNS[n] for n in self._columns.names]
+        block = self._messages[self._pos:self._pos + max_rows]
+        self._pos += len(block)
+        return tuple(tuple(g(m) for g in getters) for m in block)
+
+
+class FakeMessage:
+    def __init__(self, clock: _Clock, entry_id: str, sender: str, subject: str,
+                 received: datetime, attachments: list):
+        self._clock = clock
+        self._entry_id = entry_id
+        self._sender = sender
+        self._subject = subject
+        self._received = received
+        self._attachments = attachments
+
+    EntryID            = _com("_entry_id")
+    SenderEmailAddress = _com("_sender")
+    Subject            = _com("_subject")
+    ReceivedTime       = _com("_received")
+
+    @property
+    def Attachments(self):
+        self._clock.tick()
+        return FakeCollection(self._clock, self._attachments)
+
+
+class FakeFolder:
+    def __init__(self, clock: _Clock, name: str, entry_id: str):
+        self._clock = clock
+        self._name = name
+        self._entry_id = entry_id
+        self._children: dict = {}
+        self._messages: list = []
+        self._by_entry_id: dict = {}
+
+    Name    = _com("_name")
+    EntryID = _com("_entry_id")
+
+    @property
+    def StoreID(self):
+        self._clock.tick()
+        return STORE_ID
+
+    @property
+    def Folders(self):
+        self._clock.tick()
+        return _FolderMap(self._clock, self._children)
+
+    @property
+    def Items(self):
+        self._clock.tick()
+        return FakeItems(self._clock, self._messages)
+
+    def child(self, name: str) -> "FakeFolder":
+        """Crea (si no existe) una subcarpeta; no cuenta como llamada COM."""
+        if name not in self._children:
+            self._children[name] = FakeFolder(self._clock, name, f"{self._entry_id}/{name}")
+        return self._children[name]
+
+    def GetTable(self, dasl: str = "", contents: int = 0):
+        self._clock.tick()
+        messages = self._messages
+        if dasl:
+            matches = _dasl_predicate(dasl)
+            messages = [m for m in messages if matches(m)]
+        return FakeTable(self._clock, messages)
+
+    def walk(self):
+        yield self
+        for child in self._children.values():
+            yield from child.walk()
+
+
+class _FolderMap(FakeCollection):
+    def __init__(self, clock: _Clock, children: dict):
+        super().__init__(clock, list(children.values()))
+        self._by_name = children
+
+    def __getitem__(self, name: str):
+        self._clock.tick()
+        return self._by_name[name]
+
+
+class _User:
+    def __init__(self, clock: _Clock, name: str):
+        self._clock = clock
+        self._name = name
+
+    Name = _com("_name")
+
+
+class FakeNamespace:
+    def __init__(self, clock: _Clock, user: str):
+        self._clock = clock
+        self._user = _User(clock, user)
+        self.inbox = FakeFolder(clock, "Inbox", "INBOX")
+
+    @property
+    def CurrentUser(self):
+        self._clock.tick()
+        return self._user
+
+    def GetDefaultFolder(self, kind: int):
+        self._clock.tick()
+        if kind != OL_FOLDER_INBOX:
+            raise ValueError(f"Carpeta por defecto no simulada: {kind}")
+        return self.inbox
+
+    def GetFolderFromID(self, entry_id: str, store_id: str = None):
+        self._clock.tick()
+        for folder in self.inbox.walk():
+            if folder._entry_id == entry_id:
+                return folder
+        raise LookupError(f"EntryID no encontrado: {entry_id}")
+
+    def GetItemFromID(self, entry_id: str, store_id: str = None):
+        self._clock.tick()
+        for folder in self.inbox.walk():
+            msg = folder._by_entry_id.get(entry_id)
+            if msg is not None:
+                return msg
+        raise LookupError(f"EntryID no encontrado: {entry_id}")
+
+    def folder(self, path: str) -> FakeFolder:
+        """Carpeta por ruta "Inbox\\A\\B", creándola si hace falta (sin costo COM)."""
+        parts = path.split("\\")
+        if parts[0].lower() == "inbox":
+            parts = parts[1:]
+        current = self.inbox
+        for part in parts:
+            current = current.child(part)
+        return current
+
+
+class FakeOutlook:
+    """Equivalente a win32com.client.Dispatch("Outlook.Application")."""
+
+    def __init__(self, latency: float = 0.0, user: str = "Usuario Benchmark"):
+        self._clock = _Clock(latency)
+        self._namespace = FakeNamespace(self._clock, user)
+        self._rng = random.Random(0)
+        self._last_received = datetime(2022, 1, 1, 8, 0)
+        self._generated = 0
+
+    @property
+    def calls(self) -> int:
+        return self._clock.calls
+
+    @property
+    def latency(self) -> float:
+        return self._clock.latency
+
+    @latency.setter
+    def latency(self, value: float):
+        self._clock.latency = value
+
+    def reset_calls(self):
+        self._clock.calls = 0
+
+    def GetNamespace(self, name: str):
+        self._clock.tick()
+        return self._namespace
+
+    @property
+    def namespace(self) -> FakeNamespace:
+        return self._namespace
+
+    # ── Generación de buzones ─────────────────────────────────────────────
+
+    def add_message(self, folder_path: str, sender: str, subject: str,
+                    received: datetime, attachments: list) -> FakeMessage:
+        """attachments: lista de (nombre, bytes)."""
+        folder = self._namespace.folder(folder_path)
+        entry_id = f"MSG{len(folder._messages):08d}@{folder._entry_id}"
+        msg = FakeMessage(
+            self._clock, entry_id, sender, subject, received,
+            [FakeAttachment(self._clock, name, payload) for name, payload in attachments],
+        )
+        folder._messages.append(msg)
+        folder._by_entry_id[entry_id] = msg
+        return msg
+
+    @classmethod
+    def generate(
+        cls,
+        messages: int = 1_000,
+        folder_path: str = DEFAULT_FOLDER,
+        sender: str = DEFAULT_SENDER,
+        sender_ratio: float = 0.9,
+        attachment_bytes: int = 4_096,
+        extra_attachments: float = 0.1,
+        latency: float = 0.0,
+        start: datetime = datetime(2022, 1, 1, 8, 0),
+        seed: int = 2024,
+    ) -> "FakeOutlook":
+        """
+        Buzón con `messages` correos en folder_path, en orden de llegada.
+        Una fracción sender_ratio viene de `sender` con XML + PDF adjuntos;
+        el resto son de otros remitentes. extra_attachments es la fracción de
+        correos con un adjunto adicional que no es XML/PDF (p. ej. un logo).
+        """
+        outlook = cls(latency=0.0)
+        outlook._rng = random.Random(seed)
+        outlook._last_received = start
+        outlook.add_mail(messages, folder_path, sender, sender_ratio, attachment_bytes, extra_attachments)
+        outlook.latency = latency
+        return outlook
+
+    def add_mail(
+        self,
+        messages: int,
+        folder_path: str = DEFAULT_FOLDER,
+        sender: str = DEFAULT_SENDER,
+        sender_ratio: float = 0.9,
+        attachment_bytes: int = 4_096,
+        extra_attachments: float = 0.1,
+    ):
+        """Agrega correos posteriores al último generado (simula correo nuevo)."""
+        rng, received = self._rng, self._last_received
+        for i in range(self._generated, self._generated + messages):
+            received += timedelta(seconds=rng.randint(30, 5_400))
+            if rng.random() < sender_ratio:
+                stem = "".join(rng.choices("0123456789", k=49))
+                # Contenido distinto por correo (incluye la clave), como en la realidad.
+                xml_payload = f'<?xml version="1.0"?><factura clave="{stem}"/>'.encode().ljust(attachment_bytes, b" ")
+                pdf_payload = f"%PDF-1.4\n%{stem}\n".encode().ljust(attachment_bytes, b"\0")
+                files = [(f"{stem}.xml", xml_payload), (f"{stem}.pdf", pdf_payload)]
+                msg_sender, subject = sender, f"Factura electrónica {i + 1:09d}"
+            else:
+                files = [(f"adjunto_{i}.docx", b"PK")]
+                msg_sender, subject = f"otro{i % 37}@example.com", f"Correo {i}"
+            if rng.random() < extra_attachments:
+                files.append(("logo.png", b"\x89PNG"))
+            self.add_message(folder_path, msg_sender, subject, received, files)
+        self._last_received = received
+        self._generated += messages
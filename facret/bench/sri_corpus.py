@@ -0,0 +1,206 @@
+# =============================
+# bench/sri_corpus.py
+# =============================
+"""
+Genera un corpus sintético de comprobantes SRI para benchmarks.
+
+Estructura generada en <destino>:
+    facturas/      factura XML (como las de ETAPA) + RIDE PDF por cada una
+    retenciones/   comprobanteRetencion dentro de <autorizacion><comprobante>
+                   como CDATA (tal como lo entrega el SRI)
+    corpus.json    parámetros usados (para reproducir el corpus)
+
+Incluye, en proporciones configurables:
+  - PDFs con prefijo "RIDE_" (lo que quita remove_prefix_files_pdf)
+  - duplicados exactos con sufijo de fecha, como los que deja el descargador
+    cuando el archivo ya existe
+
+Uso (desde facret/):
+    poetry run python bench/sri_corpus.py /tmp/corpus_10k --facturas 10000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+from datetime import date, timedelta
+
+RUC_ETAPA = "0160000000001"
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+_FACTURA = """<?xml version="1.0" encoding="UTF-8"?>
+<factura id="comprobante" version="1.1.0">
+<infoTributaria><ambiente>2</ambiente><tipoEmision>1</tipoEmision><razonSocial>EMPRESA PUBLICA MUNICIPAL DE TELECOMUNICACIONES, AGUA POTABLE, ALCANTARILLADO Y SANEAMIENTO DE CUENCA ETAPA EP</razonSocial><nombreComercial>ETAPA EP</nombreComercial><ruc>{ruc}</ruc><claveAcceso>{clave}</claveAcceso><codDoc>01</codDoc><estab>{estab}</estab><ptoEmi>{pto}</ptoEmi><secuencial>{sec}</secuencial><dirMatriz>Benigno Malo 7-78 y Presidente Córdova</dirMatriz></infoTributaria>
+<infoFactura><fechaEmision>{fecha}</fechaEmision><dirEstablecimiento>Cuenca</dirEstablecimiento><obligadoContabilidad>SI</obligadoContabilidad><tipoIdentificacionComprador>04</tipoIdentificacionComprador><razonSocialComprador>CLIENTE DE PRUEBA S.A.</razonSocialComprador><identificacionComprador>0190000000001</identificacionComprador><totalSinImpuestos>{total}</totalSinImpuestos><totalDescuento>0.00</totalDescuento><totalConImpuestos><totalImpuesto><codigo>2</codigo><codigoPorcentaje>4</codigoPorcentaje><baseImponible>{total}</baseImponible><valor>{iva}</valor></totalImpuesto></totalConImpuestos><propina>0.00</propina><importeTotal>{importe}</importeTotal><moneda>DOLAR</moneda></infoFactura>
+<detalles>{detalles}</detalles>
+<infoAdicional><campoAdicional nombre="Direccion">Av. Solano y 12 de Abril</campoAdicional><campoAdicional nombre="Email">facturacion@cliente.ec</campoAdicional><campoAdicional nombre="Instalacion">{inst}</campoAdicional><campoAdicional nombre="Periodo">{periodo}</campoAdicional></infoAdicional>
+<ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#" Id="Signature{sec}"><ds:SignedInfo><ds:CanonicalizationMethod Algorithm="http://www.w3.org/TR/2001/REC-xml-c14n-20010315"/><ds:SignatureMethod Algorithm="http://www.w3.org/2000/09/xmldsig#rsa-sha1"/></ds:SignedInfo><ds:SignatureValue>{firma}</ds:SignatureValue><ds:KeyInfo><ds:X509Data><ds:X509Certificate>{cert}</ds:X509Certificate></ds:X509Data></ds:KeyInfo></ds:Signature>
+</factura>
+"""
+
+_DETALLE = (
+    "<detalle><codigoPrincipal>{cod}</codigoPrincipal><descripcion>{desc}</descripcion>"
+    "<cantidad>1.00</cantidad><precioUnitario>{valor}</precioUnitario><descuento>0.00</descuento>"
+    "<precioTotalSinImpuesto>{valor}</precioTotalSinImpuesto></detalle>"
+)
+_CONCEPTOS = ("AGUA POTABLE", "ALCANTARILLADO", "SANEAMIENTO", "CARGO FIJO", "TELEFONIA", "INTERNET")
+
+_RETENCION = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    "<autorizacion><estado>AUTORIZADO</estado><numeroAutorizacion>{clave}</numeroAutorizacion>"
+    "<fechaAutorizacion>{fecha_iso}T10:00:00-05:00</fechaAutorizacion><ambiente>PRODUCCIÓN</ambiente>"
+    '<comprobante><![CDATA[<?xml version="1.0" encoding="UTF-8"?>'
+    '<comprobanteRetencion id="comprobante" version="1.0.0"><infoTributaria><ambiente>2</ambiente>'
+    "<razonSocial>CLIENTE DE PRUEBA S.A.</razonSocial><ruc>0190000000001</ruc><claveAcceso>{clave}</claveAcceso>"
+    "<codDoc>07</codDoc><estab>{estab}</estab><ptoEmi>{pto}</ptoEmi><secuencial>{sec}</secuencial></infoTributaria>"
+    "<infoCompRetencion><fechaEmision>{fecha}</fechaEmision><periodoFiscal>{periodo}</periodoFiscal>"
+    "<razonSocialSujetoRetenido>ETAPA EP</razonSocialSujetoRetenido><identificacionSujetoRetenido>{ruc}"
+    "</identificacionSujetoRetenido></infoCompRetencion><impuestos><impuesto><codigo>1</codigo>"
+    "<codigoRetencion>312</codigoRetencion><baseImponible>{base}</baseImponible><porcentajeRetener>1.75"
+    "</porcentajeRetener><valorRetenido>{valor}</valorRetenido><codDocSustento>01</codDocSustento>"
+    "<numDocSustento>{sustento}</numDocSustento><fechaEmisionDocSustento>{fecha_fac}</fechaEmisionDocSustento>"
+    "</impuesto></impuestos></comprobanteRetencion>]]></comprobante></autorizacion>\n"
+)
+
+_B64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+def _b64(rng: random.Random, n: int) -> str:
+    return "".join(rng.choices(_B64, k=n))
+
+def _clave(rng: random.Random) -> str:
+    return "".join(rng.choices("0123456789", k=49))
+
+def _money(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+def _pdf(rng: random.Random, title: str, size: int) -> bytes:
+    """PDF mínimo válido, rellenado con un stream hasta ~size bytes."""
+    filler = rng.randbytes(max(0, size - 600))
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n" % len(filler) + filler + b"\nendstream",
+        b"<< /Title (" + title.encode("ascii") + b") >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+def generate_corpus(
+    dest: str,
+    facturas: int = 1_000,
+    retenciones: float = 0.5,
+    duplicates: float = 0.02,
+    ride_prefix: float = 0.5,
+    pdf_bytes: int = 8_192,
+    seed: int = 2024,
+) -> dict:
+    """
+    Escribe el corpus en dest (se borra si existe).
+    retenciones, duplicates y ride_prefix son proporciones sobre facturas.
+    Retorna el resumen guardado en corpus.json.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    fac_dir = os.path.join(dest, "facturas")
+    ret_dir = os.path.join(dest, "retenciones")
+    os.makedirs(fac_dir)
+    os.makedirs(ret_dir)
+
+    # ~36 facturas por instalación: una por mes durante tres años.
+    n_inst = max(10, facturas // 36)
+    installations = [str(rng.randint(100000, 999999)) for _ in range(n_inst)]
+    base_cents = [rng.randint(800, 250_000) for _ in range(n_inst)]
+    start = date(2022, 1, 1)
+    estabs = [("001", "010"), ("001", "011"), ("002", "001")]
+
+    fac_files, fac_numbers = [], []
+    for i in range(facturas):
+        k = i % n_inst
+        month = i // n_inst
+        emitted = start + timedelta(days=31 * month + rng.randint(0, 27))
+        estab, pto = estabs[i % len(estabs)]
+        sec = f"{i + 1:09d}"
+        lines = [rng.randint(100, max(101, base_cents[k] // 3)) for _ in range(rng.randint(2, 5))]
+        total = sum(lines)
+        iva = total * 12 // 100
+        clave = _clave(rng)
+        xml = _FACTURA.format(
+            ruc=RUC_ETAPA, clave=clave, estab=estab, pto=pto, sec=sec,
+            fecha=emitted.strftime("%d/%m/%Y"), periodo=emitted.strftime("%m/%Y"),
+            total=_money(total), iva=_money(iva), importe=_money(total + iva),
+            inst=installations[k],
+            detalles="".join(
+                _DETALLE.format(cod=f"C{j:03d}", desc=_CONCEPTOS[j % len(_CONCEPTOS)], valor=_money(v))
+                for j, v in enumerate(lines)
+            ),
+            firma=_b64(rng, 344), cert=_b64(rng, 2400),
+        )
+        stem = clave
+        with open(os.path.join(fac_dir, f"{stem}.xml"), "w", encoding="utf-8") as f:
+            f.write(xml)
+        pdf_name = f"RIDE_{stem}.pdf" if rng.random() < ride_prefix else f"{stem}.pdf"
+        with open(os.path.join(fac_dir, pdf_name), "wb") as f:
+            f.write(_pdf(rng, stem, pdf_bytes))
+        fac_files.append(f"{stem}.xml")
+        fac_files.append(pdf_name)
+        fac_numbers.append((f"{estab}{pto}{sec}", emitted, total))
+
+    n_ret = int(facturas * retenciones)
+    for j, (sustento, emitted, total) in enumerate(rng.sample(fac_numbers, n_ret)):
+        retained = emitted + timedelta(days=rng.randint(1, 5))
+        clave = _clave(rng)
+        with open(os.path.join(ret_dir, f"{clave}.xml"), "w", encoding="utf-8") as f:
+            f.write(_RETENCION.format(
+                clave=clave, fecha_iso=retained.isoformat(), estab="001", pto="001",
+                sec=f"{j + 1:09d}", fecha=retained.strftime("%d/%m/%Y"),
+                periodo=retained.strftime("%m/%Y"), ruc=RUC_ETAPA, base=_money(total),
+                valor=_money(total * 175 // 10_000), sustento=sustento,
+                fecha_fac=emitted.strftime("%d/%m/%Y"),
+            ))
+
+    n_dup = int(facturas * duplicates)
+    for name in rng.sample(fac_files, min(n_dup, len(fac_files))):
+        stem, ext = os.path.splitext(name)
+        shutil.copy2(os.path.join(fac_dir, name), os.path.join(fac_dir, f"{stem}_20240101_120000{ext}"))
+
+    summary = {
+        "facturas": facturas, "retenciones": n_ret, "duplicados": n_dup,
+        "instalaciones": n_inst, "ride_prefix": ride_prefix, "pdf_bytes": pdf_bytes, "seed": seed,
+    }
+    with open(os.path.join(dest, "corpus.json"), "w") as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("dest")
+    ap.add_argument("--facturas", default="1k", help="cantidad o escala: 1k, 10k, 100k")
+    ap.add_argument("--retenciones", type=float, default=0.5)
+    ap.add_argument("--duplicados", type=float, default=0.02)
+    ap.add_argument("--ride", type=float, default=0.5, help="proporción de PDFs con prefijo RIDE_")
+    ap.add_argument("--pdf-bytes", type=int, default=8_192)
+    ap.add_argument("--seed", type=int, default=2024)
+    args = ap.parse_args()
+
+    n = SCALES.get(args.facturas) or int(args.facturas)
+    summary = generate_corpus(
+        args.dest, n, args.retenciones, args.duplicados, args.ride, args.pdf_bytes, args.seed,
+    )
+    print(json.dumps(summary, indent=4))
+
+
+if __name__ == "__main__":
+    main()
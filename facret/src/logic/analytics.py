@@ -0,0 +1,209 @@
+# =============================
+# logic/analytics.py
+# =============================
+"""
+Consumo por instalación y mes, con alertas de anomalías.
+
+Arma una matriz code_inst × mes (centavos de totalSinImpuestos) con NumPy a
+partir de una FacturaTable, sin recorrer los registros en Python, y marca:
+  "pico" / "caida" → |z robusto| ≥ Z_THRESHOLD respecto de la mediana de la
+                     propia instalación (z = 0.6745·(x − mediana) / MAD)
+  "faltante"       → mes sin factura entre la primera y la última facturada
+
+numpy es opcional para el resto de la app; este módulo lo requiere
+(poetry install -E analytics).
+
+Uso headless:
+    from logic.analytics import analyze_store
+    analyze_store()                 # toda la historia del almacén
+    analyze_store(year=2024)
+"""
+import csv
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from logic.facs_manager import LogFn
+from logic.facs_store import DEFAULT_DB_PATH, FacsStore
+from logic.reconcile import REPORTS_DIR
+from models.models import FacturaTable, cents_str
+
+Z_THRESHOLD = 3.5
+# Meses facturados mínimos para que una instalación tenga mediana/MAD confiables.
+MIN_HISTORY = 4
+
+# Constantes de Iglewicz-Hoaglin: 0.6745 ≈ Φ⁻¹(0.75); si MAD = 0 se usa la
+# desviación media absoluta escalada por 1.2533 ≈ √(π/2).
+_MAD_SCALE = 0.6745
+_MEANAD_SCALE = 1.253314
+
+
+@dataclass
+class ConsumptionMatrix:
+    codes: list                  # code_inst por fila
+    months: list                 # "aaaa-mm" por columna
+    cents: object                # ndarray int64 (instalaciones × meses)
+    counts: object               # ndarray int64, facturas por celda
+    zscores: object              # ndarray float64, NaN en meses sin factura
+    medians: object = None       # ndarray float64, mediana mensual por instalación
+    anomalies: list = field(default_factory=list)
+    undated: int = 0
+
+
+def _month_label(index: int) -> str:
+    return f"{index // 12}-{index % 12 + 1:02d}"
+
+
+def build_matrix(table: FacturaTable) -> ConsumptionMatrix:
+    import numpy as np
+
+    cols = table.to_numpy()
+    fecha = cols["fecha"]
+    dated = fecha > 0
+    inst  = cols["inst"][dated]
+    cents = cols["cents"][dated]
+    fecha = fecha[dated]
+
+    codes = list(table.institutions.values)
+    if not len(fecha):
+        empty = np.zeros((len(codes), 0), dtype=np.int64)
+        return ConsumptionMatrix(codes, [], empty, empty, empty.astype(float), undated=len(table))
+
+    month = (fecha // 10000) * 12 + (fecha // 100 % 100) - 1
+    first_month = int(month.min())
+    n_months = int(month.max()) - first_month + 1
+    n_inst = len(codes)
+
+    flat = inst.astype(np.int64) * n_months + (month - first_month)
+    size = n_inst * n_months
+    # bincount con pesos devuelve float64: exacto para sumas < 2**53 centavos.
+    matrix = np.rint(np.bincount(flat, weights=cents, minlength=size)).astype(np.int64)
+    counts = np.bincount(flat, minlength=size).astype(np.int64)
+    matrix = matrix.reshape(n_inst, n_months)
+    counts = counts.reshape(n_inst, n_months)
+
+    result = ConsumptionMatrix(
+        codes=codes,
+        months=[_month_label(first_month + i) for i in range(n_months)],
+        cents=matrix,
+        counts=counts,
+        zscores=None,
+        undated=len(table) - int(dated.sum()),
+    )
+    result.zscores, result.medians = _robust_z(matrix, counts > 0)
+    result.anomalies = _flag(result)
+    return result
+
+
+def _robust_z(matrix, present):
+    """(z, mediana) por fila, calculados solo sobre los meses facturados."""
+    import numpy as np
+
+    # Filas sin ningún mes facturado (solo facturas sin fecha) se evalúan
+    # como ceros para que nanmedian no reciba filas completamente NaN.
+    empty = ~present.any(axis=1)
+    values = np.where(present | empty[:, None], matrix.astype(np.float64), np.nan)
+    med = np.nanmedian(values, axis=1)
+    dev = np.abs(values - med[:, None])
+    mad = np.nanmedian(dev, axis=1) / _MAD_SCALE
+    mean_ad = np.nanmean(dev, axis=1) * _MEANAD_SCALE
+    scale = np.where(mad > 0, mad, mean_ad)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (values - med[:, None]) / scale[:, None]
+    z[(scale == 0) | (present.sum(axis=1) < MIN_HISTORY)] = 0.0
+    z[~present] = np.nan
+    return z, med
+
+
+def _flag(result: ConsumptionMatrix) -> list:
+    import numpy as np
+
+    present = result.counts > 0
+    n_months = present.shape[1]
+    idx = np.arange(n_months)
+    first = np.argmax(present, axis=1)
+    last = n_months - 1 - np.argmax(present[:, ::-1], axis=1)
+    missing = (idx >= first[:, None]) & (idx <= last[:, None]) & ~present
+    missing &= present.any(axis=1)[:, None]
+
+    z = np.nan_to_num(result.zscores, nan=0.0)
+    spikes = z >= Z_THRESHOLD
+    drops = z <= -Z_THRESHOLD
+    medians = result.medians
+
+    anomalies = []
+    for tipo, mask in (("pico", spikes), ("caida", drops), ("faltante", missing)):
+        rows, cols = np.nonzero(mask)
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            anomalies.append({
+                "code_inst":  result.codes[r],
+                "mes":        result.months[c],
+                "tipo":       tipo,
+                "value_serv": cents_str(int(result.cents[r, c])),
+                "mediana":    cents_str(int(round(medians[r]))),
+                "z":          "" if tipo == "faltante" else f"{z[r, c]:.2f}",
+            })
+    anomalies.sort(key=lambda a: (a["code_inst"], a["mes"]))
+    return anomalies
+
+
+# ── Reportes ──────────────────────────────────────────────────────────────────
+
+def write_reports(result: ConsumptionMatrix, reports_dir=REPORTS_DIR) -> list:
+    reports_dir = Path(reports_dir)
+    reports_dir.mkdir(parents=True, exist_ok=True)
+
+    matrix_path = reports_dir / "consumo_instalacion_mes.csv"
+    order = sorted(range(len(result.codes)), key=result.codes.__getitem__)
+    with open(matrix_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["code_inst", *result.months])
+        for r in order:
+            writer.writerow([result.codes[r], *(cents_str(int(v)) for v in result.cents[r])])
+
+    anomalies_path = reports_dir / "consumo_anomalias.csv"
+    with open(anomalies_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["code_inst", "mes", "tipo", "value_serv", "mediana", "z"])
+        writer.writeheader()
+        writer.writerows(result.anomalies)
+    return [matrix_path, anomalies_path]
+
+
+def _require_numpy():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        raise RuntimeError(
+            "El análisis de consumo requiere numpy, que no está instalado: "
+            "poetry install -E analytics"
+        ) from None
+
+
+def analyze_store(
+    log_fn: LogFn = None,
+    year: Optional[int] = None,
+    db_path=DEFAULT_DB_PATH,
+    reports_dir=REPORTS_DIR,
+) -> ConsumptionMatrix:
+    """Analiza las facturas del almacén SQLite (ver process_all_xml_facs(store=True))."""
+    log = log_fn or print
+    _require_numpy()
+    with FacsStore(db_path) as store:
+        table = store.load_table("fac", year)
+    if not len(table):
+        log("El almacén no tiene facturas. Procesa primero los XML con el almacén activo.")
+    result = build_matrix(table)
+    write_reports(result, reports_dir)
+
+    tipos = {}
+    for a in result.anomalies:
+        tipos[a["tipo"]] = tipos.get(a["tipo"], 0) + 1
+    log(
+        f"Consumo: {len(result.codes)} instalación(es) × {len(result.months)} mes(es); "
+        f"{tipos.get('pico', 0)} pico(s), {tipos.get('caida', 0)} caída(s), "
+        f"{tipos.get('faltante', 0)} mes(es) faltante(s)."
+    )
+    if result.undated:
+        log(f"  {result.undated} factura(s) sin fecha de emisión quedaron fuera.")
+    log(f"Reportes en: {reports_dir}")
+    return result
@@ -0,0 +1,219 @@
+# =============================
+# logic/columnar.py
+# =============================
+"""
+Exportación columnar de facturas y retenciones para análisis posteriores.
+
+Con pyarrow instalado se escribe Parquet; si no, un .npz de NumPy sin
+comprimir. En ambos casos los montos van como enteros en centavos (int64) y
+code_inst como diccionario (códigos int32 + tabla de valores únicos).
+
+load_columns() abre el archivo con memory-map: las columnas numéricas se leen
+del disco bajo demanda en lugar de re-parsear el CSV.
+
+pyarrow y numpy son opcionales; se importan solo al usarse.
+"""
+import struct
+import zipfile
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from models.models import _Interned, to_cents
+
+# (columna, tipo): "str" texto, "dict" texto con diccionario, "cents" monto
+FACTURA_COLUMNS = (
+    ("code_inst",  "dict"),
+    ("number_fac", "str"),
+    ("value_serv", "cents"),
+)
+RETENCION_COLUMNS = (
+    ("ret_number", "str"),
+    ("ret_value",  "cents"),
+    ("fac_number", "str"),
+)
+
+_DICT_SUFFIX = "__dict"
+
+
+def columnar_backend() -> Optional[str]:
+    """'parquet', 'npz' o None según las librerías instaladas."""
+    try:
+        import pyarrow  # noqa: F401
+        return "parquet"
+    except ImportError:
+        pass
+    try:
+        import numpy  # noqa: F401
+        return "npz"
+    except ImportError:
+        return None
+
+
+# ── Acumulación ───────────────────────────────────────────────────────────────
+
+class ColumnCollector:
+    """
+    Acumula registros en columnas compactas mientras otro consumidor los
+    recorre: tap() re-emite cada registro, así JSON/CSV y columnar salen de
+    la misma pasada.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._values: dict = {}
+        self._codes: dict = {}
+        for name, kind in spec:
+            if kind == "cents":
+                self._values[name] = array("q")
+            elif kind == "dict":
+                self._values[name] = array("i")
+                self._codes[name] = _Interned()
+            else:
+                self._values[name] = []
+
+    def __len__(self):
+        return len(self._values[self.spec[0][0]])
+
+    def add(self, record: dict):
+        for name, kind in self.spec:
+            value = record[name]
+            if kind == "cents":
+                self._values[name].append(to_cents(value))
+            elif kind == "dict":
+                self._values[name].append(self._codes[name].code(value))
+            else:
+                self._values[name].append(value)
+
+    def tap(self, records: Iterable[dict]) -> Iterator[dict]:
+        for record in records:
+            self.add(record)
+            yield record
+
+    def write(self, base_path: str) -> str:
+        """Escribe base_path.parquet o base_path.npz. Retorna la ruta escrita."""
+        backend = columnar_backend()
+        if backend == "parquet":
+            return self._write_parquet(base_path + ".parquet")
+        if backend == "npz":
+            return self._write_npz(base_path + ".npz")
+        raise RuntimeError("La exportación columnar requiere pyarrow o numpy")
+
+    def _write_parquet(self, path: str) -> str:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrays = {}
+        for name, kind in self.spec:
+            values = self._values[name]
+            if kind == "cents":
+                arrays[name] = pa.array(values, type=pa.int64())
+            elif kind == "dict":
+                arrays[name] = pa.DictionaryArray.from_arrays(
+                    pa.array(values, type=pa.int32()), pa.array(self._codes[name].values, type=pa.string())
+                )
+            else:
+                arrays[name] = pa.array(values, type=pa.string())
+        pq.write_table(pa.table(arrays), path)
+        return path
+
+    def _write_npz(self, path: str) -> str:
+        import numpy as np
+
+        arrays = {}
+        for name, kind in self.spec:
+            values = self._values[name]
+            if kind == "cents":
+                arrays[name] = np.frombuffer(values, dtype=np.int64) if values else np.empty(0, np.int64)
+            elif kind == "dict":
+                arrays[name] = np.frombuffer(values, dtype=np.int32) if values else np.empty(0, np.int32)
+                arrays[name + _DICT_SUFFIX] = np.array(self._codes[name].values, dtype=str)
+            else:
+                arrays[name] = np.array(values, dtype=str)
+        # np.savez guarda sin comprimir (ZIP_STORED): permite memory-map al cargar.
+        np.savez(path, **arrays)
+        return path
+
+
+# ── Carga ─────────────────────────────────────────────────────────────────────
+
+class ColumnTable:
+    """
+    Columnas cargadas: columns[nombre] es un arreglo NumPy (para columnas
+    diccionario, los códigos) y dictionaries[nombre] la tabla de valores.
+    """
+
+    def __init__(self, columns: dict, dictionaries: dict):
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    def decoded(self, name: str):
+        """Valores de texto de una columna diccionario."""
+        return self.dictionaries[name][self.columns[name]]
+
+
+def _npz_memmap(path: str) -> dict:
+    """Mapea cada .npy guardado sin compresión dentro del .npz."""
+    import numpy as np
+    from numpy.lib import format as npy_format
+
+    out = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with zf.open(info) as member:
+                    out[name] = npy_format.read_array(member)
+                continue
+            f.seek(info.header_offset)
+            local = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", local[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = npy_format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = npy_format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = npy_format.read_array_header_2_0(f)
+            if 0 in shape:
+                out[name] = np.empty(shape, dtype=dtype)
+                continue
+            out[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                order="F" if fortran else "C",
+            )
+    return out
+
+def _load_npz(path: str) -> ColumnTable:
+    raw = _npz_memmap(path)
+    dictionaries = {
+        name[: -len(_DICT_SUFFIX)]: raw.pop(name)
+        for name in list(raw)
+        if name.endswith(_DICT_SUFFIX)
+    }
+    return ColumnTable(raw, dictionaries)
+
+def _load_parquet(path: str) -> ColumnTable:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, memory_map=True)
+    columns, dictionaries = {}, {}
+    for name in table.column_names:
+        col = table.column(name).combine_chunks()
+        if pa.types.is_dictionary(col.type):
+            columns[name] = col.indices.to_numpy(zero_copy_only=False)
+            dictionaries[name] = col.dictionary.to_numpy(zero_copy_only=False)
+        else:
+            columns[name] = col.to_numpy(zero_copy_only=False)
+    return ColumnTable(columns, dictionaries)
+
+def load_columns(path: str) -> ColumnTable:
+    """Carga un .parquet o .npz escrito por ColumnCollector."""
+    if path.endswith(".parquet"):
+        return _load_parquet(path)
+    return _load_npz(path)
@@ -0,0 +1,72 @@
+# =============================
+# logic/dashboard.py
+# =============================
+"""
+Resumen para el dashboard (HomePage).
+
+Los contadores por tipo y mes viven en la tabla aggregates del almacén
+(logic/facs_store.py) y se ajustan con cada documento que se guarda o se
+borra, así que abrir la página no recorre carpetas ni cuenta tablas: gui
+reconstruye HomePage en cada navegación y esto responde en milisegundos.
+"""
+import os
+from datetime import datetime
+from typing import Optional
+
+from logic.facs_store import DEFAULT_DB_PATH, FacsStore
+from models.models import cents_str
+
+_TIPOS = {"fac": "Factura", "ret": "Retención"}
+
+
+def _fecha_corta(iso: Optional[str]) -> str:
+    if not iso:
+        return "—"
+    try:
+        return datetime.fromisoformat(iso).strftime("%d/%m/%Y %H:%M")
+    except ValueError:
+        return iso
+
+
+def dashboard_stats(db_path=DEFAULT_DB_PATH) -> dict:
+    stats = {
+        "facturas":        0,
+        "retenciones":     0,
+        "ultima_descarga": "—",
+        "carpeta":         "—",
+        "meses":           [],
+    }
+    if not os.path.exists(db_path):
+        return stats
+    with FacsStore(db_path) as store:
+        stats["facturas"]        = store.count("fac")
+        stats["retenciones"]     = store.count("ret")
+        stats["ultima_descarga"] = _fecha_corta(store.meta("last_download"))
+        folder = store.meta("last_folder")
+        stats["meses"] = [
+            {"mes": month or "—", "facturas": docs, "total": cents_str(cents)}
+            for month, docs, cents in store.monthly_totals("fac")
+        ]
+    if folder:
+        stats["carpeta"] = os.path.basename(folder) or folder
+    return stats
+
+
+def recent_documents(limit: int = 8, db_path=DEFAULT_DB_PATH) -> list:
+    """[{nombre, tipo, fecha}] de los últimos documentos guardados."""
+    if not os.path.exists(db_path):
+        return []
+    with FacsStore(db_path) as store:
+        rows = store.recent(limit)
+    return [
+        {"nombre": number, "tipo": _TIPOS[kind], "fecha": _fecha_corta(updated_at)}
+        for kind, number, _, updated_at in rows
+    ]
+
+
+def record_download(folder: str, total: int, db_path=DEFAULT_DB_PATH):
+    """Registra una descarga de Outlook (fecha, carpeta y archivos)."""
+    with FacsStore(db_path) as store:
+        store.set_meta("last_download", datetime.now().isoformat(timespec="seconds"))
+        store.set_meta("last_download_folder", os.path.abspath(folder))
+        store.set_meta("last_download_files", str(total))
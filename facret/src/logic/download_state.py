@@ -0,0 +1,292 @@
+# =============================
+# logic/download_state.py
+# =============================
+"""
+Estado persistente de las descargas de correo (SQLite).
+
+sync: una fila por (origen, carpeta, remitente) con la marca de agua de la
+última sincronización exitosa (ReceivedTime más reciente procesado y los
+EntryID que comparten ese instante) y el EntryID/StoreID de la carpeta ya
+resuelta, para abrirla directo sin recorrer Folders[...] en cada corrida.
+En IMAP la marca es el UIDVALIDITY del buzón y el último UID procesado.
+
+attachments: registro de adjuntos ya descargados, por (origen, EntryID del
+mensaje, índice del adjunto, carpeta de destino) con el hash del contenido y
+el archivo donde quedó. Permite saltar un adjunto antes de SaveAsFile y
+descartar copias con el mismo contenido aunque lleguen en otro correo.
+
+messages: correos ya procesados completos (todos sus adjuntos) por carpeta
+de destino; en una nueva corrida sin marca de agua se saltan sin abrir los
+adjuntos.
+
+Todo vale solo para la carpeta de destino de la corrida y mientras el
+archivo registrado siga ahí: descargar a otra carpeta, o borrar un archivo
+descargado, hace que se vuelva a bajar.
+"""
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_STATE_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "exports" / "downloads.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync (
+    source        TEXT NOT NULL,
+    folder        TEXT NOT NULL,
+    sender        TEXT NOT NULL,
+    folder_id     TEXT,
+    store_id      TEXT,
+    watermark     TEXT,
+    watermark_ids TEXT,
+    uid_validity  INTEGER,
+    last_uid      INTEGER,
+    updated_at    TEXT NOT NULL,
+    PRIMARY KEY (source, folder, sender)
+);
+
+CREATE TABLE IF NOT EXISTS attachments (
+    source        TEXT    NOT NULL,
+    entry_id      TEXT    NOT NULL,
+    att_index     INTEGER NOT NULL,
+    dest          TEXT    NOT NULL,
+    sha256        TEXT    NOT NULL,
+    filename      TEXT    NOT NULL,
+    saved_as      TEXT,
+    downloaded_at TEXT    NOT NULL,
+    PRIMARY KEY (source, entry_id, att_index, dest)
+);
+CREATE INDEX IF NOT EXISTS ix_attachments_hash ON attachments (sha256, dest);
+
+CREATE TABLE IF NOT EXISTS messages (
+    source       TEXT    NOT NULL,
+    entry_id     TEXT    NOT NULL,
+    dest         TEXT    NOT NULL,
+    attachments  INTEGER NOT NULL,
+    processed_at TEXT    NOT NULL,
+    PRIMARY KEY (source, entry_id, dest)
+);
+"""
+
+
+@dataclass
+class SyncState:
+    folder_id: Optional[str] = None
+    store_id: Optional[str] = None
+    watermark: Optional[datetime] = None
+    # EntryIDs ya procesados con ReceivedTime == watermark: el filtro usa
+    # ">=" para no perder correos del mismo instante y estos se saltan.
+    watermark_ids: list = field(default_factory=list)
+    # IMAP: los UID solo valen mientras el buzón conserve su UIDVALIDITY.
+    uid_validity: Optional[int] = None
+    last_uid: int = 0
+
+
+class RenameLog:
+    """
+    Archivos ya descargados que otro hilo renombra durante la descarga
+    (logic/ingest.py). Quien renombra lo hace dentro de `with log:` y lo anota
+    con add(); el descargador toma el mismo lock para aplicar los pendientes
+    (take → DownloadState.relocate) y ubicar el adjunto, así el registro nunca
+    apunta a un nombre que ya no existe mientras busca el contenido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: list = []
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+    def add(self, src: str, dst: str):
+        """Con el lock tomado."""
+        self._pending.append((src, dst))
+
+    def take(self) -> list:
+        """Con el lock tomado: los renombrados pendientes, en orden."""
+        pending, self._pending = self._pending, []
+        return pending
+
+
+class DownloadState:
+    def __init__(self, db_path=DEFAULT_STATE_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._migrate()
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _columns(self, table: str) -> set:
+        return {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+
+    def _migrate(self):
+        # Bases creadas antes de las columnas de IMAP.
+        columns = self._columns("sync")
+        if columns:
+            for column in ("uid_validity", "last_uid"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE sync ADD COLUMN {column} INTEGER")
+        # Bases creadas antes de la carpeta de destino: la clave primaria
+        # cambia, así que las tablas se recrean. El destino de un adjunto es la
+        # carpeta de saved_as; los correos sin adjuntos registrados se olvidan
+        # (solo se vuelven a abrir, los adjuntos se saltan igual).
+        if self._columns("attachments") and "dest" not in self._columns("attachments"):
+            rows = self._conn.execute(
+                "SELECT source, entry_id, att_index, sha256, filename, saved_as, downloaded_at "
+                "FROM attachments WHERE saved_as IS NOT NULL"
+            ).fetchall()
+            messages = self._conn.execute("SELECT source, entry_id, attachments, processed_at FROM messages").fetchall()
+            self._conn.execute("DROP TABLE attachments")
+            self._conn.execute("DROP TABLE messages")
+            self._conn.executescript(_SCHEMA)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO attachments "
+                "(source, entry_id, att_index, dest, sha256, filename, saved_as, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(src, eid, idx, os.path.dirname(os.path.abspath(saved)), sha, name, os.path.abspath(saved), at)
+                 for src, eid, idx, sha, name, saved, at in rows],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages (source, entry_id, dest, attachments, processed_at) "
+                "SELECT DISTINCT ?, ?, dest, ?, ? FROM attachments WHERE source = ? AND entry_id = ?",
+                [(src, eid, n, at, src, eid) for src, eid, n, at in messages],
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Los registros de adjuntos se confirman en bloque: al guardar la marca
+        # de agua o al cerrar, aunque la corrida se haya cortado a la mitad.
+        self._conn.commit()
+        self._conn.close()
+
+    # ── Sincronización por carpeta/remitente ──────────────────────────────
+
+    def get_sync(self, source: str, folder: str, sender: str) -> SyncState:
+        row = self._conn.execute(
+            "SELECT folder_id, store_id, watermark, watermark_ids, uid_validity, last_uid FROM sync "
+            "WHERE source = ? AND folder = ? AND sender = ?",
+            (source, folder, sender.lower()),
+        ).fetchone()
+        if row is None:
+            return SyncState()
+        folder_id, store_id, watermark, ids, uid_validity, last_uid = row
+        return SyncState(
+            folder_id=folder_id,
+            store_id=store_id,
+            watermark=datetime.fromisoformat(watermark) if watermark else None,
+            watermark_ids=json.loads(ids) if ids else [],
+            uid_validity=uid_validity,
+            last_uid=last_uid or 0,
+        )
+
+    def save_sync(self, source: str, folder: str, sender: str, state: SyncState):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync "
+                "(source, folder, sender, folder_id, store_id, watermark, watermark_ids, "
+                "uid_validity, last_uid, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    source, folder, sender.lower(), state.folder_id, state.store_id,
+                    state.watermark.isoformat() if state.watermark else None,
+                    json.dumps(state.watermark_ids),
+                    state.uid_validity, state.last_uid,
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+
+    def reset_sync(self, source: str, folder: Optional[str] = None) -> int:
+        """Olvida la marca de agua (la próxima corrida vuelve a recorrer todo)."""
+        with self._conn:
+            if folder is None:
+                cur = self._conn.execute("DELETE FROM sync WHERE source = ?", (source,))
+            else:
+                cur = self._conn.execute("DELETE FROM sync WHERE source = ? AND folder = ?", (source, folder))
+        return cur.rowcount
+
+    # ── Registro de adjuntos ──────────────────────────────────────────────
+    # dest es la carpeta de descarga de la corrida; las rutas se guardan
+    # absolutas.
+
+    def seen_attachment(self, source: str, entry_id: str, index: int, dest: str) -> bool:
+        """El adjunto ya se descargó a dest y el archivo sigue ahí."""
+        row = self._conn.execute(
+            "SELECT saved_as FROM attachments WHERE source = ? AND entry_id = ? AND att_index = ? AND dest = ?",
+            (source, entry_id, index, os.path.abspath(dest)),
+        ).fetchone()
+        return row is not None and os.path.exists(row[0])
+
+    def saved_with_hash(self, digest: str, dest: str) -> Optional[str]:
+        """Ruta de un archivo ya descargado a dest con ese contenido, si todavía existe."""
+        rows = self._conn.execute(
+            "SELECT saved_as FROM attachments WHERE sha256 = ? AND dest = ?", (digest, os.path.abspath(dest))
+        )
+        for (path,) in rows:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def relocate(self, moves: list):
+        """moves: [(ruta anterior, ruta nueva)] de archivos renombrados después de descargar."""
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE attachments SET saved_as = ? WHERE saved_as = ?",
+                [(os.path.abspath(new), os.path.abspath(old)) for old, new in moves],
+            )
+
+    def record_attachment(
+        self, source: str, entry_id: str, index: int, dest: str, digest: str, filename: str, saved_as: str,
+    ):
+        """
+        saved_as: archivo con ese contenido en dest; si ya estaba descargado
+        (otro correo, mismo archivo) es la copia existente, no una nueva.
+        """
+        self._conn.execute(
+            "INSERT OR REPLACE INTO attachments "
+            "(source, entry_id, att_index, dest, sha256, filename, saved_as, downloaded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (source, entry_id, index, os.path.abspath(dest), digest, filename, os.path.abspath(saved_as),
+             datetime.now().isoformat(timespec="seconds")),
+        )
+
+    def processed_message(self, source: str, entry_id: str, dest: str) -> Optional[int]:
+        """
+        Cantidad de adjuntos del correo si ya se procesó completo hacia dest y
+        sus archivos siguen ahí; None si no (se vuelve a abrir).
+        """
+        dest = os.path.abspath(dest)
+        row = self._conn.execute(
+            "SELECT attachments FROM messages WHERE source = ? AND entry_id = ? AND dest = ?",
+            (source, entry_id, dest),
+        ).fetchone()
+        if row is None:
+            return None
+        saved = self._conn.execute(
+            "SELECT saved_as FROM attachments WHERE source = ? AND entry_id = ? AND dest = ?",
+            (source, entry_id, dest),
+        )
+        if not all(os.path.exists(path) for (path,) in saved):
+            return None
+        return row[0]
+
+    def record_message(self, source: str, entry_id: str, dest: str, attachments: int):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO messages (source, entry_id, dest, attachments, processed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (source, entry_id, os.path.abspath(dest), attachments, datetime.now().isoformat(timespec="seconds")),
+        )
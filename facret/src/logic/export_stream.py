@@ -0,0 +1,114 @@
+# =============================
+# logic/export_stream.py
+# =============================
+"""
+Exportación en streaming de registros (dicts planos) a JSON / NDJSON + CSV.
+
+Los registros se escriben a medida que llegan, sin armar la lista completa.
+Para ordenar más registros de los que caben en memoria, external_sort vuelca
+corridas ordenadas a archivos temporales y las mezcla con heapq.merge.
+
+Formatos JSON:
+  "indent"  → igual byte a byte a json.dump(lista, f, indent=4) (por defecto)
+  "compact" → arreglo JSON sin espacios
+  "ndjson"  → un objeto por línea, archivo .ndjson
+"""
+import csv
+import heapq
+import json
+import tempfile
+from typing import Callable, Iterable, Iterator
+
+JSON_FORMATS = ("indent", "compact", "ndjson")
+
+# Registros que se ordenan en memoria antes de volcar una corrida a disco.
+SORT_BUFFER_RECORDS = 100_000
+
+
+# ── Ordenamiento externo ──────────────────────────────────────────────────────
+
+def _spill(buffer: list, key: Callable):
+    buffer.sort(key=key)
+    run = tempfile.TemporaryFile("w+", encoding="utf-8")
+    for record in buffer:
+        run.write(json.dumps(record, ensure_ascii=False) + "\n")
+    run.seek(0)
+    buffer.clear()
+    return run
+
+def _read_run(run) -> Iterator[dict]:
+    for line in run:
+        yield json.loads(line)
+
+def external_sort(
+    records: Iterable[dict],
+    key: Callable,
+    max_in_memory: int = SORT_BUFFER_RECORDS,
+) -> Iterator[dict]:
+    """
+    Ordenamiento estable por key. Si hay más de max_in_memory registros, cada
+    bloque se ordena y se vuelca a un temporal; heapq.merge mantiene la
+    estabilidad porque las corridas se mezclan en el orden en que se generaron.
+    """
+    buffer: list = []
+    runs: list = []
+    try:
+        for record in records:
+            buffer.append(record)
+            if len(buffer) >= max_in_memory:
+                runs.append(_spill(buffer, key))
+        buffer.sort(key=key)
+        if not runs:
+            yield from buffer
+            return
+        yield from heapq.merge(*(_read_run(run) for run in runs), buffer, key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+
+# ── Escritores ────────────────────────────────────────────────────────────────
+
+def json_path_for(base_path: str, json_format: str) -> str:
+    return base_path + (".ndjson" if json_format == "ndjson" else ".json")
+
+def _indent_json(record: dict) -> str:
+    body = json.dumps(record, indent=4)
+    return "\n".join("    " + line for line in body.splitlines())
+
+def write_records(records: Iterable[dict], base_path: str, json_format: str = "indent") -> int:
+    """
+    Escribe base_path.json (o .ndjson) y base_path.csv en una sola pasada.
+    Igual que save_to_csv, el CSV solo se crea si hay al menos un registro.
+    Retorna la cantidad de registros escritos.
+    """
+    if json_format not in JSON_FORMATS:
+        raise ValueError(f"Formato JSON no soportado: {json_format}")
+    csv_path = base_path + ".csv"
+    count = 0
+    csv_file = writer = None
+    try:
+        with open(json_path_for(base_path, json_format), "w") as jf:
+            for record in records:
+                if json_format == "ndjson":
+                    jf.write(json.dumps(record) + "\n")
+                elif json_format == "compact":
+                    jf.write(("," if count else "[") + json.dumps(record, separators=(",", ":")))
+                else:
+                    jf.write((",\n" if count else "[\n") + _indent_json(record))
+
+                if writer is None:
+                    csv_file = open(csv_path, "w", newline="")
+                    writer = csv.writer(csv_file)
+                    writer.writerow(list(record.keys()))
+                writer.writerow(record.values())
+                count += 1
+
+            if json_format == "compact":
+                jf.write("]" if count else "[]")
+            elif json_format == "indent":
+                jf.write("\n]" if count else "[]")
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+    return count
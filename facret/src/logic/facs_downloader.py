@@ -2,75 +2,254 @@
 # logic/facs_downloader.py
 # =============================
 """
-Descargador de facturas ETAPA via Outlook local.
-No requiere cuenta Microsoft paga ni configuración de Azure.
-Solo necesita Outlook instalado y configurado con la cuenta.
+Descargador de facturas ETAPA.
+
+El correo llega desde un origen de logic/mail_sources.py: Outlook local vía
+COM (por defecto; no requiere cuenta Microsoft paga ni Azure, solo Outlook
+instalado y configurado), un buzón IMAP, o correo exportado en carpetas .eml,
+Maildir o mbox; IMAP y los exportados corren sin Windows.
+
+Sincronización incremental (Outlook): el filtro por remitente y por
+ReceivedTime se hace en Outlook a partir de la marca de agua de la última
+corrida exitosa, guardada en logic/download_state.py junto con el EntryID de
+la carpeta. Una corrida diaria solo toca los correos nuevos. En IMAP la marca
+es el UIDVALIDITY del buzón y el último UID procesado.
+
+Duplicados: cada adjunto descargado queda en el registro de
+logic/download_state.py (EntryID + índice + hash del contenido, por
+carpeta de destino), y cada correo procesado completo también. En una nueva
+corrida el correo ya procesado se salta sin abrir sus adjuntos y el adjunto
+ya registrado antes de SaveAsFile, mientras sus archivos sigan en la
+carpeta; si el contenido ya está en la carpeta (otro correo, mismo archivo)
+no se guarda otra copia. Solo una colisión real de nombre con contenido
+distinto se conserva, con un sufijo del hash.
+
+Sin interfaz (desde src/):
+    python -m logic.facs_downloader /exportes/etapa --dest /datos/facturas --process
+    FACRET_IMAP_PASSWORD=... python -m logic.facs_downloader --imap-host imap.ejemplo.com \
+        --imap-user facturas@ejemplo.com --mailbox INBOX/ETAPA --dest /datos/facturas
 """
+import argparse
+import itertools
 import os
+import tempfile
+from contextlib import nullcontext
 from pathlib import Path
-from datetime import datetime
 from typing import Callable, Optional
 
+from logic.dashboard import record_download
+from logic.download_state import DEFAULT_STATE_PATH, DownloadState, RenameLog
+from logic.facs_manager import get_file_hash
+from logic.mail_sources import ENUMERATIONS, SOURCES, MailSource, OutlookSource, open_source
+
+DEFAULT_FOLDER = "Inbox\\CONTRACT\\ETAPA\\FACS"
+DEFAULT_SENDER = "info@comunicados-etapa.com"
+
+
+def _relocate(state: DownloadState, renames: RenameLog):
+    """Con el lock de renames tomado."""
+    moves = renames.take()
+    if moves:
+        state.relocate(moves)
+
 
 class DescargadorFacturas:
-    def __init__(self, log_callback: Optional[Callable[[str], None]] = None):
+    def __init__(
+        self,
+        log_callback: Optional[Callable[[str], None]] = None,
+        outlook=None,
+        state_path=DEFAULT_STATE_PATH,
+        source: Optional[MailSource] = None,
+    ):
+        """
+        source: origen de correo (logic/mail_sources.py). Si no se pasa, se usa
+        Outlook: la instancia outlook dada o una nueva vía win32com.
+        """
         self._log = log_callback or print
-
-        import win32com.client
-        self._log("🔄 Conectando a Outlook...")
-        self.outlook = win32com.client.Dispatch("Outlook.Application")
-        self.namespace = self.outlook.GetNamespace("MAPI")
-        self._log(f"✅ Conectado a Outlook")
-        self._log(f"📧 Usuario: {self.namespace.CurrentUser.Name}")
+        self.state_path = state_path
+        self.source = source or OutlookSource(outlook, log_fn=self._log)
 
     def descargar_facturas_etapa(
         self,
-        carpeta_outlook: str = "Inbox\\CONTRACT\\ETAPA\\FACS",
+        carpeta_outlook: str = DEFAULT_FOLDER,
         carpeta_guardar: str = "D:\\Facturas_ETAPA",
-        correo_remitente: str = "info@comunicados-etapa.com",
+        correo_remitente: str = DEFAULT_SENDER,
+        incremental: bool = True,
+        on_saved: Optional[Callable[[str], None]] = None,
+        renames: Optional[RenameLog] = None,
     ) -> int:
+        """
+        carpeta_outlook solo aplica a Outlook; los demás orígenes leen su
+        ruta o buzón. incremental=False ignora la marca de agua y recorre toda la
+        carpeta (la marca se actualiza igual al terminar). on_saved recibe la
+        ruta de cada archivo nuevo apenas se guarda (ver logic/ingest.py).
+        renames: archivos que otro hilo renombra en carpeta_guardar mientras
+        tanto; se aplican al registro antes de cada correo y de ubicar cada
+        adjunto.
+        """
         Path(carpeta_guardar).mkdir(parents=True, exist_ok=True)
-
-        folder = self._get_folder(carpeta_outlook)
-        total = 0
-
-        self._log(f"🔍 Buscando facturas en: {carpeta_outlook}")
-
-        for message in folder.Items:
-            if correo_remitente.lower() not in message.SenderEmailAddress.lower():
-                continue
-
-            for attachment in message.Attachments:
-                filename = attachment.FileName
-
-                if not (filename.endswith(".xml") or filename.endswith(".pdf")):
-                    continue
-
-                filepath = os.path.join(carpeta_guardar, filename)
-
-                if os.path.exists(filepath):
-                    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    name, ext = os.path.splitext(filename)
-                    filename = f"{name}_{ts}{ext}"
-                    filepath = os.path.join(carpeta_guardar, filename)
-
-                attachment.SaveAsFile(filepath)
-                total += 1
-                self._log(f"✅ Descargado: {filename}")
-
+        source = self.source
+
+        with DownloadState(self.state_path) as state:
+            sync = state.get_sync(source.name, carpeta_outlook, correo_remitente)
+            since = sync.watermark if incremental and source.incremental else None
+            total = skipped = 0
+
+            location = source.describe(carpeta_outlook)
+            if since:
+                self._log(f"🔍 Buscando facturas en: {location} (desde {since:%d/%m/%Y %H:%M})")
+            else:
+                self._log(f"🔍 Buscando facturas en: {location}")
+
+            candidates = source.messages(
+                carpeta_outlook, correo_remitente, sync, since,
+                processed=lambda entry_id: state.processed_message(source.name, entry_id, carpeta_guardar) is not None,
+            )
+            high, high_ids = sync.watermark, set(sync.watermark_ids)
+
+            for received, entry_id, message in candidates:
+                if message is not None:
+                    entry_id = entry_id or message.EntryID
+                    if renames is not None:
+                        with renames:
+                            _relocate(state, renames)
+                    done = state.processed_message(source.name, entry_id, carpeta_guardar)
+                    if done is not None:
+                        skipped += done
+                    else:
+                        saved, dup = self._save_attachments(
+                            message, entry_id, carpeta_guardar, state, on_saved, renames
+                        )
+                        state.record_message(source.name, entry_id, carpeta_guardar, saved + dup)
+                        total += saved
+                        skipped += dup
+
+                if high is None or received > high:
+                    high, high_ids = received, set()
+                if received == high and entry_id:
+                    high_ids.add(entry_id)
+
+            if source.incremental:
+                sync.watermark, sync.watermark_ids = high, sorted(high_ids)
+                state.save_sync(source.name, carpeta_outlook, correo_remitente, sync)
+
+        if skipped:
+            self._log(f"♻️ {skipped} adjunto(s) ya descargado(s), omitido(s)")
         self._log(f"✨ Total: {total} archivos descargados")
         self._log(f"📂 Guardados en: {carpeta_guardar}")
+        try:
+            record_download(carpeta_guardar, total)
+        except Exception as e:
+            self._log(f"⚠️ No se pudo actualizar el resumen: {e}")
         return total
 
-    def _get_folder(self, folder_path: str):
-        """Navega a una subcarpeta de Outlook dada una ruta separada por \\"""
-        parts = folder_path.split("\\")
-        current = self.namespace.GetDefaultFolder(6)  # 6 = Inbox
+    def _save_attachments(
+        self, message, entry_id, carpeta_guardar: str, state: DownloadState, on_saved=None, renames=None,
+    ):
+        """Retorna (adjuntos guardados, adjuntos omitidos por ya descargados)."""
+        saved = skipped = 0
+        for index, attachment in enumerate(message.Attachments, start=1):
+            if state.seen_attachment(self.source.name, entry_id, index, carpeta_guardar):
+                skipped += 1
+                continue
 
-        if parts[0].lower() == "inbox":
-            parts = parts[1:]
+            filename = attachment.FileName
 
-        for part in parts:
-            current = current.Folders[part]
+            if not (filename.endswith(".xml") or filename.endswith(".pdf")):
+                continue
 
-        return current
+            fd, tmp = tempfile.mkstemp(prefix=".descarga_", suffix=".partial", dir=carpeta_guardar)
+            os.close(fd)
+            try:
+                attachment.SaveAsFile(tmp)
+                digest = get_file_hash(tmp)
+                with renames or nullcontext():
+                    if renames is not None:
+                        _relocate(state, renames)
+                    filepath, new = self._place(tmp, filename, digest, carpeta_guardar, state)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+            state.record_attachment(self.source.name, entry_id, index, carpeta_guardar, digest, filename, filepath)
+            if not new:
+                skipped += 1
+                continue
+            saved += 1
+            self._log(f"✅ Descargado: {os.path.basename(filepath)}")
+            if on_saved is not None:
+                on_saved(filepath)
+        return saved, skipped
+
+    @staticmethod
+    def _place(tmp: str, filename: str, digest: str, carpeta_guardar: str, state: DownloadState):
+        """
+        Mueve tmp a su nombre final. Retorna (ruta, nuevo): si el contenido ya
+        estaba descargado, la ruta existente y nuevo=False.
+        """
+        existing = state.saved_with_hash(digest, carpeta_guardar)
+        if existing:
+            return existing, False
+        # Ante una colisión de nombre se prueba con sufijo del hash; un archivo
+        # existente solo cuenta como el mismo si su contenido coincide.
+        name, ext = os.path.splitext(filename)
+        candidates = itertools.chain(
+            (filename, f"{name}_{digest[:8]}{ext}"),
+            (f"{name}_{digest[:8]}_{n}{ext}" for n in itertools.count(2)),
+        )
+        for candidate in candidates:
+            filepath = os.path.join(carpeta_guardar, candidate)
+            if not os.path.exists(filepath):
+                os.replace(tmp, filepath)
+                return filepath, True
+            if get_file_hash(filepath) == digest:
+                return filepath, False
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Descarga facturas ETAPA desde un origen de correo.")
+    ap.add_argument("path", nargs="?", help="carpeta .eml / Maildir / mbox (no aplica a Outlook)")
+    ap.add_argument("--source", default="auto", choices=("auto",) + SOURCES)
+    ap.add_argument("--dest", required=True, help="carpeta de descarga")
+    ap.add_argument("--sender", default=DEFAULT_SENDER)
+    ap.add_argument("--folder", default=DEFAULT_FOLDER, help="carpeta de Outlook")
+    ap.add_argument("--enumeration", default="table", choices=ENUMERATIONS, help="solo Outlook")
+    ap.add_argument("--imap-host", help="servidor IMAP (la contraseña se lee de FACRET_IMAP_PASSWORD)")
+    ap.add_argument("--imap-user")
+    ap.add_argument("--imap-port", type=int)
+    ap.add_argument("--imap-no-ssl", action="store_true")
+    ap.add_argument("--mailbox", default="INBOX", help="buzón IMAP")
+    ap.add_argument("--full", action="store_true", help="ignorar la marca de agua")
+    ap.add_argument("--process", action="store_true", help="procesar cada factura al descargarla (logic/ingest.py)")
+    args = ap.parse_args()
+
+    kind = args.source
+    if kind == "auto" and not args.path:
+        kind = "imap" if args.imap_host else "outlook"
+    options = {}
+    if kind == "outlook":
+        options = {"enumeration": args.enumeration}
+    elif kind == "imap":
+        if not (args.imap_host and args.imap_user):
+            ap.error("--source imap necesita --imap-host y --imap-user")
+        password = os.environ.get("FACRET_IMAP_PASSWORD")
+        if password is None:
+            import getpass
+            password = getpass.getpass(f"Contraseña IMAP de {args.imap_user}: ")
+        options = dict(host=args.imap_host, user=args.imap_user, password=password, mailbox=args.mailbox,
+                       port=args.imap_port, ssl=not args.imap_no_ssl)
+    source = open_source(kind, args.path, log_fn=print, **options)
+    descargador = DescargadorFacturas(print, source=source)
+    options = dict(carpeta_outlook=args.folder, correo_remitente=args.sender, incremental=not args.full)
+    try:
+        if args.process:
+            from logic.ingest import download_and_ingest
+            download_and_ingest(descargador, args.dest, print, **options)
+        else:
+            descargador.descargar_facturas_etapa(carpeta_guardar=args.dest, **options)
+    finally:
+        source.close()
+
+
+if __name__ == "__main__":
+    main()
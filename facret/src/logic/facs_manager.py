@@ -13,10 +13,22 @@ import hashlib
 import json
 import os
 import platform
+import shutil
 import subprocess
-import xml.etree.ElementTree as ET
+import tempfile
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from operator import itemgetter
 from typing import Callable, Optional
 
+from logic.columnar import FACTURA_COLUMNS, RETENCION_COLUMNS, ColumnCollector, columnar_backend
+from logic.export_stream import SORT_BUFFER_RECORDS, external_sort, json_path_for, write_records
+from logic.facs_store import FacsStore
+from logic.parse_cache import DEFAULT_CACHE_PATH, ParseCache, file_signature
+from logic.xml_schema import extract_document
 from models.models import Factura, Retencion
 
 LogFn = Optional[Callable[[str], None]]
@@ -69,54 +81,174 @@ def remove_prefix_files_pdf(folder: str, prefix: str, log_fn: LogFn = None):
 
 # ── XML utilities ─────────────────────────────────────────────────────────────
 
-def replace_string_onxml(filexml: str, ssearch: str, sreplace: str = ""):
+# Tabla de reemplazos de clean_xml_files, aplicada en orden sobre cada archivo.
+RET_CLEAN_REPLACEMENTS = (
+    ("&gt;", ">"),
+    ("&lt;", "<"),
+    (
+        '<![CDATA[<?xml version="1.0" encoding="UTF-8"?>'
+        '<comprobanteRetencion id="comprobante" version="1.0.0">',
+        "",
+    ),
+    ("</comprobanteRetencion>]]>", ""),
+)
+
+def atomic_write_text(path: str, content: str):
+    """Escribe en un temporal de la misma carpeta y lo mueve con os.replace."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
     try:
-        with open(filexml, "r+", encoding="utf-8") as f:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def apply_replacements_onxml(filexml: str, replacements, log_fn: LogFn = None) -> bool:
+    """Aplica toda la tabla de reemplazos en una lectura. Retorna True si reescribió el archivo."""
+    try:
+        with open(filexml, "r", encoding="utf-8", newline="") as f:
             content = f.read()
-            new_content = content.replace(ssearch, sreplace)
-            if new_content != content:
-                f.seek(0)
-                f.write(new_content)
-                f.truncate()
+        new_content = content
+        for ssearch, sreplace in replacements:
+            new_content = new_content.replace(ssearch, sreplace)
+        if new_content == content:
+            return False
+        atomic_write_text(filexml, new_content)
+        return True
     except Exception as e:
-        print(f"Error procesando {filexml}: {e}")
+        _log(f"Error procesando {filexml}: {e}", log_fn)
+        return False
+
+def replace_string_onxml(filexml: str, ssearch: str, sreplace: str = ""):
+    apply_replacements_onxml(filexml, ((ssearch, sreplace),))
 
 def replace_in_all_xml_files(folder: str, ssearch: str, sreplace: str = ""):
     for archivo in get_files_extension(folder, ".xml"):
         replace_string_onxml(os.path.join(folder, archivo), ssearch, sreplace)
 
-def clean_xml_files(folder: str):
-    """Normaliza entidades HTML y elimina envolturas CDATA en XMLs de retenciones."""
-    replace_in_all_xml_files(folder, "&gt;", ">")
-    replace_in_all_xml_files(folder, "&lt;", "<")
-    replace_in_all_xml_files(
-        folder,
-        '<![CDATA[<?xml version="1.0" encoding="UTF-8"?>'
-        '<comprobanteRetencion id="comprobante" version="1.0.0">',
-    )
-    replace_in_all_xml_files(folder, "</comprobanteRetencion>]]>")
+def clean_xml_files(folder: str, log_fn: LogFn = None) -> int:
+    """
+    Normaliza entidades HTML y elimina envolturas CDATA en XMLs de retenciones.
+    Una sola lectura por archivo; solo se reescriben los que cambian.
+    """
+    cleaned = 0
+    for archivo in get_files_extension(folder, ".xml"):
+        if apply_replacements_onxml(os.path.join(folder, archivo), RET_CLEAN_REPLACEMENTS, log_fn):
+            cleaned += 1
+    return cleaned
 
 
 # ── Hash / deduplicación ──────────────────────────────────────────────────────
 
-def get_file_hash(file_path: str) -> str:
+# Deduplicación por etapas: solo se leen los archivos que podrían ser iguales.
+#   1. Tamaño (un solo os.scandir): tamaños únicos no pueden tener duplicado.
+#   2. Hash parcial (primeros + últimos PARTIAL_HASH_BYTES) para los que colisionan.
+#   3. Hash completo solo para los que siguen empatados.
+# Los hashes se calculan en un pool de hilos: hashlib libera el GIL al procesar
+# cada bloque, así que la lectura y el hash de varios archivos se solapan.
+# Para dedupe basta un digest no criptográfico rápido: "blake2b" o "xxh3"
+# (este último requiere el paquete opcional xxhash).
+
+PARTIAL_HASH_BYTES = 4 * 1024
+HASH_ALGORITHMS    = ("sha256", "blake2b", "xxh3")
+DEFAULT_HASH       = "sha256"
+HASH_WORKERS       = 4
+
+def _hash_factory(algorithm: str):
+    if algorithm == "xxh3":
+        try:
+            import xxhash
+        except ImportError:
+            raise ValueError("El digest xxh3 requiere el paquete xxhash") from None
+        return xxhash.xxh3_128
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Digest no soportado: {algorithm}")
+    return partial(hashlib.new, algorithm)
+
+def get_file_hash(file_path: str, algorithm: str = DEFAULT_HASH) -> str:
+    """Hash del archivo completo leído por bloques (sin cargarlo entero en memoria)."""
     with open(file_path, "rb") as f:
-        return hashlib.sha256(f.read()).hexdigest()
-
-def remove_duplicate_files(folder: str, log_fn: LogFn = None):
-    """Elimina duplicados por hash SHA-256, conservando el archivo más antiguo."""
-    files = os.listdir(folder)
-    grouped: dict = {}
-    for name in files:
-        path = os.path.join(folder, name)
-        h = get_file_hash(path)
-        grouped.setdefault(h, []).append(path)
+        return hashlib.file_digest(f, _hash_factory(algorithm)).hexdigest()
 
+def get_partial_hash(file_path: str, size: int, algorithm: str = DEFAULT_HASH) -> str:
+    """Hash de los extremos del archivo. Si size <= 2 bloques cubre el archivo completo."""
+    h = _hash_factory(algorithm)()
+    with open(file_path, "rb") as f:
+        h.update(f.read(PARTIAL_HASH_BYTES))
+        if size > 2 * PARTIAL_HASH_BYTES:
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+        h.update(f.read(PARTIAL_HASH_BYTES))
+    return h.hexdigest()
+
+def _regroup(groups, key_fn, pool) -> list:
+    """Subdivide cada grupo por key_fn y descarta los subgrupos de un solo archivo."""
+    flat = [entry for group in groups for entry in group]
+    keys = iter(pool.map(key_fn, flat))
+    result = []
+    for group in groups:
+        by_key: dict = {}
+        for entry in group:
+            by_key.setdefault(next(keys), []).append(entry)
+        result.extend(g for g in by_key.values() if len(g) > 1)
+    return result
+
+def find_duplicate_groups(
+    folder: str,
+    log_fn: LogFn = None,
+    algorithm: str = DEFAULT_HASH,
+    workers: int = HASH_WORKERS,
+) -> list:
+    """Retorna grupos de (path, stat_result) con contenido idéntico."""
+    _hash_factory(algorithm)   # valida el digest antes de escanear
+    by_size: dict = {}
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.is_file():
+                st = entry.stat()
+                by_size.setdefault(st.st_size, []).append((entry.path, st))
+    candidates = [g for g in by_size.values() if len(g) > 1]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=resolve_workers(workers)) as pool:
+        partial_groups = _regroup(
+            candidates, lambda e: get_partial_hash(e[0], e[1].st_size, algorithm), pool
+        )
+        # Los archivos pequeños ya se leyeron completos en la etapa parcial.
+        small = [g for g in partial_groups if g[0][1].st_size <= 2 * PARTIAL_HASH_BYTES]
+        large = [g for g in partial_groups if g[0][1].st_size > 2 * PARTIAL_HASH_BYTES]
+        full  = _regroup(large, lambda e: get_file_hash(e[0], algorithm), pool)
+    elapsed = time.perf_counter() - t0
+
+    bytes_read = sum(min(st.st_size, 2 * PARTIAL_HASH_BYTES) for g in candidates for _, st in g)
+    bytes_read += sum(st.st_size for g in large for _, st in g)
+    mb = bytes_read / (1024 * 1024)
+    _log(
+        f"Archivos: {sum(map(len, by_size.values()))} · mismo tamaño: "
+        f"{sum(map(len, candidates))} · hash completo: {sum(map(len, large))}",
+        log_fn,
+    )
+    _log(
+        f"Hash {algorithm}: {mb:.1f} MB en {elapsed:.2f} s "
+        f"({mb / elapsed if elapsed else 0:.1f} MB/s, {resolve_workers(workers)} hilo(s))",
+        log_fn,
+    )
+    return small + full
+
+def remove_duplicate_files(
+    folder: str,
+    log_fn: LogFn = None,
+    algorithm: str = DEFAULT_HASH,
+    workers: int = HASH_WORKERS,
+):
+    """Elimina duplicados por hash (SHA-256 por defecto), conservando el archivo más antiguo."""
     removed = 0
-    for group in grouped.values():
-        oldest = min(group, key=lambda x: os.path.getctime(x))
-        for path in group:
-            if path != oldest:
+    for group in find_duplicate_groups(folder, log_fn, algorithm, workers):
+        oldest = min(group, key=lambda e: e[1].st_ctime)
+        for path, _st in group:
+            if path != oldest[0]:
                 os.remove(path)
                 removed += 1
 
@@ -125,23 +257,19 @@ def remove_duplicate_files(folder: str, log_fn: LogFn = None):
 
 # ── Renombrado ────────────────────────────────────────────────────────────────
 
-def extract_xml_fragment(file_path: str, start_limit: str, end_limit: str):
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    start = content.find(start_limit)
-    end   = content.find(end_limit, start)
-    return ET.fromstring(f"<factura>\n{content[start:end + len(end_limit)]}\n</factura>")
-
 def build_numero_factura(estab: str, pto_em: str, secue: str) -> str:
     return f"FAC{estab}{pto_em}{secue}"
 
+def _factura_fields(xml_file_path: str) -> dict:
+    _, campos = extract_document(xml_file_path, "factura")
+    if campos["instalacion"] is None:
+        raise ValueError("Campos no encontrados: instalacion")
+    return campos
+
 def build_filename_from_xml(file_path: str) -> str:
-    root   = extract_xml_fragment(file_path, "<infoTributaria>", "</infoAdicional>")
-    estab  = root.find(".//estab").text
-    pto_em = root.find(".//ptoEmi").text
-    secue  = root.find(".//secuencial").text
-    codigo = root.find('.//campoAdicional[@nombre="Instalacion"]').text
-    return f"{build_numero_factura(estab, pto_em, secue)}-{codigo}"
+    campos = _factura_fields(file_path)
+    numero = build_numero_factura(campos["estab"], campos["ptoEmi"], campos["secuencial"])
+    return f"{numero}-{campos['instalacion']}"
 
 def rename_file_pair(folder: str, old_name: str, new_name: str):
     os.rename(
@@ -153,43 +281,355 @@ def rename_file_pair(folder: str, old_name: str, new_name: str):
         os.path.join(folder, f"{new_name}.pdf"),
     )
 
-def rename_files_with_attributes(folder: str, log_fn: LogFn = None):
+# Renombrado en dos fases:
+#   1. plan_renames: un solo escaneo de la carpeta, índice stem→pdf, parseo
+#      (en paralelo) y detección de colisiones / PDFs faltantes. No toca nada.
+#   2. apply_rename_plan: ejecuta el plan registrando cada paso en un journal
+#      dentro de la carpeta. Si la corrida se interrumpe, el journal permite
+#      reanudar (resume_renames) o revertir (rollback_renames) sin re-escanear.
+
+RENAME_JOURNAL = "_rename_journal.jsonl"
+
+@dataclass
+class RenamePlan:
+    folder: str
+    # (origen, destino) en el orden en que se aplican; el XML precede a su PDF
+    ops: list = field(default_factory=list)
+    problems: list = field(default_factory=list)
+    pairs: int = 0
+    unchanged: int = 0
+
+def plan_renames(folder: str, workers: int = 1, log_fn: LogFn = None) -> RenamePlan:
+    """Fase 1: construye el plan completo de renombrado sin modificar archivos."""
+    plan = RenamePlan(folder=folder)
+    with os.scandir(folder) as it:
+        names = [e.name for e in it if e.is_file()]
+    existing = {name.lower() for name in names}
+    pdf_by_stem = {get_name(n): n for n in names if get_extension(n) == ".pdf"}
+    xml_files = [n for n in names if get_extension(n) == ".xml"]
+
+    paths   = [os.path.join(folder, n) for n in xml_files]
+    results = _run_parse(paths, build_filename_from_xml, workers)
+
+    targets: dict = {}
+    for xml_file, (new_name, error) in zip(xml_files, results):
+        if error is not None:
+            plan.problems.append(f"Error en {xml_file}: {error}")
+            continue
+        pdf_file = pdf_by_stem.get(get_name(xml_file))
+        if pdf_file is None:
+            plan.problems.append(f"Sin PDF para {xml_file}")
+            continue
+        pair = [(xml_file, f"{new_name}.xml"), (pdf_file, f"{new_name}.pdf")]
+        if all(src == dst for src, dst in pair):
+            plan.unchanged += 1
+            continue
+        conflict = next(
+            (dst for src, dst in pair
+             if dst.lower() in targets
+             or (dst.lower() in existing and dst.lower() != src.lower())),
+            None,
+        )
+        if conflict:
+            owner = targets.get(conflict.lower())
+            motivo = f"destino de {owner}" if owner else "ya existe"
+            plan.problems.append(f"Colisión: {xml_file} → {conflict} ({motivo})")
+            continue
+        plan.pairs += 1
+        for src, dst in pair:
+            targets[dst.lower()] = src
+            if src != dst:
+                plan.ops.append((src, dst))
+
+    _log(
+        f"Plan: {plan.pairs} par(es) a renombrar, {plan.unchanged} sin cambios, "
+        f"{len(plan.problems)} problema(s).",
+        log_fn,
+    )
+    for problem in plan.problems:
+        _log(f"  {problem}", log_fn)
+    return plan
+
+def _journal_path(folder: str) -> str:
+    return os.path.join(folder, RENAME_JOURNAL)
+
+def _read_journal(folder: str):
+    """Retorna (ops, índices ya aplicados) o (None, None) si no hay journal."""
+    path = _journal_path(folder)
+    if not os.path.exists(path):
+        return None, None
+    ops, done = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break   # última línea truncada por la interrupción
+            if "ops" in entry:
+                ops = [tuple(op) for op in entry["ops"]]
+            else:
+                done.add(entry["done"])
+    return ops, done
+
+def _already_applied(folder: str, src: str, dst: str) -> bool:
+    # Corte entre os.rename y la línea "done": el journal no lo registra pero
+    # el archivo ya está en su destino. El plan nunca apunta a un destino que
+    # existiera, así que origen ausente + destino presente solo puede ser esto.
+    return not os.path.exists(os.path.join(folder, src)) and os.path.exists(os.path.join(folder, dst))
+
+def _apply_ops(folder: str, ops: list, done: set) -> int:
+    applied = 0
+    with open(_journal_path(folder), "a", encoding="utf-8") as journal:
+        for i, (src, dst) in enumerate(ops):
+            if i in done:
+                continue
+            if not _already_applied(folder, src, dst):
+                os.rename(os.path.join(folder, src), os.path.join(folder, dst))
+            journal.write(json.dumps({"done": i}) + "\n")
+            journal.flush()
+            applied += 1
+    os.remove(_journal_path(folder))
+    return applied
+
+def apply_rename_plan(plan: RenamePlan) -> int:
+    """Fase 2: aplica el plan con journal. Retorna la cantidad de pares renombrados."""
+    if os.path.exists(_journal_path(plan.folder)):
+        raise RuntimeError("Hay un renombrado incompleto: reanúdalo o reviértelo primero.")
+    if not plan.ops:
+        return 0
+    with open(_journal_path(plan.folder), "w", encoding="utf-8") as journal:
+        journal.write(json.dumps({"ops": plan.ops}, ensure_ascii=False) + "\n")
+    _apply_ops(plan.folder, plan.ops, set())
+    return plan.pairs
+
+def resume_renames(folder: str, log_fn: LogFn = None) -> int:
+    """Completa un renombrado interrumpido usando el journal."""
+    ops, done = _read_journal(folder)
+    if ops is None:
+        _log("No hay renombrado pendiente.", log_fn)
+        return 0
+    applied = _apply_ops(folder, ops, done)
+    _log(f"Renombrado reanudado: {applied} archivo(s) pendientes aplicados.", log_fn)
+    return applied
+
+def rollback_renames(folder: str, log_fn: LogFn = None) -> int:
+    """Revierte, en orden inverso, los pasos ya aplicados de un renombrado interrumpido."""
+    ops, done = _read_journal(folder)
+    if ops is None:
+        _log("No hay renombrado pendiente.", log_fn)
+        return 0
+    reverted = 0
+    for i in reversed(range(len(ops))):
+        src, dst = ops[i]
+        if i in done or _already_applied(folder, src, dst):
+            os.rename(os.path.join(folder, dst), os.path.join(folder, src))
+            reverted += 1
+    os.remove(_journal_path(folder))
+    _log(f"Renombrado revertido: {reverted} archivo(s) restaurados.", log_fn)
+    return reverted
+
+def rename_files_with_attributes(folder: str, log_fn: LogFn = None, workers: int = 1):
     """Renombra pares XML+PDF usando los atributos del XML como nuevo nombre."""
-    count = 0
-    for xml_file in get_files_extension(folder, ".xml"):
-        try:
-            new_name = build_filename_from_xml(os.path.join(folder, xml_file))
-            rename_file_pair(folder, xml_file, new_name)
-            count += 1
-        except Exception as e:
-            _log(f"Error renombrando {xml_file}: {e}", log_fn)
+    if os.path.exists(_journal_path(folder)):
+        _log("Se encontró un renombrado incompleto; reanudando.", log_fn)
+        resume_renames(folder, log_fn)
+        return
+    plan  = plan_renames(folder, workers, log_fn)
+    count = apply_rename_plan(plan)
     _log(f"Renombrados: {count} par(es) XML+PDF.", log_fn)
 
 
 # ── Extracción XML → modelos ──────────────────────────────────────────────────
 
 def extract_fac_register(xml_file_path: str) -> Factura:
-    root   = extract_xml_fragment(xml_file_path, "<infoTributaria>", "</infoAdicional>")
-    estab  = root.find(".//estab").text
-    pto_em = root.find(".//ptoEmi").text
-    secue  = root.find(".//secuencial").text
-    codigo = root.find('.//campoAdicional[@nombre="Instalacion"]').text
-    numero = build_numero_factura(estab, pto_em, secue)
-    valor  = root.find(".//totalSinImpuestos").text
-    return Factura(code_inst=codigo, number_fac=numero, value_serv=valor)
+    campos = _factura_fields(xml_file_path)
+    numero = build_numero_factura(campos["estab"], campos["ptoEmi"], campos["secuencial"])
+    return Factura(
+        code_inst=campos["instalacion"],
+        number_fac=numero,
+        value_serv=campos["totalSinImpuestos"],
+        fecha_emision=campos["fechaEmision"],
+    )
 
 def get_register_xml_retencion(xml_file_path: str) -> Retencion:
-    with open(xml_file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    root   = ET.fromstring(content)
-    estab  = root.find(".//estab").text
-    pto_em = root.find(".//ptoEmi").text
-    secue  = root.find(".//secuencial").text
-    ret_num = f"{estab}-{pto_em}-{secue}"
-    ret_val = root.find(".//valorRetenido").text
-    fac_num = "FAC" + root.find(".//numDocSustento").text
-    return Retencion(ret_number=ret_num, ret_value=ret_val, fac_number=fac_num)
+    """
+    Lee la retención tal como la entrega el SRI: si el comprobanteRetencion
+    viene dentro de <comprobante> (CDATA o escapado) se analiza en memoria,
+    sin reescribir el archivo.
+    """
+    _, campos = extract_document(xml_file_path, "comprobanteRetencion")
+    ret_num   = f"{campos['estab']}-{campos['ptoEmi']}-{campos['secuencial']}"
+    fac_num   = "FAC" + campos["numDocSustento"]
+    return Retencion(
+        ret_number=ret_num,
+        ret_value=campos["valorRetenido"],
+        fac_number=fac_num,
+        fecha_emision=campos["fechaEmision"],
+    )
+
+# Columnas de facturas.json/csv y retenciones.json/csv. Los registros además
+# llevan fecha_emision, que usan el almacén SQLite y los reportes.
+FAC_EXPORT_FIELDS = ("code_inst", "number_fac", "value_serv")
+RET_EXPORT_FIELDS = ("ret_number", "ret_value", "fac_number")
+# Orden de facturas.json/csv; logic/ingest.py exporta con la misma clave.
+FAC_SORT_KEY = itemgetter("code_inst", "number_fac")
+
+def fac_record(xml_file_path: str) -> dict:
+    return extract_fac_register(xml_file_path).as_dict()
+
+def ret_record(xml_file_path: str) -> dict:
+    return get_register_xml_retencion(xml_file_path).as_dict()
+
+def project(records, fields: tuple):
+    for record in records:
+        yield {name: record[name] for name in fields}
+
+def document_record(xml_file_path: str) -> dict:
+    doc_type, campos = extract_document(xml_file_path)
+    return {"doc_type": doc_type, **campos}
+
+
+# ── Ejecución paralela ────────────────────────────────────────────────────────
+# workers=1 procesa en serie; workers<=0 usa todos los núcleos. Con menos de
+# PARALLEL_MIN_FILES archivos no compensa arrancar el pool y se procesa en serie.
+
+PARALLEL_MIN_FILES = 200
+PARSE_BATCH        = 10_000
 
+def resolve_workers(workers: int) -> int:
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+def _safe_parse(parse_fn: Callable[[str], dict], path: str):
+    """Envuelve parse_fn para que los errores viajen de vuelta como texto."""
+    try:
+        return parse_fn(path), None
+    except Exception as e:
+        return None, str(e)
+
+def _safe_signature(path: str):
+    """(firma, error) del archivo; como _safe_parse, el error viaja como texto."""
+    try:
+        return file_signature(path), None
+    except OSError as e:
+        return None, str(e)
+
+def _iter_parse(paths: list, parse_fn: Callable[[str], dict], workers: int):
+    """
+    Genera (record, error) alineado con paths. En paralelo se envía por
+    lotes de PARSE_BATCH para no retener en memoria los resultados de toda
+    la carpeta a la vez.
+    """
+    workers = resolve_workers(workers)
+    task    = partial(_safe_parse, parse_fn)
+    if workers > 1 and len(paths) >= PARALLEL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for i in range(0, len(paths), PARSE_BATCH):
+                batch = paths[i:i + PARSE_BATCH]
+                chunksize = max(1, len(batch) // (workers * 4))
+                yield from pool.map(task, batch, chunksize=chunksize)
+    else:
+        yield from map(task, paths)
+
+def _run_parse(paths: list, parse_fn: Callable[[str], dict], workers: int) -> list:
+    """Retorna [(record, error)] alineado con paths."""
+    return list(_iter_parse(paths, parse_fn, workers))
+
+def _collect(filenames: list, results, log_fn: LogFn):
+    for filename, (record, error) in zip(filenames, results):
+        if error is not None:
+            _log(f"  Error en {filename}: {error}", log_fn)
+        else:
+            yield record
+
+def iter_xml_records(
+    folder: str,
+    filenames: list,
+    parse_fn: Callable[[str], dict],
+    workers: int = 1,
+    log_fn: LogFn = None,
+):
+    """
+    Aplica parse_fn a cada archivo y genera los registros en el mismo orden
+    que filenames, tanto en serie como con el pool de procesos.
+    parse_fn debe ser una función de módulo (picklable).
+    """
+    paths = [os.path.join(folder, name) for name in filenames]
+    yield from _collect(filenames, _iter_parse(paths, parse_fn, workers), log_fn)
+
+def parse_xml_records(
+    folder: str,
+    filenames: list,
+    parse_fn: Callable[[str], dict],
+    workers: int = 1,
+    log_fn: LogFn = None,
+) -> list:
+    """Versión en lista de iter_xml_records."""
+    return list(iter_xml_records(folder, filenames, parse_fn, workers, log_fn))
+
+def iter_xml_records_cached(
+    folder: str,
+    filenames: list,
+    kind: str,
+    parse_fn: Callable[[str], dict],
+    workers: int = 1,
+    log_fn: LogFn = None,
+    rebuild_cache: bool = False,
+    cache_path=DEFAULT_CACHE_PATH,
+):
+    """
+    Igual que iter_xml_records, pero reutiliza los registros de la caché
+    persistente para los archivos cuya firma (size, mtime_ns, inode) no cambió.
+    rebuild_cache=True descarta las entradas de la carpeta y re-analiza todo.
+
+    Se avanza por lotes de PARSE_BATCH archivos: se consultan en la caché,
+    solo los fallos se analizan y se guardan, y el lote se entrega antes de
+    pasar al siguiente; la memoria no crece con el tamaño de la carpeta.
+    """
+    with ParseCache(cache_path) as cache:
+        if rebuild_cache:
+            cache.invalidate(folder)
+        paths = [os.path.abspath(os.path.join(folder, name)) for name in filenames]
+        for start in range(0, len(paths), PARSE_BATCH):
+            batch   = paths[start:start + PARSE_BATCH]
+            entries = cache.load_paths(kind, batch)
+            checked = [_safe_signature(path) for path in batch]
+            sigs    = [sig for sig, _ in checked]
+            # Un archivo que desapareció o no se puede leer queda como error,
+            # igual que uno mal formado, sin cortar el resto de la carpeta.
+            results = [
+                (None, error) if error else (cache.lookup(entries, p, sig), None)
+                for p, (sig, error) in zip(batch, checked)
+            ]
+            missing = [i for i, (record, error) in enumerate(results) if record is None and error is None]
+
+            parsed = _iter_parse([batch[i] for i in missing], parse_fn, workers)
+            for i, (record, error) in zip(missing, parsed):
+                results[i] = (record, error)
+
+            cache.store(kind, folder, [
+                (batch[i], sigs[i], results[i][0]) for i in missing if results[i][1] is None
+            ])
+            yield from _collect(filenames[start:start + PARSE_BATCH], results, log_fn)
+
+        cache.prune(kind, folder, set(paths))
+        _log(f"Caché: {cache.hits} acierto(s), {cache.misses} fallo(s).", log_fn)
+
+def parse_xml_records_cached(
+    folder: str,
+    filenames: list,
+    kind: str,
+    parse_fn: Callable[[str], dict],
+    workers: int = 1,
+    log_fn: LogFn = None,
+    rebuild_cache: bool = False,
+    cache_path=DEFAULT_CACHE_PATH,
+) -> list:
+    """Versión en lista de iter_xml_records_cached."""
+    return list(iter_xml_records_cached(
+        folder, filenames, kind, parse_fn, workers, log_fn, rebuild_cache, cache_path
+    ))
 
 # ── Procesamiento masivo → JSON + CSV ─────────────────────────────────────────
 
@@ -206,53 +646,133 @@ def save_to_csv(data: list, csv_path: str):
         for row in data:
             writer.writerow(row.values())
 
-def process_all_xml_facs(folder: str, log_fn: LogFn = None) -> int:
-    """Procesa XMLs de facturas → facturas.json + facturas.csv. Retorna cantidad procesada."""
+def _column_collector(spec, columnar: bool, log_fn: LogFn):
+    if not columnar:
+        return None
+    if columnar_backend() is None:
+        _log("Exportación columnar omitida: instala pyarrow o numpy.", log_fn)
+        return None
+    return ColumnCollector(spec)
+
+def _write_columnar(collector, base: str, log_fn: LogFn):
+    if collector is not None:
+        path = collector.write(base)
+        _log(f"  Columnar: {os.path.basename(path)} ({len(collector)} filas)", log_fn)
+
+def _open_store(store: bool):
+    return FacsStore() if store else nullcontext()
+
+def _parse_folder(folder, kind, parse_fn, workers, log_fn, use_cache, rebuild_cache, cache_path):
+    """Genera los registros de la carpeta (desde la caché si use_cache)."""
+    filenames = get_files_extension(folder, ".xml")
+    if use_cache:
+        return iter_xml_records_cached(
+            folder, filenames, kind, parse_fn, workers, log_fn, rebuild_cache, cache_path
+        )
+    return iter_xml_records(folder, filenames, parse_fn, workers, log_fn)
+
+def process_all_xml_facs(
+    folder: str,
+    log_fn: LogFn = None,
+    workers: int = 1,
+    use_cache: bool = False,
+    rebuild_cache: bool = False,
+    json_format: str = "indent",
+    sort_buffer: int = SORT_BUFFER_RECORDS,
+    columnar: bool = False,
+    store: bool = False,
+    cache_path=DEFAULT_CACHE_PATH,
+) -> int:
+    """
+    Procesa XMLs de facturas → facturas.json + facturas.csv. Retorna cantidad procesada.
+    Los registros se ordenan por code_inst y number_fac (FAC_SORT_KEY) y se
+    escriben en streaming; con más
+    de sort_buffer registros el orden se hace con corridas en disco.
+    json_format: "indent" (por defecto), "compact" o "ndjson" (facturas.ndjson).
+    columnar=True además escribe facturas.parquet / facturas.npz (ver logic.columnar).
+    store=True hace upsert de cada registro en el almacén SQLite (logic.facs_store).
+    cache_path: caché de parseo que usa use_cache (logic.parse_cache).
+    """
     if not folder_exists(folder, log_fn):
         return 0
-    registros = []
-    for filename in get_files_extension(folder, ".xml"):
-        try:
-            r = extract_fac_register(os.path.join(folder, filename))
-            registros.append({
-                "code_inst":  r.code_inst,
-                "number_fac": r.number_fac,
-                "value_serv": r.value_serv,
-            })
-        except Exception as e:
-            _log(f"  Error en {filename}: {e}", log_fn)
-
-    registros.sort(key=lambda x: x["code_inst"])
-    json_path = os.path.join(folder, "facturas.json")
-    csv_path  = os.path.join(folder, "facturas.csv")
-    save_to_json(registros, json_path)
-    save_to_csv(registros, csv_path)
-    _log(f"Procesados {len(registros)} XML → facturas.json + facturas.csv", log_fn)
-    return len(registros)
-
-def process_all_xml_rets(folder: str, log_fn: LogFn = None) -> int:
-    """Limpia y procesa XMLs de retenciones → retenciones.json + retenciones.csv."""
+    registros = _parse_folder(
+        folder, "fac", fac_record, workers, log_fn, use_cache, rebuild_cache, cache_path
+    )
+    ordenados = external_sort(registros, FAC_SORT_KEY, sort_buffer)
+    collector = _column_collector(FACTURA_COLUMNS, columnar, log_fn)
+    if collector is not None:
+        ordenados = collector.tap(ordenados)
+
+    base = os.path.join(folder, "facturas")
+    with _open_store(store) as db:
+        if db is not None:
+            ordenados = db.tap("fac", ordenados, folder, prune=True)
+        count = write_records(project(ordenados, FAC_EXPORT_FIELDS), base, json_format)
+    json_name = os.path.basename(json_path_for(base, json_format))
+    _log(f"Procesados {count} XML → {json_name} + facturas.csv", log_fn)
+    _write_columnar(collector, base, log_fn)
+    if store:
+        _log(f"  Almacén: {count} factura(s) actualizada(s).", log_fn)
+    return count
+
+def process_all_xml_rets(
+    folder: str,
+    log_fn: LogFn = None,
+    workers: int = 1,
+    use_cache: bool = False,
+    rebuild_cache: bool = False,
+    json_format: str = "indent",
+    columnar: bool = False,
+    store: bool = False,
+    cache_path=DEFAULT_CACHE_PATH,
+) -> int:
+    """
+    Procesa XMLs de retenciones → retenciones.json + retenciones.csv, escribiendo
+    cada registro a medida que se extrae.
+    Los XML originales no se modifican (ver get_register_xml_retencion).
+    """
     if not folder_exists(folder, log_fn):
         return 0
-    clean_xml_files(folder)
-    registros = []
-    for filename in get_files_extension(folder, ".xml"):
-        try:
-            r = get_register_xml_retencion(os.path.join(folder, filename))
-            registros.append({
-                "ret_number": r.ret_number,
-                "ret_value":  r.ret_value,
-                "fac_number": r.fac_number,
-            })
-        except Exception as e:
-            _log(f"  Error en {filename}: {e}", log_fn)
-
-    json_path = os.path.join(folder, "retenciones.json")
-    csv_path  = os.path.join(folder, "retenciones.csv")
-    save_to_json(registros, json_path)
-    save_to_csv(registros, csv_path)
-    _log(f"Procesadas {len(registros)} retenciones → retenciones.json + retenciones.csv", log_fn)
-    return len(registros)
+    registros = _parse_folder(
+        folder, "ret", ret_record, workers, log_fn, use_cache, rebuild_cache, cache_path
+    )
+    collector = _column_collector(RETENCION_COLUMNS, columnar, log_fn)
+    if collector is not None:
+        registros = collector.tap(registros)
+
+    base = os.path.join(folder, "retenciones")
+    with _open_store(store) as db:
+        if db is not None:
+            registros = db.tap("ret", registros, folder, prune=True)
+        count = write_records(project(registros, RET_EXPORT_FIELDS), base, json_format)
+    json_name = os.path.basename(json_path_for(base, json_format))
+    _log(f"Procesadas {count} retenciones → {json_name} + retenciones.csv", log_fn)
+    _write_columnar(collector, base, log_fn)
+    if store:
+        _log(f"  Almacén: {count} retención(es) actualizada(s).", log_fn)
+    return count
+
+def classify_xml_documents(folder: str, log_fn: LogFn = None, workers: int = 1) -> dict:
+    """
+    Clasifica y extrae en una sola pasada una carpeta con comprobantes mixtos.
+    Retorna {doc_type: [registros]} con el nombre de archivo en "file".
+    """
+    if not folder_exists(folder, log_fn):
+        return {}
+    filenames = get_files_extension(folder, ".xml")
+    paths     = [os.path.join(folder, name) for name in filenames]
+    results   = _run_parse(paths, document_record, workers)
+
+    por_tipo: dict = {}
+    for filename, (record, error) in zip(filenames, results):
+        if error is not None:
+            _log(f"  Error en {filename}: {error}", log_fn)
+            continue
+        por_tipo.setdefault(record.pop("doc_type"), []).append({"file": filename, **record})
+
+    resumen = ", ".join(f"{tipo}: {len(regs)}" for tipo, regs in sorted(por_tipo.items()))
+    _log(f"Clasificados {sum(map(len, por_tipo.values()))} XML → {resumen or 'ninguno'}", log_fn)
+    return por_tipo
 
 
 # ── Apertura de PDFs ──────────────────────────────────────────────────────────
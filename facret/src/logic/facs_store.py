@@ -0,0 +1,315 @@
+# =============================
+# logic/facs_store.py
+# =============================
+"""
+Almacén local SQLite de facturas y retenciones procesadas.
+
+process_all_xml_* (con store=True) hace upsert de cada registro a medida que
+se extrae, en lotes dentro de transacciones y con la base en modo WAL, de
+modo que la UI puede leer mientras se escribe. Los índices sobre number_fac,
+code_inst, ret_number y fecha de emisión convierten consultas como "todas las
+facturas de la instalación X en 2024" en búsquedas por índice en lugar de
+re-escanear carpetas.
+
+Montos en centavos (INTEGER) y fechas en ISO (YYYY-MM-DD) para poder
+ordenar y filtrar por rango.
+
+La tabla aggregates (documentos y centavos por tipo y mes) la mantienen
+triggers sobre facturas/retenciones: cada insert, update o delete ajusta su
+fila, así el dashboard lee unas decenas de filas en lugar de contar tablas.
+"""
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from models.models import FacturaTable, RetencionTable, cents_str, date_key, to_cents
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "exports" / "facret.sqlite"
+
+UPSERT_BATCH = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facturas (
+    number_fac    TEXT PRIMARY KEY,
+    code_inst     TEXT NOT NULL,
+    value_cents   INTEGER NOT NULL,
+    fecha_emision TEXT,
+    folder        TEXT,
+    updated_at    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_facturas_inst_fecha ON facturas (code_inst, fecha_emision);
+CREATE INDEX IF NOT EXISTS ix_facturas_fecha      ON facturas (fecha_emision);
+
+CREATE TABLE IF NOT EXISTS retenciones (
+    ret_number    TEXT NOT NULL,
+    fac_number    TEXT NOT NULL,
+    value_cents   INTEGER NOT NULL,
+    fecha_emision TEXT,
+    folder        TEXT,
+    updated_at    TEXT NOT NULL,
+    PRIMARY KEY (ret_number, fac_number)
+);
+CREATE INDEX IF NOT EXISTS ix_retenciones_fac   ON retenciones (fac_number);
+CREATE INDEX IF NOT EXISTS ix_retenciones_fecha ON retenciones (fecha_emision);
+
+CREATE INDEX IF NOT EXISTS ix_facturas_updated    ON facturas (updated_at);
+CREATE INDEX IF NOT EXISTS ix_retenciones_updated ON retenciones (updated_at);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS aggregates (
+    kind  TEXT    NOT NULL,
+    month TEXT    NOT NULL,
+    docs  INTEGER NOT NULL,
+    cents INTEGER NOT NULL,
+    PRIMARY KEY (kind, month)
+);
+"""
+
+# month = 'aaaa-mm' ('' si la fecha de emisión no se conoce)
+_AGG_ADD = (
+    "INSERT INTO aggregates (kind, month, docs, cents) "
+    "VALUES ('{kind}', COALESCE(substr(NEW.fecha_emision, 1, 7), ''), 1, NEW.value_cents) "
+    "ON CONFLICT (kind, month) DO UPDATE SET docs = docs + 1, cents = cents + excluded.cents;"
+)
+_AGG_SUB = (
+    "UPDATE aggregates SET docs = docs - 1, cents = cents - OLD.value_cents "
+    "WHERE kind = '{kind}' AND month = COALESCE(substr(OLD.fecha_emision, 1, 7), '');"
+)
+
+def _triggers(kind: str, table: str) -> str:
+    add, sub = _AGG_ADD.format(kind=kind), _AGG_SUB.format(kind=kind)
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS tr_{table}_ins AFTER INSERT ON {table} BEGIN {add} END;\n"
+        f"CREATE TRIGGER IF NOT EXISTS tr_{table}_del AFTER DELETE ON {table} BEGIN {sub} END;\n"
+        f"CREATE TRIGGER IF NOT EXISTS tr_{table}_upd AFTER UPDATE OF value_cents, fecha_emision "
+        f"ON {table} BEGIN {sub} {add} END;\n"
+    )
+
+_TRIGGERS = _triggers("fac", "facturas") + _triggers("ret", "retenciones")
+
+# Subir al cambiar el esquema; al abrir una base anterior se recalculan los agregados.
+STORE_VERSION = 1
+
+_TABLES = {"fac": "facturas", "ret": "retenciones"}
+_KEYS = {"fac": ("number_fac",), "ret": ("ret_number", "fac_number")}
+
+_UPSERT = {
+    "fac": (
+        "INSERT INTO facturas (number_fac, code_inst, value_cents, fecha_emision, folder, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (number_fac) DO UPDATE SET code_inst = excluded.code_inst, "
+        "value_cents = excluded.value_cents, fecha_emision = excluded.fecha_emision, "
+        "folder = excluded.folder, updated_at = excluded.updated_at"
+    ),
+    "ret": (
+        "INSERT INTO retenciones (ret_number, fac_number, value_cents, fecha_emision, folder, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (ret_number, fac_number) DO UPDATE SET value_cents = excluded.value_cents, "
+        "fecha_emision = excluded.fecha_emision, folder = excluded.folder, "
+        "updated_at = excluded.updated_at"
+    ),
+}
+
+
+def iso_date(fecha: Optional[str]) -> Optional[str]:
+    """'dd/mm/aaaa' del SRI → 'aaaa-mm-dd'. None si no viene o no se reconoce."""
+    if not fecha:
+        return None
+    try:
+        return datetime.strptime(fecha.strip(), "%d/%m/%Y").date().isoformat()
+    except ValueError:
+        return None
+
+def _row(kind: str, record: dict, folder: str, now: str) -> tuple:
+    fecha = iso_date(record.get("fecha_emision"))
+    if kind == "fac":
+        return (record["number_fac"], record["code_inst"], to_cents(record["value_serv"]),
+                fecha, folder, now)
+    return (record["ret_number"], record["fac_number"], to_cents(record["ret_value"]),
+            fecha, folder, now)
+
+
+class FacsStore:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA + _TRIGGERS)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != STORE_VERSION:
+            self.rebuild_aggregates()
+            self._conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    # ── Escritura ──────────────────────────────────────────────────────────
+
+    def upsert(self, kind: str, records: Iterable[dict], folder: str = "") -> int:
+        """Upsert en lotes de UPSERT_BATCH, una transacción por lote."""
+        count = 0
+        for _ in self.tap(kind, records, folder):
+            count += 1
+        return count
+
+    def tap(
+        self, kind: str, records: Iterable[dict], folder: str = "", prune: bool = False,
+    ) -> Iterator[dict]:
+        """
+        Re-emite cada registro mientras lo guarda; permite exportar y guardar en
+        una pasada. prune=True, al terminar, borra los registros de esa carpeta
+        que ya no aparecieron (el XML se eliminó o dejó de ser válido).
+        """
+        folder = os.path.abspath(folder) if folder else ""
+        now = datetime.now().isoformat(timespec="milliseconds")
+        batch: list = []
+        for record in records:
+            batch.append(_row(kind, record, folder, now))
+            if len(batch) >= UPSERT_BATCH:
+                self._flush(kind, batch)
+            yield record
+        self._flush(kind, batch)
+        if prune and folder:
+            self._prune_folder(kind, folder, now)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("last_folder", folder), ("last_ingest", now)],
+            )
+
+    def _flush(self, kind: str, batch: list):
+        if batch:
+            with self._conn:
+                self._conn.executemany(_UPSERT[kind], batch)
+            batch.clear()
+
+    def _prune_folder(self, kind: str, folder: str, run_at: str) -> int:
+        # Todo lo visto en esta pasada quedó con updated_at = run_at.
+        with self._conn:
+            cur = self._conn.execute(
+                f"DELETE FROM {_TABLES[kind]} WHERE folder = ? AND updated_at <> ?", (folder, run_at)
+            )
+        return cur.rowcount
+
+    def delete(self, kind: str, keys: Iterable) -> int:
+        """Borra por clave: number_fac, o (ret_number, fac_number) para retenciones."""
+        where = " AND ".join(f"{k} = ?" for k in _KEYS[kind])
+        params = [(k,) if isinstance(k, str) else tuple(k) for k in keys]
+        with self._conn:
+            cur = self._conn.executemany(f"DELETE FROM {_TABLES[kind]} WHERE {where}", params)
+        return cur.rowcount
+
+    def set_meta(self, key: str, value: str):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def rebuild_aggregates(self):
+        """Recalcula aggregates desde cero (bases creadas antes de los triggers)."""
+        with self._conn:
+            self._conn.execute("DELETE FROM aggregates")
+            for kind, table in _TABLES.items():
+                self._conn.execute(
+                    "INSERT INTO aggregates (kind, month, docs, cents) "
+                    f"SELECT ?, COALESCE(substr(fecha_emision, 1, 7), ''), COUNT(*), SUM(value_cents) "
+                    f"FROM {table} GROUP BY 2",
+                    (kind,),
+                )
+
+    # ── Consultas ──────────────────────────────────────────────────────────
+
+    def count(self, kind: str) -> int:
+        """Cantidad de documentos, leída de aggregates (no recorre la tabla)."""
+        row = self._conn.execute("SELECT SUM(docs) FROM aggregates WHERE kind = ?", (kind,)).fetchone()
+        return row[0] or 0
+
+    def monthly_totals(self, kind: str) -> list:
+        """[(aaaa-mm, documentos, centavos)] ordenado por mes."""
+        return self._conn.execute(
+            "SELECT month, docs, cents FROM aggregates WHERE kind = ? AND docs > 0 ORDER BY month",
+            (kind,),
+        ).fetchall()
+
+    def recent(self, limit: int = 10) -> list:
+        """Últimos documentos guardados: [(tipo, número, fecha_emision, updated_at)]."""
+        return self._conn.execute(
+            "SELECT * FROM ("
+            " SELECT 'fac', number_fac, fecha_emision, updated_at FROM facturas"
+            " ORDER BY updated_at DESC LIMIT ?"
+            ") UNION ALL SELECT * FROM ("
+            " SELECT 'ret', ret_number, fecha_emision, updated_at FROM retenciones"
+            " ORDER BY updated_at DESC LIMIT ?"
+            ") ORDER BY 4 DESC LIMIT ?",
+            (limit, limit, limit),
+        ).fetchall()
+
+    def facturas_by_inst(self, code_inst: str, year: Optional[int] = None) -> list:
+        sql = ("SELECT number_fac, code_inst, value_cents, fecha_emision FROM facturas "
+               "WHERE code_inst = ?")
+        params: list = [code_inst]
+        if year is not None:
+            sql += " AND fecha_emision >= ? AND fecha_emision < ?"
+            params += [f"{year}-01-01", f"{year + 1}-01-01"]
+        rows = self._conn.execute(sql + " ORDER BY fecha_emision", params)
+        return [
+            {"number_fac": n, "code_inst": c, "value_serv": cents_str(v), "fecha_emision": f}
+            for n, c, v, f in rows
+        ]
+
+    def retenciones_for(self, number_fac: str) -> list:
+        rows = self._conn.execute(
+            "SELECT ret_number, value_cents, fecha_emision FROM retenciones WHERE fac_number = ?",
+            (number_fac,),
+        )
+        return [
+            {"ret_number": r, "ret_value": cents_str(v), "fac_number": number_fac, "fecha_emision": f}
+            for r, v, f in rows
+        ]
+
+    def records(self, kind: str, folder: str) -> Iterator[dict]:
+        """Registros de una carpeta con la forma de fac_record / ret_record, por code_inst / ret_number."""
+        if kind == "fac":
+            sql = ("SELECT code_inst, number_fac, value_cents, fecha_emision FROM facturas "
+                   "WHERE folder = ? ORDER BY code_inst, number_fac")
+            names = ("code_inst", "number_fac", "value_serv", "fecha_emision")
+        else:
+            sql = ("SELECT ret_number, value_cents, fac_number, fecha_emision FROM retenciones "
+                   "WHERE folder = ? ORDER BY ret_number, fac_number")
+            names = ("ret_number", "ret_value", "fac_number", "fecha_emision")
+        for a, b, c, fecha in self._conn.execute(sql, (os.path.abspath(folder),)):
+            if kind == "fac":
+                c = cents_str(c)
+            else:
+                b = cents_str(b)
+            yield dict(zip(names, (a, b, c, fecha)))
+
+    def meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # ── Carga a tablas columnares ─────────────────────────────────────────
+
+    def load_table(self, kind: str, year: Optional[int] = None):
+        """FacturaTable / RetencionTable con los registros (opcionalmente de un año)."""
+        if kind == "fac":
+            table, sql = FacturaTable(), "SELECT code_inst, number_fac, value_cents, fecha_emision FROM facturas"
+        else:
+            table, sql = RetencionTable(), "SELECT ret_number, fac_number, value_cents, fecha_emision FROM retenciones"
+        params: list = []
+        if year is not None:
+            sql += " WHERE fecha_emision >= ? AND fecha_emision < ?"
+            params = [f"{year}-01-01", f"{year + 1}-01-01"]
+        for a, b, cents, fecha in self._conn.execute(sql, params):
+            table.append_raw(a, b, cents, date_key(fecha))
+        return table
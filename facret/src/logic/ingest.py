@@ -0,0 +1,310 @@
+# =============================
+# logic/ingest.py
+# =============================
+"""
+Ingesta en línea: cada adjunto que guarda el descargador pasa por
+quitar prefijo → parseo → renombrado → almacén mientras la descarga sigue,
+en vez de recorrer la carpeta entera con cada acción de FacsManagerPage.
+
+    descargador ──▶ [parse ×N] ──▶ [renombrado] ──▶ [almacén]
+                 cola         cola            cola
+
+Cada etapa corre en su hilo con una cola acotada (QUEUE_SIZE) a la entrada:
+si una etapa se atrasa, submit() bloquea y frena a la descarga en lugar de
+acumular rutas en memoria.
+
+    parse       PDF: quita "RIDE_" del nombre. XML: fac_record.
+    renombrado  empareja XML y PDF por nombre; con el par completo lo
+                renombra con los atributos del XML, igual que
+                rename_files_with_attributes (las colisiones no se tocan).
+    almacén     upsert en logic/facs_store.py por lotes y registro en la
+                caché de parseo, con la ruta final del XML.
+
+Los duplicados ya no llegan a la carpeta: los descarta el registro de
+adjuntos del descargador (logic/download_state.py). Al cerrar se regeneran
+facturas.json + facturas.csv desde el almacén (consulta, no otra pasada por
+la carpeta); por eso los XML que ya estaban en la carpeta tienen que haber
+pasado una vez por "Procesar facturas XML".
+"""
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from logic.download_state import DownloadState, RenameLog
+from logic.export_stream import external_sort, write_records
+from logic.facs_manager import FAC_EXPORT_FIELDS, FAC_SORT_KEY, LogFn, _log, fac_record, get_name, project, remove_prefix
+from logic.facs_store import DEFAULT_DB_PATH, FacsStore
+from logic.parse_cache import DEFAULT_CACHE_PATH, ParseCache, file_signature
+
+QUEUE_SIZE    = 256
+PARSE_WORKERS = 2
+PDF_PREFIX    = "RIDE_"
+
+_DONE = object()
+
+
+@dataclass
+class IngestSummary:
+    parsed: int = 0
+    renamed: int = 0
+    indexed: int = 0
+    exported: int = 0
+    problems: list = field(default_factory=list)
+    # (ruta anterior, ruta nueva) de cada archivo movido, en orden.
+    moved: list = field(default_factory=list)
+
+
+class IngestPipeline:
+    """
+    Uso:
+        with IngestPipeline(carpeta, log_fn) as pipeline:
+            descargador.descargar_facturas_etapa(..., on_saved=pipeline.submit, renames=pipeline.renames)
+        pipeline.summary
+
+    Al salir del with se espera a que terminen todas las etapas. Los errores
+    de un archivo quedan en summary.problems; si una etapa entera falla (p. ej.
+    el almacén), la descarga sigue sin bloquearse y el error se relanza al
+    cerrar. Si la descarga misma falla, se propaga ese error y el del cierre
+    solo queda en el log.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        log_fn: LogFn = None,
+        parse_workers: int = PARSE_WORKERS,
+        queue_size: int = QUEUE_SIZE,
+        db_path=DEFAULT_DB_PATH,
+        cache_path=DEFAULT_CACHE_PATH,
+        export: bool = True,
+    ):
+        self.folder = os.path.abspath(folder)
+        self.summary = IngestSummary()
+        self._log_fn = log_fn
+        self._db_path = db_path
+        self._cache_path = cache_path
+        self._export = export
+        self._parse_workers = max(1, parse_workers)
+        self._parse_q = queue.Queue(queue_size)
+        self._rename_q = queue.Queue(queue_size)
+        self._index_q = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        # Renombrados para el registro de descargas (ver download_and_ingest).
+        self.renames = RenameLog()
+        self._error: Optional[BaseException] = None
+        stages = [self._parse_stage] * self._parse_workers + [self._rename_stage, self._index_stage]
+        self._threads = [threading.Thread(target=stage, daemon=True) for stage in stages]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.close()
+            return
+        # La descarga ya falló: ese es el error que se propaga; uno del cierre
+        # solo se registra para no ocultarlo.
+        try:
+            self.close()
+        except Exception as e:
+            _log(f"Ingesta: error al cerrar tras un fallo de la descarga: {e}", self._log_fn)
+
+    def submit(self, path: str):
+        """Entrega un archivo recién guardado. Bloquea si la cola está llena."""
+        self._parse_q.put(path)
+
+    def close(self) -> IngestSummary:
+        for _ in range(self._parse_workers):
+            self._parse_q.put(_DONE)
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+        if self._export:
+            self._write_exports()
+        s = self.summary
+        _log(
+            f"Ingesta: {s.parsed} XML analizado(s), {s.renamed} par(es) renombrado(s), "
+            f"{s.indexed} en el almacén, {len(s.problems)} problema(s).",
+            self._log_fn,
+        )
+        for problem in s.problems:
+            _log(f"  {problem}", self._log_fn)
+        return s
+
+    # ── Etapas ─────────────────────────────────────────────────────────────
+
+    # Ninguna etapa termina antes de recibir su _DONE: si algo falla, guarda
+    # el error y sigue vaciando su cola sin procesar, así put() nunca queda
+    # bloqueado y close() siempre termina.
+
+    def _fail(self, error: BaseException):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+
+    def _problem(self, msg: str):
+        with self._lock:
+            self.summary.problems.append(msg)
+
+    def _rename(self, src: str, dst: str):
+        with self.renames:
+            os.rename(src, dst)
+            self.renames.add(src, dst)
+        with self._lock:
+            self.summary.moved.append((src, dst))
+
+    def _parse_stage(self):
+        while (path := self._parse_q.get()) is not _DONE:
+            if self._error is not None:
+                continue
+            try:
+                item = self._parse_one(path)
+            except Exception as e:
+                self._problem(f"Error en {os.path.basename(path)}: {e}")
+                continue
+            if item is not None:
+                self._rename_q.put(item)
+        self._rename_q.put(_DONE)
+
+    def _parse_one(self, path: str):
+        name = os.path.basename(path)
+        ext = os.path.splitext(name)[1].lower()
+        if ext == ".pdf":
+            stripped = remove_prefix(name, PDF_PREFIX)
+            target = os.path.join(self.folder, stripped)
+            if stripped != name and not os.path.exists(target):
+                self._rename(path, target)
+                path = target
+            return "pdf", path, None
+        if ext == ".xml":
+            record = fac_record(path)
+            with self._lock:
+                self.summary.parsed += 1
+            return "xml", path, record
+        return None
+
+    def _rename_stage(self):
+        # Cada lado espera al otro por nombre (sin extensión, en minúsculas).
+        xml_by_stem: dict = {}
+        pdf_by_stem: dict = {}
+        pending = self._parse_workers
+        while pending:
+            item = self._rename_q.get()
+            if item is _DONE:
+                pending -= 1
+                continue
+            if self._error is not None:
+                continue
+            kind, path, record = item
+            stem = get_name(os.path.basename(path))
+            if kind == "pdf":
+                if stem not in xml_by_stem:
+                    pdf_by_stem[stem] = path
+                    continue
+                xml_path, record = xml_by_stem.pop(stem)
+                pdf_path = path
+            elif stem in pdf_by_stem:
+                xml_path, pdf_path = path, pdf_by_stem.pop(stem)
+            else:
+                xml_by_stem[stem] = (path, record)
+                continue
+            try:
+                self._index_q.put((self._rename_pair(xml_path, pdf_path, record), record))
+            except Exception as e:
+                self._fail(e)
+
+        if self._error is None:
+            for xml_path, record in xml_by_stem.values():
+                self._problem(f"Sin PDF para {os.path.basename(xml_path)}")
+                self._index_q.put((xml_path, record))
+        self._index_q.put(_DONE)
+
+    def _rename_pair(self, xml_path: str, pdf_path: str, record: dict) -> str:
+        """Renombra el par; retorna la ruta final del XML."""
+        new_name = f"{record['number_fac']}-{record['code_inst']}"
+        pair = [(xml_path, os.path.join(self.folder, f"{new_name}.xml")),
+                (pdf_path, os.path.join(self.folder, f"{new_name}.pdf"))]
+        if all(src == dst for src, dst in pair):
+            return xml_path
+        conflict = next((dst for src, dst in pair if src != dst and os.path.exists(dst)), None)
+        if conflict:
+            self._problem(f"Colisión: {os.path.basename(xml_path)} → {os.path.basename(conflict)} (ya existe)")
+            return xml_path
+        try:
+            for src, dst in pair:
+                if src != dst:
+                    self._rename(src, dst)
+        except OSError as e:
+            self._problem(f"No se pudo renombrar {os.path.basename(xml_path)}: {e}")
+            return xml_path if os.path.exists(xml_path) else pair[0][1]
+        self.summary.renamed += 1
+        return pair[0][1]
+
+    def _index_stage(self):
+        cached: list = []
+        done = False
+
+        def records():
+            nonlocal done
+            while (item := self._index_q.get()) is not _DONE:
+                path = os.path.abspath(item[0])
+                cached.append((path, file_signature(path), item[1]))
+                if len(cached) >= QUEUE_SIZE:
+                    cache.store("fac", self.folder, cached)
+                    cached.clear()
+                yield item[1]
+            done = True
+
+        try:
+            # Las conexiones SQLite se abren en el hilo que las usa.
+            with FacsStore(self._db_path) as db, ParseCache(self._cache_path) as cache:
+                for _ in db.tap("fac", records(), self.folder):
+                    self.summary.indexed += 1
+                cache.store("fac", self.folder, cached)
+        except Exception as e:
+            self._fail(e)
+            while not done:
+                done = self._index_q.get() is _DONE
+
+    def _write_exports(self):
+        with FacsStore(self._db_path) as db:
+            # Mismo orden que process_all_xml_facs.
+            registros = external_sort(db.records("fac", self.folder), FAC_SORT_KEY)
+            base = os.path.join(self.folder, "facturas")
+            self.summary.exported = write_records(project(registros, FAC_EXPORT_FIELDS), base)
+        _log(f"Exportadas {self.summary.exported} factura(s) → facturas.json + facturas.csv", self._log_fn)
+
+
+def download_and_ingest(
+    descargador,
+    carpeta_guardar: str,
+    log_fn: LogFn = None,
+    db_path=DEFAULT_DB_PATH,
+    cache_path=DEFAULT_CACHE_PATH,
+    **kwargs,
+) -> IngestSummary:
+    """
+    Descarga con descargador (DescargadorFacturas) e ingiere cada adjunto al
+    llegar. Los renombrados de la ingesta pasan al registro de adjuntos
+    durante la descarga (antes de ubicar cada adjunto), así un correo
+    posterior con el mismo contenido lo encuentra con su nombre nuevo.
+    """
+    pipeline = IngestPipeline(carpeta_guardar, log_fn, db_path=db_path, cache_path=cache_path)
+    try:
+        with pipeline:
+            descargador.descargar_facturas_etapa(
+                carpeta_guardar=carpeta_guardar, on_saved=pipeline.submit, renames=pipeline.renames, **kwargs
+            )
+    finally:
+        # Los que se renombraron después del último adjunto.
+        with pipeline.renames:
+            moves = pipeline.renames.take()
+        if moves:
+            with DownloadState(descargador.state_path) as state:
+                state.relocate(moves)
+    return pipeline.summary
@@ -0,0 +1,796 @@
+# =============================
+# logic/mail_sources.py
+# =============================
+"""
+Orígenes de correo para logic/facs_downloader.py.
+
+Todos entregan los correos del remitente como (received, entry_id, message),
+con message en la forma de los objetos de Outlook que usa el descargador:
+message.EntryID y message.Attachments, cada adjunto con FileName y
+SaveAsFile(ruta). message es None si el correo no tiene nada que abrir.
+
+    outlook  Outlook local vía COM (solo Windows, pywin32).
+    imap     buzón IMAP (imaplib), con marca UIDVALIDITY/UID.
+    eml      carpeta de archivos .eml (incluye subcarpetas).
+    maildir  Maildir (cur/ y new/).
+    mbox     archivo mbox, o carpeta con archivos .mbox.
+
+Los orígenes locales leen solo el bloque de encabezados de cada correo
+(From, Date, Message-ID); las partes MIME se separan recién cuando el
+descargador pide los adjuntos, y solo se decodifican las XML/PDF.
+
+No usan marca de agua (una exportación no llega en orden): lo ya descargado
+se salta por el registro de logic/download_state.py, con el Message-ID como
+EntryID, así el mismo correo exportado dos veces o en dos formatos no se
+vuelve a procesar.
+"""
+import base64
+import hashlib
+import imaplib
+import io
+import mmap
+import os
+import quopri
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email.utils import decode_rfc2231, parseaddr, parsedate_to_datetime
+from itertools import takewhile
+from typing import Callable, Optional
+from urllib.parse import unquote
+
+from logic.download_state import SyncState
+from logic.facs_manager import LogFn, _log
+
+SOURCES = ("outlook", "imap", "eml", "maildir", "mbox")
+ATTACHMENT_EXTENSIONS = (".xml", ".pdf")
+
+
+# ── Outlook (COM) ─────────────────────────────────────────────────────────────
+
+# Filtro DASL (@SQL=) de Items.Restrict / GetTable. A diferencia de Jet, no
+# depende del formato de fecha regional: datereceived se compara en UTC con
+# "aaaa-mm-dd hh:mm" (precisión de minutos). Con ">=" sobre el minuto truncado
+# no se pierde ningún correo; los que ya se procesaron se descartan comparando
+# con la marca de agua exacta. El remitente se filtra con like '%...%' sobre
+# SenderEmailAddress (subcadena, sin distinguir mayúsculas), igual que el
+# chequeo que se repite del lado de Python.
+_DASL_RECEIVED = "urn:schemas:httpmail:datereceived"
+_DASL_SENDER   = "http://schemas.microsoft.com/mapi/proptag/0x0C1F001F"  # PR_SENDER_EMAIL_ADDRESS
+_DASL_DATE     = "%Y-%m-%d %H:%M"
+
+ENUMERATIONS = ("table", "items")
+TABLE_BATCH = 500
+
+# Columnas de GetTable. Los nombres integrados (ReceivedTime) vienen en hora
+# local; las propiedades MAPI se piden por proptag.
+_PR_SENDER_SMTP = "http://schemas.microsoft.com/mapi/proptag/0x5D01001F"
+_PR_HASATTACH   = "http://schemas.microsoft.com/mapi/proptag/0x0E1B000B"
+_TABLE_COLUMNS  = ("EntryID", "SenderEmailAddress", _PR_SENDER_SMTP, "ReceivedTime", _PR_HASATTACH)
+
+
+def _naive(value) -> datetime:
+    # pywin32 entrega ReceivedTime en hora local marcada con tzinfo; se descarta
+    # para comparar con la marca de agua guardada.
+    return datetime(value.year, value.month, value.day, value.hour, value.minute, value.second)
+
+def restrict_filter(sender: str, since: Optional[datetime] = None) -> str:
+    """Filtro DASL por remitente (subcadena) y, con since (hora local), por fecha."""
+    sender = sender.replace("'", "''")
+    clause = f"\"{_DASL_SENDER}\" like '%{sender}%'"
+    if since is not None:
+        utc = since.replace(second=0, microsecond=0).astimezone(timezone.utc)
+        clause += f" AND \"{_DASL_RECEIVED}\" >= '{utc.strftime(_DASL_DATE)}'"
+    return "@SQL=" + clause
+
+
+class MailSource(ABC):
+    """
+    name: clave del origen en downloads.sqlite. incremental: el origen filtra
+    por la marca de agua (since) y el descargador la guarda al terminar.
+    messages(..., processed): processed(entry_id) indica si el descargador va
+    a saltar ese correo (ya procesado); un origen que adelanta contenido
+    (IMAP) no lo pide para esos.
+    """
+    name = ""
+    incremental = False
+
+    def describe(self, folder: str) -> str:
+        return folder
+
+    @abstractmethod
+    def messages(self, folder: str, sender: str, sync: SyncState, since: Optional[datetime], processed=None):
+        """Produce (received, entry_id, message) por correo del remitente."""
+
+    def close(self):
+        """Libera la conexión, si el origen tiene una."""
+
+
+class OutlookSource(MailSource):
+    """
+    Filtro por remitente y ReceivedTime en Outlook (Items.Restrict / GetTable)
+    a partir de la marca de agua; la carpeta se abre por el EntryID guardado.
+
+    Enumeración: "table" usa Folder.GetTable con solo las columnas necesarias,
+    leídas en bloques con GetArray, y abre (GetItemFromID) solo el correo que
+    pasa el filtro y tiene adjuntos; "items" recorre Items. Si GetTable no está
+    disponible se recorre Items.
+    """
+    name = "outlook"
+    incremental = True
+
+    def __init__(self, outlook=None, log_fn: LogFn = None, enumeration: str = "table"):
+        """
+        outlook: instancia de Outlook.Application ya creada. Si no se pasa, se
+        conecta vía win32com. Cualquier objeto con la misma forma sirve (p. ej.
+        bench/fake_outlook.py para medir el ciclo de descarga fuera de Windows).
+        """
+        if enumeration not in ENUMERATIONS:
+            raise ValueError(f"Enumeración no soportada: {enumeration}")
+        self.enumeration = enumeration
+        self._log_fn = log_fn
+
+        _log("🔄 Conectando a Outlook...", log_fn)
+        if outlook is None:
+            import win32com.client
+            outlook = win32com.client.Dispatch("Outlook.Application")
+        self.outlook = outlook
+        self.namespace = self.outlook.GetNamespace("MAPI")
+        _log("✅ Conectado a Outlook", log_fn)
+        _log(f"📧 Usuario: {self.namespace.CurrentUser.Name}", log_fn)
+
+    def messages(self, folder: str, sender: str, sync: SyncState, since: Optional[datetime], processed=None):
+        outlook_folder = self._resolve_folder(folder, sync)
+        seen = set(sync.watermark_ids) if since else set()
+        dasl = restrict_filter(sender, since)
+        if self.enumeration == "table":
+            return self._candidates_table(outlook_folder, dasl, sender, since, seen, sync.store_id)
+        return self._candidates_items(outlook_folder, dasl, sender, since, seen)
+
+    # entry_id puede ser None en "items": el descargador lo lee solo si lo necesita.
+
+    def _candidates_items(self, folder, dasl: str, sender: str, since, seen: set):
+        for message in folder.Items.Restrict(dasl):
+            received = _naive(message.ReceivedTime)
+            entry_id = None
+            if since is not None and received <= since:
+                if received < since:
+                    continue
+                entry_id = message.EntryID
+                if entry_id in seen:
+                    continue
+            if sender.lower() not in message.SenderEmailAddress.lower():
+                continue
+            yield received, entry_id, message
+
+    def _candidates_table(self, folder, dasl: str, sender: str, since, seen: set, store_id):
+        try:
+            table = folder.GetTable(dasl, 0)  # 0 = olUserItems
+        except Exception:
+            _log("ℹ️ Folder.GetTable no disponible; se recorre Items.", self._log_fn)
+            yield from self._candidates_items(folder, dasl, sender, since, seen)
+            return
+        table.Columns.RemoveAll()
+        for column in _TABLE_COLUMNS:
+            table.Columns.Add(column)
+
+        sender = sender.lower()
+        while not table.EndOfTable:
+            rows = table.GetArray(TABLE_BATCH)
+            if not rows:
+                break
+            for entry_id, address, smtp, received, has_attach in rows:
+                received = _naive(received)
+                if since is not None and (received < since or (received == since and entry_id in seen)):
+                    continue
+                if sender not in (smtp or address or "").lower():
+                    continue
+                message = self.namespace.GetItemFromID(entry_id, store_id) if has_attach else None
+                yield received, entry_id, message
+
+    def _resolve_folder(self, folder_path: str, sync: SyncState):
+        """Abre la carpeta por el EntryID guardado; si ya no existe, la busca por ruta."""
+        if sync.folder_id:
+            try:
+                return self.namespace.GetFolderFromID(sync.folder_id, sync.store_id)
+            except Exception:
+                _log("ℹ️ La carpeta cambió de lugar; se vuelve a buscar por ruta.", self._log_fn)
+        folder = self._get_folder(folder_path)
+        sync.folder_id, sync.store_id = folder.EntryID, folder.StoreID
+        return folder
+
+    def _get_folder(self, folder_path: str):
+        """Navega a una subcarpeta de Outlook dada una ruta separada por \\"""
+        parts = folder_path.split("\\")
+        current = self.namespace.GetDefaultFolder(6)  # 6 = Inbox
+
+        if parts[0].lower() == "inbox":
+            parts = parts[1:]
+
+        for part in parts:
+            current = current.Folders[part]
+
+        return current
+
+
+# ── Correo exportado (MIME) ───────────────────────────────────────────────────
+
+def _decode_filename(name: str) -> str:
+    if "=?" in name:
+        name = str(make_header(decode_header(name)))
+    # Solo el nombre: una ruta en el adjunto no debe salir de la carpeta destino.
+    return os.path.basename(name.replace("\\", "/"))
+
+
+_HEADER_END = re.compile(rb"\r?\n\r?\n")
+
+def _split_headers(raw: bytes):
+    """(encabezados, cuerpo) de un mensaje o parte MIME."""
+    if raw.startswith((b"\n", b"\r\n")):
+        return BytesHeaderParser().parsebytes(b""), raw[raw.index(b"\n") + 1:]
+    end = _HEADER_END.search(raw)
+    if end is None:
+        return BytesHeaderParser().parsebytes(raw), b""
+    return BytesHeaderParser().parsebytes(raw[:end.end()]), raw[end.end():]
+
+def _leaf_parts(raw: bytes, depth: int = 0):
+    """
+    Partes hoja (encabezados, cuerpo sin decodificar) de un mensaje. Se
+    separan por el boundary sobre los bytes, sin el parser línea a línea
+    de email; los cuerpos solo se decodifican al guardar el adjunto.
+    """
+    headers, body = _split_headers(raw)
+    boundary = headers.get_boundary() if headers.get_content_maintype() == "multipart" else None
+    if boundary and depth < 10:
+        delimiter = b"\n--" + boundary.encode("ascii", "replace")
+        chunks = (b"\n" + body).split(delimiter)
+        for chunk in chunks[1:]:   # chunks[0]: preámbulo
+            if chunk.startswith(b"--"):
+                break              # delimitador de cierre
+            start = chunk.find(b"\n")
+            if start < 0:
+                continue
+            part = chunk[start + 1:]
+            yield from _leaf_parts(part[:-1] if part.endswith(b"\r") else part, depth + 1)
+    elif headers.get_content_type() == "message/rfc822" and depth < 10:
+        yield from _leaf_parts(body, depth + 1)
+    else:
+        yield headers, body
+
+
+class MimeAttachment:
+    def __init__(self, encoding: str, body: bytes, filename: str):
+        """encoding: Content-Transfer-Encoding de la parte; body sin decodificar."""
+        self._encoding = (encoding or "").strip().lower()
+        self._body = body
+        self.FileName = filename
+
+    def SaveAsFile(self, path: str):
+        if self._encoding == "base64":
+            data = base64.b64decode(self._body)
+        elif self._encoding == "quoted-printable":
+            data = quopri.decodestring(self._body)
+        else:
+            data = self._body
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+class MimeMessage:
+    """
+    Correo exportado con los encabezados ya leídos. read_all() devuelve los
+    bytes completos y solo se llama al pedir Attachments.
+    """
+
+    def __init__(self, entry_id: str, read_all: Callable[[], bytes]):
+        self.EntryID = entry_id
+        self._read_all = read_all
+        self._attachments = None
+
+    @property
+    def Attachments(self) -> list:
+        if self._attachments is None:
+            self._attachments = []
+            for headers, body in _leaf_parts(self._read_all()):
+                name = headers.get_filename()
+                if not name:
+                    continue
+                name = _decode_filename(name)
+                if name.lower().endswith(ATTACHMENT_EXTENSIONS):
+                    encoding = headers.get("Content-Transfer-Encoding")
+                    self._attachments.append(MimeAttachment(encoding, body, name))
+            self._read_all = None
+        return self._attachments
+
+
+def _local_received(value: Optional[str], fallback: float) -> datetime:
+    """Date del correo en hora local sin tzinfo (como ReceivedTime de Outlook)."""
+    try:
+        received = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return datetime.fromtimestamp(fallback).replace(microsecond=0)
+    if received.tzinfo is not None:
+        received = received.astimezone().replace(tzinfo=None)
+    return received
+
+
+def _read_headers(fp) -> bytes:
+    """Lee hasta la línea en blanco que cierra los encabezados."""
+    lines = []
+    for line in fp:
+        if line in (b"\n", b"\r\n"):
+            break
+        lines.append(line)
+    return b"".join(lines)
+
+
+class _MimeSource(MailSource):
+    """Base de los orígenes locales: subclases implementan _raw_messages."""
+    name = "mime"
+    kind = ""
+
+    def __init__(self, path: str, log_fn: LogFn = None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No existe: {path}")
+        self.path = path
+        _log(f"📂 Correo exportado ({self.kind}): {path}", log_fn)
+
+    def describe(self, folder: str) -> str:
+        return self.path
+
+    @abstractmethod
+    def _raw_messages(self):
+        """Produce (encabezados, read_all, mtime) por correo."""
+
+    def messages(self, folder: str, sender: str, sync: SyncState, since: Optional[datetime], processed=None):
+        sender = sender.lower()
+        parser = BytesHeaderParser()
+        for header_bytes, read_all, mtime in self._raw_messages():
+            headers = parser.parsebytes(header_bytes)
+            if sender not in parseaddr(headers.get("From", ""))[1].lower():
+                continue
+            received = _local_received(headers.get("Date"), mtime)
+            message_id = (headers.get("Message-ID") or "").strip().strip("<>")
+            # Sin Message-ID, el hash de los encabezados identifica igual al
+            # correo en cualquier formato de exportación.
+            entry_id = message_id or hashlib.sha1(header_bytes).hexdigest()
+            yield received, entry_id, MimeMessage(entry_id, read_all)
+
+
+def _file_reader(path: str) -> Callable[[], bytes]:
+    def read_all() -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+    return read_all
+
+def _scan_files(paths):
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                header_bytes = _read_headers(f)
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        yield header_bytes, _file_reader(path), mtime
+
+
+class EmlFolderSource(_MimeSource):
+    kind = "eml"
+
+    def _raw_messages(self):
+        paths = []
+        for root, _dirs, files in os.walk(self.path):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(".eml"))
+        paths.sort()
+        return _scan_files(paths)
+
+
+class MaildirSource(_MimeSource):
+    kind = "maildir"
+
+    def _raw_messages(self):
+        # tmp/ tiene entregas a medio escribir; no se lee.
+        paths = []
+        for sub in ("cur", "new"):
+            folder = os.path.join(self.path, sub)
+            if os.path.isdir(folder):
+                paths.extend(e.path for e in os.scandir(folder) if e.is_file() and not e.name.startswith("."))
+        paths.sort()
+        return _scan_files(paths)
+
+
+_MBOX_ESCAPED = re.compile(rb"^>(>*From )", re.M)
+
+class MboxSource(_MimeSource):
+    """
+    Lectura en una sola pasada sobre el archivo mapeado en memoria: solo el
+    correo en curso se copia. mboxo/mboxrd: se quita un ">" de las ">From ".
+    """
+    kind = "mbox"
+
+    def _raw_messages(self):
+        if os.path.isdir(self.path):
+            paths = sorted(
+                os.path.join(root, f)
+                for root, _dirs, files in os.walk(self.path)
+                for f in files if f.lower().endswith(".mbox")
+            )
+        else:
+            paths = [self.path]
+        for path in paths:
+            mtime = os.path.getmtime(path)
+            for raw in self._split(path):
+                yield _read_headers(io.BytesIO(raw)), (lambda raw=raw: raw), mtime
+
+    @staticmethod
+    def _split(path: str):
+        if os.path.getsize(path) == 0:
+            return
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = None
+            for end, line in MboxSource._separators(mm):
+                if start is not None:
+                    yield MboxSource._unescape(mm[start:end])
+                start = mm.find(b"\n", line) + 1 or len(mm)
+            if start is not None:
+                yield MboxSource._unescape(mm[start:])
+
+    @staticmethod
+    def _separators(mm):
+        """
+        (fin del correo anterior, inicio de la línea "From ") de cada
+        separador: "From " al inicio del archivo o después de una línea en blanco.
+        """
+        if mm[:5] == b"From ":
+            yield 0, 0
+        i = mm.find(b"\nFrom ")
+        while i >= 0:
+            if mm[i - 1:i] == b"\n":
+                yield i, i + 1
+            elif mm[i - 2:i] == b"\n\r":
+                yield i - 1, i + 1
+            i = mm.find(b"\nFrom ", i + 1)
+
+    @staticmethod
+    def _unescape(raw: bytes) -> bytes:
+        return _MBOX_ESCAPED.sub(rb"\1", raw) if b">From " in raw else raw
+
+
+# ── IMAP ──────────────────────────────────────────────────────────────────────
+
+IMAP_BATCH = 50
+_IMAP_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+# Un token de respuesta: paréntesis, cadena entre comillas o átomo. Los
+# átomos de sección llevan corchetes con espacios: BODY[HEADER.FIELDS (X)].
+_IMAP_TOKEN = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"\[]+(?:\[[^\]]*\][^\s()"]*)?))', re.S)
+_IMAP_ESCAPE = re.compile(rb"\\(.)", re.S)
+_OPEN, _CLOSE = object(), object()
+
+
+def _imap_quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _imap_date(value: datetime) -> str:
+    # SINCE usa solo la fecha, con el mes en inglés (sin depender del locale).
+    return f"{value.day}-{_IMAP_MONTHS[value.month - 1]}-{value.year}"
+
+def _imap_text(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value or ""
+
+def _imap_tokens(line: bytes):
+    pos = 0
+    while (m := _IMAP_TOKEN.match(line, pos)) is not None:
+        pos = m.end()
+        if m.group(1):
+            yield _OPEN
+        elif m.group(2):
+            yield _CLOSE
+        elif m.group(3) is not None:
+            yield _IMAP_ESCAPE.sub(rb"\1", m.group(3)).decode("utf-8", "replace")
+        else:
+            atom = m.group(4).decode("ascii", "replace")
+            yield None if atom.upper() == "NIL" else atom
+
+def _imap_parse(data) -> list:
+    """
+    Datos de una respuesta de imaplib (bytes, o tuplas (línea, literal) cuando
+    la línea termina en {n}) como listas anidadas: átomos y cadenas en str,
+    literales en bytes y NIL como None.
+    """
+    stack = [[]]
+    for item in data:
+        if item is None:
+            continue
+        line, literal = item if isinstance(item, tuple) else (item, None)
+        if literal is not None:
+            line = line[:line.rindex(b"{")]
+        for token in _imap_tokens(line):
+            if token is _OPEN:
+                stack.append([])
+            elif token is _CLOSE and len(stack) > 1:
+                done = stack.pop()
+                stack[-1].append(done)
+            elif token is not _CLOSE:
+                stack[-1].append(token)
+        if literal is not None:
+            stack[-1].append(literal)
+    return stack[0]
+
+def _imap_fetch_items(data):
+    """Un dict {ATRIBUTO: valor} por correo de una respuesta a UID FETCH."""
+    for item in _imap_parse(data):
+        if isinstance(item, list):
+            yield {_imap_text(k).upper(): v for k, v in zip(item[::2], item[1::2])}
+
+
+def _imap_filename(body: list, disposition_at: int) -> str:
+    """Nombre de archivo de una parte: parámetros de Content-Disposition o name= del tipo."""
+    candidates = []
+    if len(body) > disposition_at and isinstance(body[disposition_at], list) and len(body[disposition_at]) > 1:
+        candidates.append(body[disposition_at][1])
+    candidates.append(body[2])
+    for params in candidates:
+        if not isinstance(params, list):
+            continue
+        values = {_imap_text(k).lower(): _imap_text(v) for k, v in zip(params[::2], params[1::2])}
+        for key in ("filename", "name"):
+            if values.get(key):
+                return _decode_filename(values[key])
+            if values.get(key + "*"):
+                # RFC 2231: charset'idioma'valor%XX
+                charset, _lang, text = decode_rfc2231(values[key + "*"])
+                return _decode_filename(unquote(text, encoding=charset or "utf-8", errors="replace"))
+    return ""
+
+def _imap_parts(body: list, section: str = ""):
+    """
+    (sección, nombre, encoding) de las partes con nombre de archivo de un
+    BODYSTRUCTURE, con la numeración de secciones de RFC 3501.
+    """
+    if body and isinstance(body[0], list):      # multipart: hijos y luego el subtipo
+        for i, child in enumerate(takewhile(lambda c: isinstance(c, list), body), start=1):
+            yield from _imap_parts(child, f"{section}.{i}" if section else str(i))
+        return
+    if len(body) < 7:
+        return
+    section = section or "1"
+    kind = f"{_imap_text(body[0])}/{_imap_text(body[1])}".lower()
+    if kind == "message/rfc822" and len(body) > 8 and isinstance(body[8], list):
+        nested = body[8]
+        yield from _imap_parts(nested, section if nested and isinstance(nested[0], list) else f"{section}.1")
+        return
+    # Después del tamaño: text/* agrega las líneas; message/rfc822, sobre y estructura.
+    disposition_at = 9 if kind.startswith("text/") else 11 if kind == "message/rfc822" else 8
+    name = _imap_filename(body, disposition_at)
+    if name:
+        yield section, name, _imap_text(body[5])
+
+
+class ImapMessage:
+    """Correo IMAP con la estructura ya leída; los adjuntos los trae su lote."""
+
+    def __init__(self, uid: int, entry_id: str, parts: list, batch: "_ImapBatch"):
+        self.uid = uid
+        self.EntryID = entry_id
+        self.parts = parts          # [(sección, nombre, encoding)] solo XML/PDF
+        self._batch = batch
+        self._bodies = None
+
+    @property
+    def Attachments(self) -> list:
+        if self._bodies is None:
+            self._batch.load(self)
+        return [MimeAttachment(encoding, self._bodies.get(section, b""), name)
+                for section, name, encoding in self.parts]
+
+
+class _ImapBatch:
+    def __init__(self, source: "ImapSource", messages: list, processed=None):
+        self.source = source
+        self.messages = messages
+        self.processed = processed
+
+    def _wanted(self, message: ImapMessage) -> bool:
+        """Correos que el descargador va a abrir: con XML/PDF y no procesados."""
+        if not message.parts:
+            return False
+        return self.processed is None or not self.processed(message.EntryID)
+
+    def load(self, message: ImapMessage):
+        """
+        Trae las secciones de message y de los correos que le siguen en el
+        lote y el descargador va a abrir (los anteriores que no se pidieron
+        ya los saltó), un UID FETCH por grupo de correos con las mismas
+        secciones.
+        """
+        start = self.messages.index(message)
+        pending = [message] + [m for m in self.messages[start + 1:] if self._wanted(m)]
+        groups: dict = {}
+        for m in pending:
+            if m._bodies is None:
+                m._bodies = {}
+                if m.parts:
+                    groups.setdefault(tuple(section for section, _, _ in m.parts), []).append(m)
+        for sections, group in groups.items():
+            by_uid = {m.uid: m for m in group}
+            items = " ".join(f"BODY.PEEK[{section}]" for section in sections)
+            data = self.source._uid("FETCH", ",".join(map(str, by_uid)), f"(UID {items})")
+            for item in _imap_fetch_items(data):
+                target = by_uid.get(int(item.get("UID", 0)))
+                if target is None:
+                    continue
+                for section in sections:
+                    body = item.get(f"BODY[{section}]")
+                    target._bodies[section] = body.encode("utf-8") if isinstance(body, str) else body or b""
+
+
+class ImapSource(MailSource):
+    """
+    Buzón IMAP con una sola conexión para toda la corrida (y las siguientes).
+
+    El filtro por remitente (FROM) y por fecha o UID se hace en el servidor.
+    De cada lote de IMAP_BATCH correos se pide en un solo UID FETCH el
+    BODYSTRUCTURE y el Message-ID; las secciones XML/PDF (BODY.PEEK, no marca
+    como leído) se piden recién cuando el descargador abre los adjuntos, en
+    un UID FETCH por grupo de correos con las mismas secciones. imaplib espera
+    cada respuesta antes del siguiente comando: agrupar es lo que evita un
+    viaje de ida y vuelta por correo.
+
+    Incremental: con el mismo UIDVALIDITY solo se buscan UID mayores al último
+    procesado. Si cambió (buzón recreado o migrado) los UID guardados no
+    sirven: se busca desde la fecha de la marca de agua (SINCE) y lo ya
+    descargado se salta por Message-ID.
+    """
+    incremental = True
+
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        password: str,
+        mailbox: str = "INBOX",
+        port: Optional[int] = None,
+        ssl: bool = True,
+        log_fn: LogFn = None,
+        batch: int = IMAP_BATCH,
+    ):
+        self.host, self.user, self.mailbox = host, user, mailbox
+        self.port = port or (993 if ssl else 143)
+        self.name = f"imap:{user}@{host}/{mailbox}"
+        self.batch = max(1, batch)
+        self._ssl = ssl
+        self._password = password
+        self._log_fn = log_fn
+        self._validity = None
+        self.conn = None
+        self._connect()
+
+    def _connect(self):
+        _log(f"🔄 Conectando a {self.host}:{self.port} (IMAP)...", self._log_fn)
+        cls = imaplib.IMAP4_SSL if self._ssl else imaplib.IMAP4
+        self.conn = cls(self.host, self.port, timeout=60)
+        self.conn.login(self.user, self._password)
+        _log(f"✅ Conectado como {self.user}", self._log_fn)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.logout()
+            except Exception:
+                pass
+            self.conn = None
+
+    def describe(self, folder: str) -> str:
+        return f"{self.user}@{self.host}/{self.mailbox}"
+
+    def _uid(self, command: str, *args):
+        typ, data = self.conn.uid(command, *args)
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"UID {command}: {_imap_text(data[0] if data else b'')}")
+        return data
+
+    def _select(self) -> int:
+        """Abre el buzón en solo lectura; retorna su UIDVALIDITY."""
+        try:
+            typ, data = self.conn.select(_imap_quote(self.mailbox), readonly=True)
+        except (imaplib.IMAP4.abort, OSError):
+            # La conexión quedó abierta desde una corrida anterior y se cortó.
+            _log("ℹ️ La conexión IMAP se cerró; se vuelve a conectar.", self._log_fn)
+            self._connect()
+            typ, data = self.conn.select(_imap_quote(self.mailbox), readonly=True)
+        if typ != "OK":
+            raise ValueError(f"No se pudo abrir el buzón {self.mailbox}: {_imap_text(data[0] if data else b'')}")
+        _typ, validity = self.conn.response("UIDVALIDITY")
+        return int(validity[0]) if validity and validity[0] else 0
+
+    def messages(self, folder: str, sender: str, sync: SyncState, since: Optional[datetime], processed=None):
+        validity = self._validity = self._select()
+        criteria = ["FROM", _imap_quote(sender)]
+        if since is not None and sync.uid_validity == validity:
+            last = sync.last_uid
+            criteria += ["UID", f"{last + 1}:*"]
+        else:
+            if sync.uid_validity not in (None, validity):
+                _log("ℹ️ El buzón cambió de UIDVALIDITY; se busca por fecha.", self._log_fn)
+            last = sync.last_uid = 0
+            if since is not None:
+                criteria += ["SINCE", _imap_date(since)]
+        sync.uid_validity = validity
+
+        found = self._uid("SEARCH", *criteria)
+        # "n:*" incluye siempre el último UID del buzón aunque sea menor que n.
+        uids = sorted(uid for uid in map(int, b" ".join(d for d in found if d).split()) if uid > last)
+        return self._candidates(uids, sync, processed)
+
+    def _candidates(self, uids: list, sync: SyncState, processed=None):
+        for start in range(0, len(uids), self.batch):
+            for received, message in self._fetch_structure(uids[start:start + self.batch], processed):
+                yield received, message.EntryID, message if message.parts else None
+                # Al volver acá el descargador ya procesó el correo.
+                sync.last_uid = max(sync.last_uid, message.uid)
+
+    def _fetch_structure(self, uids: list, processed=None) -> list:
+        data = self._uid(
+            "FETCH", ",".join(map(str, uids)),
+            "(UID INTERNALDATE BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])",
+        )
+        messages = []
+        batch = _ImapBatch(self, [], processed)
+        parser = BytesHeaderParser()
+        for item in _imap_fetch_items(data):
+            if "UID" not in item:
+                continue
+            uid = int(item["UID"])
+            header = next((v for k, v in item.items() if k.startswith("BODY[HEADER")), None)
+            if isinstance(header, str):
+                header = header.encode("utf-8")
+            message_id = (parser.parsebytes(header or b"").get("Message-ID") or "").strip().strip("<>")
+            internal = imaplib.Internaldate2tuple(f'INTERNALDATE "{_imap_text(item.get("INTERNALDATE"))}"'.encode())
+            received = datetime(*internal[:6]) if internal else datetime.now().replace(microsecond=0)
+            structure = item.get("BODYSTRUCTURE")
+            parts = [
+                part for part in (_imap_parts(structure) if isinstance(structure, list) else ())
+                if part[1].lower().endswith(ATTACHMENT_EXTENSIONS)
+            ]
+            entry_id = message_id or f"{self._validity}:{uid}"
+            messages.append((received, ImapMessage(uid, entry_id, parts, batch)))
+        messages.sort(key=lambda m: m[1].uid)
+        batch.messages = [m for _, m in messages]
+        return messages
+
+
+_LOCAL_SOURCES = {"eml": EmlFolderSource, "maildir": MaildirSource, "mbox": MboxSource}
+
+def detect_source(path: str) -> str:
+    """eml, maildir o mbox según lo que haya en path."""
+    if os.path.isfile(path):
+        return "mbox"
+    if os.path.isdir(os.path.join(path, "cur")) or os.path.isdir(os.path.join(path, "new")):
+        return "maildir"
+    for _root, _dirs, files in os.walk(path):
+        if any(f.lower().endswith(".mbox") for f in files):
+            return "mbox"
+    return "eml"
+
+def open_source(kind: str = "outlook", path: Optional[str] = None, log_fn: LogFn = None, **options) -> MailSource:
+    """
+    kind: outlook, imap, eml, maildir, mbox o auto (detecta el formato de path).
+    options se pasan a OutlookSource (outlook=, enumeration=) o a ImapSource
+    (host=, user=, password=, mailbox=, port=, ssl=).
+    """
+    if kind == "outlook":
+        return OutlookSource(log_fn=log_fn, **options)
+    if kind == "imap":
+        return ImapSource(log_fn=log_fn, **options)
+    if path is None:
+        raise ValueError(f"El origen {kind} necesita una ruta")
+    if kind == "auto":
+        kind = detect_source(path)
+    if kind not in _LOCAL_SOURCES:
+        raise ValueError(f"Origen de correo no soportado: {kind}")
+    return _LOCAL_SOURCES[kind](path, log_fn=log_fn)
@@ -0,0 +1,133 @@
+# =============================
+# logic/parse_cache.py
+# =============================
+"""
+Caché persistente (SQLite) de registros extraídos de XMLs de facturas y retenciones.
+
+Cada entrada se identifica por (kind, path) y guarda la firma del archivo
+(size, mtime_ns, inode) al momento de analizarlo. Si la firma actual coincide,
+el registro se reutiliza sin volver a abrir el XML.
+"""
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = (
+    Path(__file__).resolve().parent.parent.parent / "data" / "exports" / "cache" / "parse_cache.sqlite"
+)
+
+# Subir este número cuando cambie la forma de los registros extraídos:
+# las entradas de versiones anteriores se descartan al abrir la caché.
+CACHE_VERSION = 2
+
+# Parámetros por consulta en load_paths (SQLite admite 999 en versiones viejas).
+_LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (
+    kind     TEXT    NOT NULL,
+    path     TEXT    NOT NULL,
+    folder   TEXT    NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode    INTEGER NOT NULL,
+    record   TEXT    NOT NULL,
+    PRIMARY KEY (kind, path)
+);
+CREATE INDEX IF NOT EXISTS ix_parsed_folder ON parsed (kind, folder);
+"""
+
+
+def file_signature(path: str) -> tuple:
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class ParseCache:
+    def __init__(self, db_path=DEFAULT_CACHE_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path))
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS parsed")
+            self._conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    # ── Lectura / escritura por carpeta ───────────────────────────────────
+
+    def load_paths(self, kind: str, paths: list) -> dict:
+        """
+        Retorna {path: (signature, record)} de las entradas de paths. Se
+        consulta por lotes: la carpeta entera nunca pasa por memoria.
+        """
+        entries = {}
+        for i in range(0, len(paths), _LOOKUP_CHUNK):
+            chunk = paths[i:i + _LOOKUP_CHUNK]
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, inode, record FROM parsed "
+                f"WHERE kind = ? AND path IN ({', '.join('?' * len(chunk))})",
+                (kind, *chunk),
+            )
+            entries.update((path, ((size, mtime, inode), record)) for path, size, mtime, inode, record in rows)
+        return entries
+
+    def lookup(self, entries: dict, path: str, signature: tuple):
+        """Retorna el registro cacheado si la firma coincide; None si hay que re-analizar."""
+        entry = entries.get(path)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return json.loads(entry[1])
+        self.misses += 1
+        return None
+
+    def store(self, kind: str, folder: str, items: list):
+        """items: lista de (path, signature, record)."""
+        folder = os.path.abspath(folder)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO parsed (kind, path, folder, size, mtime_ns, inode, record) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(kind, path, folder, *sig, json.dumps(record)) for path, sig, record in items],
+            )
+
+    def prune(self, kind: str, folder: str, keep: set):
+        """Elimina entradas de archivos que ya no están en la carpeta."""
+        rows = self._conn.execute(
+            "SELECT path FROM parsed WHERE kind = ? AND folder = ?", (kind, os.path.abspath(folder))
+        )
+        stale = [(kind, path) for (path,) in rows if path not in keep]
+        if stale:
+            with self._conn:
+                self._conn.executemany("DELETE FROM parsed WHERE kind = ? AND path = ?", stale)
+
+    # ── Invalidación ───────────────────────────────────────────────────────
+
+    def invalidate(self, folder: str = None) -> int:
+        """Borra las entradas de una carpeta (o toda la caché si folder es None)."""
+        with self._conn:
+            if folder is None:
+                cur = self._conn.execute("DELETE FROM parsed")
+            else:
+                cur = self._conn.execute(
+                    "DELETE FROM parsed WHERE folder = ?", (os.path.abspath(folder),)
+                )
+        return cur.rowcount
+
+
+def invalidate_folder_cache(folder: str, log_fn=None, db_path=DEFAULT_CACHE_PATH) -> int:
+    with ParseCache(db_path) as cache:
+        removed = cache.invalidate(folder)
+    msg = f"Caché invalidada: {removed} entrada(s) de {folder}."
+    (log_fn or print)(msg)
+    return removed
@@ -0,0 +1,151 @@
+# =============================
+# logic/reconcile.py
+# =============================
+"""
+Conciliación facturas ↔ retenciones.
+
+Retencion.fac_number se arma como "FAC" + numDocSustento, igual que
+Factura.number_fac, así que el cruce es un hash-join: se indexan las
+retenciones por fac_number y se recorre cada factura una sola vez (O(n+m)).
+
+Uso headless:
+    from logic.reconcile import reconcile_folder
+    reconcile_folder("D:/Facturas_ETAPA")                      # ambos JSON en la carpeta
+    reconcile_folder("D:/Facturas_ETAPA", ret_folder="D:/Ret")  # retenciones en otra carpeta
+"""
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterable, Optional
+
+from logic.facs_manager import LogFn
+
+REPORTS_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "exports" / "reports"
+
+
+@dataclass
+class ReconcileResult:
+    matched: list = field(default_factory=list)
+    unmatched_facturas: list = field(default_factory=list)
+    orphan_retenciones: list = field(default_factory=list)
+    totals_by_inst: list = field(default_factory=list)
+
+
+def reconcile(facturas: Iterable[dict], retenciones: Iterable[dict]) -> ReconcileResult:
+    """Cruza registros de facturas (fac_record) y retenciones (ret_record)."""
+    by_fac: dict = {}
+    for ret in retenciones:
+        by_fac.setdefault(ret["fac_number"], []).append(ret)
+
+    result = ReconcileResult()
+    seen: set = set()
+    totals: dict = {}
+    for fac in facturas:
+        number = fac["number_fac"]
+        seen.add(number)
+        rets = by_fac.get(number)
+        t = totals.setdefault(fac["code_inst"], {
+            "facturas": 0, "conciliadas": 0, "value_serv": Decimal(0), "ret_value": Decimal(0),
+        })
+        t["facturas"] += 1
+        t["value_serv"] += Decimal(fac["value_serv"])
+        if not rets:
+            result.unmatched_facturas.append(fac)
+            continue
+        t["conciliadas"] += 1
+        for ret in rets:
+            t["ret_value"] += Decimal(ret["ret_value"])
+            result.matched.append({
+                "code_inst":  fac["code_inst"],
+                "number_fac": number,
+                "value_serv": fac["value_serv"],
+                "ret_number": ret["ret_number"],
+                "ret_value":  ret["ret_value"],
+            })
+
+    result.orphan_retenciones = [
+        ret for fac_number, rets in by_fac.items() if fac_number not in seen for ret in rets
+    ]
+    result.totals_by_inst = [
+        {
+            "code_inst":   code,
+            "facturas":    t["facturas"],
+            "conciliadas": t["conciliadas"],
+            "value_serv":  f"{t['value_serv']:.2f}",
+            "ret_value":   f"{t['ret_value']:.2f}",
+        }
+        for code, t in sorted(totals.items())
+    ]
+    return result
+
+
+# ── Lectura de insumos y escritura de reportes ────────────────────────────────
+
+def load_records(folder: str, basename: str) -> list:
+    """
+    Lee basename.json o basename.ndjson generado por process_all_xml_*. Si
+    están los dos (la carpeta se procesó con otro json_format antes), se usa
+    el más reciente: el otro quedó de una corrida anterior.
+    """
+    paths = [p for p in (os.path.join(folder, f"{basename}{ext}") for ext in (".json", ".ndjson"))
+             if os.path.exists(p)]
+    if not paths:
+        raise FileNotFoundError(
+            f"No existe {basename}.json en {folder}. Procesa primero los XML de esa carpeta."
+        )
+    path = max(paths, key=os.path.getmtime)
+    with open(path) as f:
+        if path.endswith(".ndjson"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+def _write_csv(rows: list, path: Path, header: list):
+    # Cada reporte muestra solo sus columnas; los registros traen más campos.
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=header, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_reports(result: ReconcileResult, reports_dir=REPORTS_DIR) -> list:
+    reports_dir = Path(reports_dir)
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    outputs = [
+        ("conciliacion_emparejadas.csv", result.matched,
+         ["code_inst", "number_fac", "value_serv", "ret_number", "ret_value"]),
+        ("conciliacion_facturas_sin_retencion.csv", result.unmatched_facturas,
+         ["code_inst", "number_fac", "value_serv"]),
+        ("conciliacion_retenciones_huerfanas.csv", result.orphan_retenciones,
+         ["ret_number", "ret_value", "fac_number"]),
+        ("conciliacion_totales_instalacion.csv", result.totals_by_inst,
+         ["code_inst", "facturas", "conciliadas", "value_serv", "ret_value"]),
+    ]
+    paths = []
+    for name, rows, header in outputs:
+        path = reports_dir / name
+        _write_csv(rows, path, header)
+        paths.append(path)
+    return paths
+
+def reconcile_folder(
+    folder: str,
+    log_fn: LogFn = None,
+    ret_folder: Optional[str] = None,
+    reports_dir=REPORTS_DIR,
+) -> ReconcileResult:
+    """Concilia facturas.json de folder con retenciones.json de ret_folder (o folder)."""
+    facturas    = load_records(folder, "facturas")
+    retenciones = load_records(ret_folder or folder, "retenciones")
+    result = reconcile(facturas, retenciones)
+    write_reports(result, reports_dir)
+    log = log_fn or print
+    log(
+        f"Conciliación: {len(result.matched)} emparejada(s), "
+        f"{len(result.unmatched_facturas)} factura(s) sin retención, "
+        f"{len(result.orphan_retenciones)} retención(es) huérfana(s), "
+        f"{len(result.totals_by_inst)} instalación(es)."
+    )
+    log(f"Reportes en: {reports_dir}")
+    return result
@@ -0,0 +1,64 @@
+# =============================
+# logic/xml_backend.py
+# =============================
+"""
+Backend de parseo XML intercambiable.
+
+Usa lxml (parser en C) si está instalado y ElementTree de la stdlib en caso
+contrario. Ambos exponen el mismo XMLPullParser (feed / read_events / close),
+por lo que los resultados de logic.xml_schema son idénticos con cualquiera.
+
+Selección: FACRET_XML_BACKEND = auto | lxml | etree (por defecto auto).
+set_backend() también actualiza la variable de entorno para que los procesos
+del pool de facs_manager usen el mismo backend.
+"""
+import os
+import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:
+    _lxml_etree = None
+
+ENV_VAR = "FACRET_XML_BACKEND"
+
+
+def available_backends() -> list:
+    return (["lxml"] if _lxml_etree is not None else []) + ["etree"]
+
+def _resolve(name: str) -> str:
+    name = (name or "auto").lower()
+    if name == "auto":
+        return available_backends()[0]
+    if name not in available_backends():
+        raise ValueError(f"Backend XML no disponible: {name}")
+    return name
+
+_backend = _resolve(os.environ.get(ENV_VAR, "auto"))
+
+
+def get_backend() -> str:
+    return _backend
+
+def set_backend(name: str) -> str:
+    global _backend
+    _backend = _resolve(name)
+    os.environ[ENV_VAR] = _backend
+    return _backend
+
+
+def pull_parser(tags=None):
+    """
+    Nuevo parser incremental con eventos start/end del backend activo.
+    tags: si se indica, lxml filtra en C y solo emite eventos de esos tags;
+    ElementTree no admite filtro y emite todos (el llamador ignora el resto).
+    """
+    if _backend == "lxml":
+        # Sin resolución de entidades ni red: igual que expat en ElementTree.
+        return _lxml_etree.XMLPullParser(
+            events=("start", "end"),
+            tag=list(tags) if tags else None,
+            resolve_entities=False,
+            no_network=True,
+        )
+    return ET.XMLPullParser(events=("start", "end"))
@@ -0,0 +1,186 @@
+# =============================
+# logic/xml_schema.py
+# =============================
+"""
+Registro declarativo de campos por tipo de comprobante del SRI y motor de
+extracción en una sola pasada.
+
+Cada tipo (factura, comprobanteRetencion, notaCredito, liquidacionCompra) se
+describe con FieldSpec. Al compilarse, los campos se indexan por tag, así que
+el recorrido cuesta una búsqueda en dict por elemento sin importar cuántos
+tipos o campos haya registrados. El tipo se reconoce por el elemento raíz del
+comprobante, también cuando viene dentro de <comprobante> (CDATA o escapado)
+en un XML de autorización. El parser lo provee logic.xml_backend (lxml o
+ElementTree).
+
+Para agregar un tipo nuevo basta con registrar su DocSchema en SCHEMAS.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from logic.xml_backend import pull_parser
+
+XML_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    name: str
+    tag: str
+    # Atributos que deben coincidir, p.ej. {"nombre": "Instalacion"}
+    attrs: Optional[Dict[str, str]] = None
+    required: bool = True
+
+
+@dataclass(frozen=True)
+class DocSchema:
+    doc_type: str          # tag raíz del comprobante
+    fields: Tuple[FieldSpec, ...]
+
+
+def _info_tributaria(*extra: FieldSpec) -> Tuple[FieldSpec, ...]:
+    return (
+        FieldSpec("estab", "estab"),
+        FieldSpec("ptoEmi", "ptoEmi"),
+        FieldSpec("secuencial", "secuencial"),
+        FieldSpec("fechaEmision", "fechaEmision", required=False),
+    ) + extra
+
+
+SCHEMAS: Dict[str, DocSchema] = {
+    schema.doc_type: schema
+    for schema in (
+        DocSchema("factura", _info_tributaria(
+            FieldSpec("totalSinImpuestos", "totalSinImpuestos"),
+            FieldSpec("instalacion", "campoAdicional", {"nombre": "Instalacion"}, required=False),
+        )),
+        DocSchema("comprobanteRetencion", _info_tributaria(
+            FieldSpec("valorRetenido", "valorRetenido"),
+            FieldSpec("numDocSustento", "numDocSustento"),
+        )),
+        DocSchema("notaCredito", _info_tributaria(
+            FieldSpec("numDocModificado", "numDocModificado"),
+            FieldSpec("totalSinImpuestos", "totalSinImpuestos"),
+            FieldSpec("valorModificacion", "valorModificacion"),
+        )),
+        DocSchema("liquidacionCompra", _info_tributaria(
+            FieldSpec("identificacionProveedor", "identificacionProveedor"),
+            FieldSpec("totalSinImpuestos", "totalSinImpuestos"),
+            FieldSpec("importeTotal", "importeTotal"),
+        )),
+    )
+}
+
+
+# ── Compilación ───────────────────────────────────────────────────────────────
+
+class CompiledSchema:
+    def __init__(self, schema: DocSchema):
+        self.doc_type = schema.doc_type
+        self.by_tag: Dict[str, list] = {}
+        for spec in schema.fields:
+            self.by_tag.setdefault(spec.tag, []).append(spec)
+        self.names    = tuple(spec.name for spec in schema.fields)
+        self.required = tuple(spec.name for spec in schema.fields if spec.required)
+
+
+_COMPILED: Dict[str, CompiledSchema] = {}
+
+# Tags que el recorrido necesita ver: raíces, envoltura y campos de todos los tipos.
+_RELEVANT_TAGS = frozenset(
+    set(SCHEMAS)
+    | {"comprobante"}
+    | {spec.tag for schema in SCHEMAS.values() for spec in schema.fields}
+)
+
+def compiled(doc_type: str) -> CompiledSchema:
+    if doc_type not in _COMPILED:
+        _COMPILED[doc_type] = CompiledSchema(SCHEMAS[doc_type])
+    return _COMPILED[doc_type]
+
+
+# ── Recorrido ─────────────────────────────────────────────────────────────────
+
+class _ScanState:
+    def __init__(self, expected: Optional[str]):
+        self.expected = expected
+        self.rooted = False
+        self.schema: Optional[CompiledSchema] = None
+        self.found: dict = {}
+        self.remaining = 0
+        # Con tipo esperado se busca desde el inicio: así también se leen los
+        # XML a los que clean_xml_files ya les quitó el elemento raíz.
+        if expected:
+            self._use(expected)
+
+    def _use(self, doc_type: str):
+        self.schema = compiled(doc_type)
+        self.remaining = len(self.schema.names) - len(self.found)
+
+    def begin(self, doc_type: str):
+        if self.expected and doc_type != self.expected:
+            raise ValueError(f"Se esperaba {self.expected}, el XML es {doc_type}")
+        self.rooted = True
+        if self.schema is None:
+            self._use(doc_type)
+
+    @property
+    def done(self) -> bool:
+        return self.schema is not None and self.remaining == 0
+
+    def match(self, elem):
+        for spec in self.schema.by_tag.get(elem.tag, ()):
+            if spec.name in self.found:
+                continue
+            if spec.attrs and any(elem.get(k) != v for k, v in spec.attrs.items()):
+                continue
+            self.found[spec.name] = elem.text
+            self.remaining -= 1
+
+
+def _drain_events(parser, state: _ScanState):
+    for event, elem in parser.read_events():
+        if event == "start":
+            if not state.rooted and elem.tag in SCHEMAS:
+                state.begin(elem.tag)
+            continue
+        if state.schema is not None:
+            state.match(elem)
+        # Comprobante autorizado: el documento real viene como texto (CDATA)
+        # dentro de <comprobante>; se analiza en el mismo recorrido.
+        if not state.rooted and elem.tag == "comprobante" and elem.text and "<" in elem.text:
+            inner = pull_parser(_RELEVANT_TAGS)
+            inner.feed(elem.text.strip().encode("utf-8"))
+            _drain_events(inner, state)
+        elem.clear()
+        if state.done:
+            return
+
+
+def extract_document(xml_file_path: str, expected: Optional[str] = None) -> Tuple[str, dict]:
+    """
+    Clasifica y extrae el comprobante en una sola pasada hacia adelante, sin
+    cargar el archivo completo; se detiene en cuanto están todos los campos.
+    Retorna (doc_type, campos); los campos opcionales ausentes quedan en None.
+    Lanza ValueError si el tipo no está registrado, no es el esperado o falta
+    algún campo obligatorio.
+    """
+    state  = _ScanState(expected)
+    parser = pull_parser(_RELEVANT_TAGS)
+    with open(xml_file_path, "rb") as f:
+        while not state.done:
+            chunk = f.read(XML_CHUNK_SIZE)
+            if not chunk:
+                # Fin del archivo: close() valida el documento (p.ej. truncado).
+                parser.close()
+                _drain_events(parser, state)
+                break
+            parser.feed(chunk)
+            _drain_events(parser, state)
+
+    if state.schema is None:
+        raise ValueError("Tipo de comprobante no reconocido")
+    missing = [name for name in state.schema.required if name not in state.found]
+    if missing:
+        raise ValueError(f"Campos no encontrados: {', '.join(missing)}")
+    return state.schema.doc_type, {name: state.found.get(name) for name in state.schema.names}
@@ -1 +1 @@
-from .models import Factura, Retencion
+from .models import Factura, FacturaTable, Retencion, RetencionTable
@@ -1,12 +1,249 @@
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Iterator, Optional
+
+
+def to_cents(value) -> int:
+    """'12.345' → 1235 (centavos, redondeo comercial)."""
+    return int((Decimal(str(value)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def cents_str(cents: int) -> str:
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+def date_key(fecha: Optional[str]) -> int:
+    """'dd/mm/aaaa' o 'aaaa-mm-dd' → aaaammdd (int). 0 si no viene o no se reconoce."""
+    if not fecha:
+        return 0
+    fecha = fecha.strip()
+    try:
+        if "/" in fecha:
+            d, m, y = fecha.split("/")
+        else:
+            y, m, d = fecha.split("-")
+        day = date(int(y), int(m), int(d))
+    except ValueError:
+        return 0
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+@dataclass(slots=True)
 class Factura:
-    def __init__(self, code_inst, number_fac, value_serv):
-        self.code_inst = code_inst
-        self.number_fac = number_fac
-        self.value_serv = value_serv
+    code_inst: str
+    number_fac: str
+    value_serv: str
+    fecha_emision: Optional[str] = None
+
+    @property
+    def value_cents(self) -> int:
+        return to_cents(self.value_serv)
 
+    def as_dict(self) -> dict:
+        return {
+            "code_inst":     self.code_inst,
+            "number_fac":    self.number_fac,
+            "value_serv":    self.value_serv,
+            "fecha_emision": self.fecha_emision,
+        }
 
+
+@dataclass(slots=True)
 class Retencion:
-    def __init__(self, ret_number, ret_value, fac_number):
-        self.ret_number = ret_number
-        self.ret_value = ret_value
-        self.fac_number = fac_number
+    ret_number: str
+    ret_value: str
+    fac_number: str
+    fecha_emision: Optional[str] = None
+
+    @property
+    def value_cents(self) -> int:
+        return to_cents(self.ret_value)
+
+    def as_dict(self) -> dict:
+        return {
+            "ret_number":    self.ret_number,
+            "ret_value":     self.ret_value,
+            "fac_number":    self.fac_number,
+            "fecha_emision": self.fecha_emision,
+        }
+
+
+# ── Contenedores columnares ───────────────────────────────────────────────────
+# Un año de facturas como objetos sueltos cuesta un objeto + 4 strings por
+# registro. Las tablas guardan cada campo en un array tipado: montos en
+# centavos (int64), fechas como aaaammdd (int32) y los textos repetidos
+# (code_inst, prefijos FAC+estab+ptoEmi) como códigos de diccionario con el
+# texto internado una sola vez. Los secuenciales de 9 dígitos se guardan como
+# enteros y se reconstruyen al leer.
+
+_SEQ_DIGITS = 9
+
+
+class _Interned:
+    """Diccionario texto ↔ código int32."""
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self):
+        self.codes: dict = {}
+        self.values: list = []
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            value = sys.intern(value)
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _Numbers:
+    """Números de comprobante partidos en prefijo internado + secuencial entero."""
+
+    __slots__ = ("prefix", "prefixes", "seq")
+
+    def __init__(self):
+        self.prefixes = _Interned()
+        self.prefix = array("i")
+        self.seq = array("q")
+
+    def append(self, number: str):
+        tail = number[-_SEQ_DIGITS:]
+        if len(number) > _SEQ_DIGITS and tail.isdigit() and tail.isascii():
+            self.prefix.append(self.prefixes.code(number[:-_SEQ_DIGITS]))
+            self.seq.append(int(tail))
+        else:
+            self.prefix.append(self.prefixes.code(number))
+            self.seq.append(-1)
+
+    def __getitem__(self, i: int) -> str:
+        prefix = self.prefixes.values[self.prefix[i]]
+        seq = self.seq[i]
+        return prefix if seq < 0 else f"{prefix}{seq:0{_SEQ_DIGITS}d}"
+
+    def nbytes(self) -> int:
+        return self.prefix.itemsize * len(self.prefix) + self.seq.itemsize * len(self.seq)
+
+
+def _fecha_str(key: int) -> Optional[str]:
+    if not key:
+        return None
+    return f"{key % 100:02d}/{key // 100 % 100:02d}/{key // 10000}"
+
+
+class _Table:
+    _numpy_columns: tuple = ()
+
+    def __len__(self):
+        return len(self.cents)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def extend(self, items: Iterable):
+        for item in items:
+            self.append(item)
+        return self
+
+    def records(self) -> Iterator[dict]:
+        """Registros como dicts (misma forma que fac_record / ret_record)."""
+        for item in self:
+            yield item.as_dict()
+
+    def total_cents(self) -> int:
+        return sum(self.cents)
+
+    def to_numpy(self) -> dict:
+        """Vistas NumPy sin copia de las columnas numéricas (requiere numpy)."""
+        import numpy as np
+
+        out = {}
+        for name in self._numpy_columns:
+            buf = getattr(self, name)
+            dtype = np.int64 if buf.typecode == "q" else np.int32
+            out[name] = np.frombuffer(buf, dtype=dtype) if len(buf) else np.empty(0, dtype)
+        return out
+
+
+class FacturaTable(_Table):
+    """
+    Facturas en columnas. Columnas numéricas: inst (código de code_inst),
+    cents, fecha (aaaammdd); institutions.values traduce inst → code_inst.
+    """
+
+    _numpy_columns = ("inst", "cents", "fecha")
+
+    def __init__(self, items: Iterable = ()):
+        self.institutions = _Interned()
+        self.inst = array("i")
+        self.numbers = _Numbers()
+        self.cents = array("q")
+        self.fecha = array("i")
+        self.extend(items)
+
+    def append(self, item):
+        """Acepta un Factura o un dict de fac_record."""
+        if isinstance(item, dict):
+            item = Factura(item["code_inst"], item["number_fac"], item["value_serv"],
+                           item.get("fecha_emision"))
+        self.append_raw(item.code_inst, item.number_fac, item.value_cents, date_key(item.fecha_emision))
+
+    def append_raw(self, code_inst: str, number_fac: str, cents: int, fecha: int):
+        self.inst.append(self.institutions.code(code_inst))
+        self.numbers.append(number_fac)
+        self.cents.append(cents)
+        self.fecha.append(fecha)
+
+    def __getitem__(self, i: int) -> Factura:
+        return Factura(
+            self.institutions.values[self.inst[i]],
+            self.numbers[i],
+            cents_str(self.cents[i]),
+            _fecha_str(self.fecha[i]),
+        )
+
+    def nbytes(self) -> int:
+        cols = (self.inst, self.cents, self.fecha)
+        return sum(c.itemsize * len(c) for c in cols) + self.numbers.nbytes()
+
+
+class RetencionTable(_Table):
+    """Retenciones en columnas: cents, fecha (aaaammdd) y ambos números partidos."""
+
+    _numpy_columns = ("cents", "fecha")
+
+    def __init__(self, items: Iterable = ()):
+        self.numbers = _Numbers()
+        self.fac_numbers = _Numbers()
+        self.cents = array("q")
+        self.fecha = array("i")
+        self.extend(items)
+
+    def append(self, item):
+        """Acepta un Retencion o un dict de ret_record."""
+        if isinstance(item, dict):
+            item = Retencion(item["ret_number"], item["ret_value"], item["fac_number"],
+                             item.get("fecha_emision"))
+        self.append_raw(item.ret_number, item.fac_number, item.value_cents, date_key(item.fecha_emision))
+
+    def append_raw(self, ret_number: str, fac_number: str, cents: int, fecha: int):
+        self.numbers.append(ret_number)
+        self.fac_numbers.append(fac_number)
+        self.cents.append(cents)
+        self.fecha.append(fecha)
+
+    def __getitem__(self, i: int) -> Retencion:
+        return Retencion(
+            self.numbers[i],
+            cents_str(self.cents[i]),
+            self.fac_numbers[i],
+            _fecha_str(self.fecha[i]),
+        )
+
+    def nbytes(self) -> int:
+        cols = (self.cents, self.fecha)
+        return (sum(c.itemsize * len(c) for c in cols)
+                + self.numbers.nbytes() + self.fac_numbers.nbytes())
@@ -14,6 +14,7 @@ _DEFAULT_CONFIG = {
     "correo_remitente":    "info@comunicados-etapa.com",
     "correo_destinatario": "csigua@emov.gob.ec",
     "carpeta_guardar":     "D:\\Facturas_ETAPA",
+    "procesar":            True,
 }
 
 
@@ -50,6 +51,12 @@ class FacsDownloaderPage:
             text_size=13,
             expand=True,
         )
+        self._cb_procesar = ft.Checkbox(
+            label="Procesar al descargar (quitar prefijo, renombrar con XML e indexar)",
+            value=self._config.get("procesar", True),
+            active_color=DriveTheme.PRIMARY_BLUE,
+            label_style=ft.TextStyle(size=12, color=DriveTheme.GREY_800),
+        )
 
         self._log_column = ft.Column(
             controls=[],
@@ -126,6 +133,7 @@ class FacsDownloaderPage:
                 self._build_field("Correo del remitente (From)",     "Ej: info@comunicados-etapa.com",   ft.Icons.ALTERNATE_EMAIL,   self._tf_remitente),
                 self._build_field("Correo del destinatario (To)",    "Ej: csigua@emov.gob.ec",           ft.Icons.PERSON_OUTLINE,    self._tf_destinatario),
                 self._build_field("Carpeta de descarga local",       "Ej: D:\\Facturas_ETAPA",            ft.Icons.SAVE_ALT,          self._tf_guardar),
+                self._cb_procesar,
             ], spacing=0),
             **DriveTheme.get_card_style(),
             padding=20,
@@ -200,6 +208,7 @@ class FacsDownloaderPage:
             "correo_remitente":    self._tf_remitente.value,
             "correo_destinatario": self._tf_destinatario.value,
             "carpeta_guardar":     self._tf_guardar.value,
+            "procesar":            self._cb_procesar.value,
         }
         _CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
         with open(_CONFIG_PATH, "w", encoding="utf-8") as f:
@@ -217,11 +226,15 @@ class FacsDownloaderPage:
         try:
             from logic.facs_downloader import DescargadorFacturas
             descargador = DescargadorFacturas(log_callback=self._log)
-            descargador.descargar_facturas_etapa(
+            options = dict(
                 carpeta_outlook=self._tf_outlook.value,
-                carpeta_guardar=self._tf_guardar.value,
                 correo_remitente=self._tf_remitente.value,
             )
+            if self._cb_procesar.value:
+                from logic.ingest import download_and_ingest
+                download_and_ingest(descargador, self._tf_guardar.value, self._log, **options)
+            else:
+                descargador.descargar_facturas_etapa(carpeta_guardar=self._tf_guardar.value, **options)
         except Exception as ex:
             self._log(f"Error: {ex}")
         finally:
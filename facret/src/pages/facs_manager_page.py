@@ -4,7 +4,10 @@
 import flet as ft
 import threading
 from config.theme import AppTheme as T
+from logic import analytics
 from logic import facs_manager as fm
+from logic import parse_cache
+from logic import reconcile
 
 
 # ── Definición de acciones ─────────────────────────────────────────────────────
@@ -41,23 +44,51 @@ ACTIONS = [
     {
         "key":   "rename",
         "label": "Renombrar con XML",
-        "desc":  "Renombra pares XML+PDF usando los atributos del XML (estab, ptoEmi, secuencial, instalación).",
+        "desc":  "Renombra pares XML+PDF usando los atributos del XML (estab, ptoEmi, secuencial, instalación). Planifica y detecta colisiones antes de tocar archivos.",
         "icon":  ft.Icons.DRIVE_FILE_RENAME_OUTLINE,
-        "fn":    lambda folder, log: fm.rename_files_with_attributes(folder, log),
+        "fn":    lambda folder, log: fm.rename_files_with_attributes(folder, log, workers=0),
+    },
+    {
+        "key":   "rename_undo",
+        "label": "Revertir renombrado incompleto",
+        "desc":  "Si un renombrado se interrumpió, restaura los nombres originales usando su journal.",
+        "icon":  ft.Icons.UNDO_OUTLINED,
+        "fn":    lambda folder, log: fm.rollback_renames(folder, log),
     },
     {
         "key":   "proc_fac",
         "label": "Procesar facturas XML",
-        "desc":  "Lee todos los XMLs de facturas y genera facturas.json + facturas.csv ordenados por código.",
+        "desc":  "Lee los XMLs de facturas (reutiliza la caché si no cambiaron) y genera facturas.json + facturas.csv ordenados por código.",
         "icon":  ft.Icons.RECEIPT_LONG_OUTLINED,
-        "fn":    lambda folder, log: fm.process_all_xml_facs(folder, log),
+        "fn":    lambda folder, log: fm.process_all_xml_facs(folder, log, workers=0, use_cache=True, columnar=True, store=True),
     },
     {
         "key":   "proc_ret",
         "label": "Procesar retenciones XML",
-        "desc":  "Limpia y procesa XMLs de retenciones. Genera retenciones.json + retenciones.csv.",
+        "desc":  "Procesa XMLs de retenciones sin modificar los originales. Genera retenciones.json + retenciones.csv.",
         "icon":  ft.Icons.DESCRIPTION_OUTLINED,
-        "fn":    lambda folder, log: fm.process_all_xml_rets(folder, log),
+        "fn":    lambda folder, log: fm.process_all_xml_rets(folder, log, workers=0, use_cache=True, columnar=True, store=True),
+    },
+    {
+        "key":   "reconcile",
+        "label": "Conciliar facturas y retenciones",
+        "desc":  "Cruza facturas.json con retenciones.json de la carpeta. Genera reportes en data/exports/reports.",
+        "icon":  ft.Icons.COMPARE_ARROWS_OUTLINED,
+        "fn":    lambda folder, log: reconcile.reconcile_folder(folder, log),
+    },
+    {
+        "key":   "analytics",
+        "label": "Analizar consumo por instalación",
+        "desc":  "Arma la matriz instalación × mes con las facturas procesadas y marca picos, caídas y meses sin factura. Genera reportes en data/exports/reports.",
+        "icon":  ft.Icons.INSIGHTS_OUTLINED,
+        "fn":    lambda folder, log: analytics.analyze_store(log),
+    },
+    {
+        "key":   "cache_reset",
+        "label": "Invalidar caché XML",
+        "desc":  "Descarta los registros cacheados de la carpeta. El próximo procesamiento re-analiza todos los XML.",
+        "icon":  ft.Icons.CACHED_OUTLINED,
+        "fn":    lambda folder, log: parse_cache.invalidate_folder_cache(folder, log),
     },
 ]
 
@@ -2,23 +2,34 @@
 # pages/home_page.py
 # =============================
 import flet as ft
+import sqlite3
 from config.theme import AppTheme as T
+from logic import dashboard
+from logic.facs_manager import _log
 
 
 # ── Datos del dashboard ────────────────────────────────────────────────────────
-# Cuando los modelos Factura/Retencion estén conectados, reemplaza estos valores
-# con llamadas a la capa logic/ o a una función de resumen del modelo.
+# Los valores salen de los agregados persistidos (logic/dashboard.py), que se
+# actualizan al procesar/descargar; abrir la página no re-escanea carpetas.
 def _get_stats() -> dict:
-    return {
-        "facturas":        0,
-        "retenciones":     0,
-        "ultima_descarga": "—",
-        "carpeta":         "—",
-    }
+    try:
+        return dashboard.dashboard_stats()
+    except (sqlite3.Error, OSError) as e:
+        _log(f"Dashboard: no se pudieron leer los totales: {e}", None)
+        return {
+            "facturas":        0,
+            "retenciones":     0,
+            "ultima_descarga": "—",
+            "carpeta":         "—",
+        }
 
 def _get_recent() -> list:
-    # Retornará lista de dicts con keys: nombre, tipo, fecha
-    return []
+    # Lista de dicts con keys: nombre, tipo, fecha
+    try:
+        return dashboard.recent_documents()
+    except (sqlite3.Error, OSError) as e:
+        _log(f"Dashboard: no se pudieron leer los documentos recientes: {e}", None)
+        return []
 
 
 class HomePage:
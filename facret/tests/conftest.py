@@ -0,0 +1,28 @@
+# =============================
+# tests/conftest.py
+# =============================
+"""
+Pruebas de logic/ (desde facret/):
+    poetry run python -m pytest -q tests
+
+Los módulos se importan como en la app (from logic.x import ...); las
+pruebas nunca usan las rutas por defecto de data/exports.
+"""
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "src"))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "bench"))
+
+import pytest  # noqa: E402
+
+from sri_corpus import generate_corpus  # noqa: E402
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Corpus SRI sintético chico (bench/sri_corpus.py): facturas/ y retenciones/."""
+    dest = tmp_path / "corpus"
+    generate_corpus(str(dest), facturas=60, duplicates=0, pdf_bytes=256)
+    return dest
@@ -0,0 +1,16 @@
+# =============================
+# tests/test_analytics.py
+# =============================
+import sys
+
+import pytest
+
+from logic import analytics
+
+
+def test_missing_numpy_is_reported_clearly(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)   # import numpy → ImportError
+    with pytest.raises(RuntimeError, match="poetry install -E analytics"):
+        analytics.analyze_store(lambda _m: None, db_path=tmp_path / "facret.sqlite",
+                                reports_dir=tmp_path / "reports")
+    assert not (tmp_path / "facret.sqlite").exists()
@@ -0,0 +1,22 @@
+# =============================
+# tests/test_columnar.py
+# =============================
+import pytest
+
+from logic.columnar import FACTURA_COLUMNS, ColumnCollector, load_columns
+
+np = pytest.importorskip("numpy")
+
+
+def test_dictionary_column_round_trip(tmp_path):
+    records = [
+        {"code_inst": code, "number_fac": f"FAC{i:03d}", "value_serv": f"{i}.5{i % 10}"}
+        for i, code in enumerate(["100", "200", "100", "300", "200"])
+    ]
+    collector = ColumnCollector(FACTURA_COLUMNS)
+    assert list(collector.tap(records)) == records
+    table = load_columns(collector.write(str(tmp_path / "facturas")))
+
+    assert list(table.dictionaries["code_inst"]) == ["100", "200", "300"]
+    assert list(table.decoded("code_inst")) == [r["code_inst"] for r in records]
+    assert list(table["value_serv"]) == [50, 151, 252, 353, 454]
@@ -0,0 +1,65 @@
+# =============================
+# tests/test_download_ledger.py
+# =============================
+import sqlite3
+
+import pytest
+
+from fake_outlook import DEFAULT_FOLDER, DEFAULT_SENDER, FakeOutlook
+from logic import facs_downloader
+from logic.download_state import DownloadState
+from logic.mail_sources import OutlookSource
+
+
+@pytest.fixture
+def download(tmp_path, monkeypatch):
+    monkeypatch.setattr(facs_downloader, "record_download", lambda *a: None)
+    outlook = FakeOutlook.generate(messages=3, sender_ratio=1.0, extra_attachments=0.0, attachment_bytes=64)
+    source = OutlookSource(outlook, log_fn=lambda _m: None)
+    descargador = facs_downloader.DescargadorFacturas(lambda _m: None, state_path=tmp_path / "downloads.sqlite",
+                                                     source=source)
+
+    def run(dest, incremental=False):
+        return descargador.descargar_facturas_etapa(DEFAULT_FOLDER, str(dest), DEFAULT_SENDER,
+                                                    incremental=incremental)
+    return run
+
+
+def test_new_destination_downloads_again(tmp_path, download):
+    assert download(tmp_path / "a") == 6
+    assert download(tmp_path / "a") == 0
+    assert download(tmp_path / "b") == 6
+    assert sorted(p.name for p in (tmp_path / "a").iterdir()) == sorted(p.name for p in (tmp_path / "b").iterdir())
+
+
+def test_deleted_file_is_downloaded_again(tmp_path, download):
+    assert download(tmp_path / "a") == 6
+    victim = sorted((tmp_path / "a").glob("*.xml"))[0]
+    victim.unlink()
+    assert download(tmp_path / "a") == 1
+    assert victim.exists()
+
+
+def test_legacy_ledger_is_migrated(tmp_path):
+    path = tmp_path / "downloads.sqlite"
+    saved = tmp_path / "a" / "f.xml"
+    saved.parent.mkdir()
+    saved.write_bytes(b"<f/>")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE attachments (source TEXT NOT NULL, entry_id TEXT NOT NULL, att_index INTEGER NOT NULL,
+            sha256 TEXT NOT NULL, filename TEXT NOT NULL, saved_as TEXT, downloaded_at TEXT NOT NULL,
+            PRIMARY KEY (source, entry_id, att_index));
+        CREATE TABLE messages (source TEXT NOT NULL, entry_id TEXT NOT NULL, attachments INTEGER NOT NULL,
+            processed_at TEXT NOT NULL, PRIMARY KEY (source, entry_id));
+    """)
+    conn.execute("INSERT INTO attachments VALUES ('eml', 'm1', 1, 'h', 'f.xml', ?, 'x')", (str(saved),))
+    conn.execute("INSERT INTO messages VALUES ('eml', 'm1', 1, 'x')")
+    conn.commit()
+    conn.close()
+
+    with DownloadState(path) as state:
+        assert state.seen_attachment("eml", "m1", 1, str(saved.parent))
+        assert state.processed_message("eml", "m1", str(saved.parent)) == 1
+        assert state.processed_message("eml", "m1", str(tmp_path / "b")) is None
+        assert state.saved_with_hash("h", str(saved.parent)) == str(saved)
@@ -0,0 +1,30 @@
+# =============================
+# tests/test_download_place.py
+# =============================
+from logic.download_state import DownloadState
+from logic.facs_downloader import DescargadorFacturas
+from logic.facs_manager import get_file_hash
+
+
+def _tmp(folder, content: bytes):
+    path = folder / ".descarga_x.partial"
+    path.write_bytes(content)
+    return str(path), get_file_hash(str(path))
+
+
+def test_hash_suffixed_file_is_reused_only_with_same_content(tmp_path):
+    dest = tmp_path / "descargas"
+    dest.mkdir()
+    (dest / "f.xml").write_bytes(b"A")
+    with DownloadState(tmp_path / "downloads.sqlite") as state:
+        tmp, digest = _tmp(tmp_path, b"B")
+        suffixed = dest / f"f_{digest[:8]}.xml"
+        suffixed.write_bytes(b"otro contenido")
+
+        path, new = DescargadorFacturas._place(tmp, "f.xml", digest, str(dest), state)
+        assert new and path == str(dest / f"f_{digest[:8]}_2.xml")
+        assert (dest / f"f_{digest[:8]}_2.xml").read_bytes() == b"B"
+        assert suffixed.read_bytes() == b"otro contenido"
+
+        tmp, digest = _tmp(tmp_path, b"B")
+        assert DescargadorFacturas._place(tmp, "f.xml", digest, str(dest), state) == (path, False)
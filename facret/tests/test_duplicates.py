@@ -0,0 +1,92 @@
+# =============================
+# tests/test_duplicates.py
+# =============================
+import os
+import time
+
+import pytest
+
+from logic import facs_manager
+from logic.facs_manager import PARTIAL_HASH_BYTES, find_duplicate_groups, remove_duplicate_files
+
+BLOCK = PARTIAL_HASH_BYTES
+
+
+def _write(folder, name, data: bytes):
+    path = folder / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Registra qué archivos pasan por el hash parcial y por el completo."""
+    calls = {"partial": [], "full": []}
+    partial_hash, file_hash = facs_manager.get_partial_hash, facs_manager.get_file_hash
+
+    def partial(path, *args, **kwargs):
+        calls["partial"].append(os.path.basename(path))
+        return partial_hash(path, *args, **kwargs)
+
+    def full(path, *args, **kwargs):
+        calls["full"].append(os.path.basename(path))
+        return file_hash(path, *args, **kwargs)
+
+    monkeypatch.setattr(facs_manager, "get_partial_hash", partial)
+    monkeypatch.setattr(facs_manager, "get_file_hash", full)
+    return calls
+
+
+def test_unique_size_is_never_hashed(tmp_path, hashed):
+    _write(tmp_path, "a.pdf", b"x" * 100)
+    _write(tmp_path, "b.pdf", b"x" * 100)
+    _write(tmp_path, "unico.pdf", b"x" * 101)
+
+    remove_duplicate_files(str(tmp_path), lambda _m: None)
+
+    assert "unico.pdf" not in hashed["partial"] + hashed["full"]
+    assert (tmp_path / "unico.pdf").exists()
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_same_head_different_tail_is_kept(tmp_path, hashed):
+    # Menos de 2 bloques: el hash parcial cubre el archivo completo.
+    head = b"h" * BLOCK
+    _write(tmp_path, "a.pdf", head + b"cola-1")
+    _write(tmp_path, "b.pdf", head + b"cola-2")
+
+    assert find_duplicate_groups(str(tmp_path), lambda _m: None) == []
+    remove_duplicate_files(str(tmp_path), lambda _m: None)
+    assert sorted(os.listdir(tmp_path)) == ["a.pdf", "b.pdf"]
+    assert hashed["full"] == []
+
+
+def test_large_files_go_through_the_full_hash(tmp_path, hashed):
+    # Mismos extremos; solo el medio distingue a "distinto.pdf".
+    head, tail = b"h" * BLOCK, b"t" * BLOCK
+    body = b"m" * (3 * BLOCK)
+    _write(tmp_path, "a.pdf", head + body + tail)
+    _write(tmp_path, "b.pdf", head + body + tail)
+    _write(tmp_path, "distinto.pdf", head + b"M" + body[1:] + tail)
+
+    groups = find_duplicate_groups(str(tmp_path), lambda _m: None)
+    assert [sorted(os.path.basename(p) for p, _ in g) for g in groups] == [["a.pdf", "b.pdf"]]
+    assert sorted(hashed["full"]) == ["a.pdf", "b.pdf", "distinto.pdf"]
+
+    remove_duplicate_files(str(tmp_path), lambda _m: None)
+    assert (tmp_path / "distinto.pdf").exists()
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_keeps_the_oldest_ctime(tmp_path):
+    data = b"d" * (3 * BLOCK)
+    # El más antiguo no es el primero por nombre.
+    oldest = _write(tmp_path, "z.pdf", data)
+    time.sleep(0.01)
+    _write(tmp_path, "a.pdf", data)
+    time.sleep(0.01)
+    _write(tmp_path, "m.pdf", data)
+    assert os.stat(oldest).st_ctime < os.stat(tmp_path / "a.pdf").st_ctime
+
+    remove_duplicate_files(str(tmp_path), lambda _m: None)
+    assert os.listdir(tmp_path) == ["z.pdf"]
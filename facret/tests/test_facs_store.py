@@ -0,0 +1,52 @@
+# =============================
+# tests/test_facs_store.py
+# =============================
+from logic.facs_store import FacsStore
+
+
+def test_amounts_are_formatted_from_cents(tmp_path):
+    folder = str(tmp_path)
+    value = "12345678901234567.89"   # no entra exacto en un float
+    with FacsStore(tmp_path / "facret.sqlite") as db:
+        db.upsert("fac", [{"number_fac": "FAC1", "code_inst": "100", "value_serv": value,
+                           "fecha_emision": "01/02/2024"}], folder)
+        db.upsert("ret", [{"ret_number": "R1", "fac_number": "FAC1", "ret_value": "0.29",
+                           "fecha_emision": "01/02/2024"}], folder)
+        assert [r["value_serv"] for r in db.records("fac", folder)] == [value]
+        assert db.facturas_by_inst("100")[0]["value_serv"] == value
+        assert db.retenciones_for("FAC1")[0]["ret_value"] == "0.29"
+
+
+def _fac(number, value, fecha, inst="100"):
+    return {"number_fac": number, "code_inst": inst, "value_serv": value, "fecha_emision": fecha}
+
+
+def _assert_aggregates(db, expected):
+    """count / monthly_totals (triggers) == lo esperado == rebuild_aggregates()."""
+    by_triggers = (db.count("fac"), db.monthly_totals("fac"), db.count("ret"), db.monthly_totals("ret"))
+    assert by_triggers[:2] == expected
+    db.rebuild_aggregates()
+    assert (db.count("fac"), db.monthly_totals("fac"), db.count("ret"), db.monthly_totals("ret")) == by_triggers
+
+
+def test_triggers_keep_aggregates_in_sync(tmp_path):
+    folder = tmp_path / "facturas"
+    with FacsStore(tmp_path / "facret.sqlite") as db:
+        db.upsert("fac", [_fac("FAC1", "10.00", "05/01/2024"), _fac("FAC2", "2.50", "20/01/2024"),
+                          _fac("FAC3", "1.00", None)], str(folder))
+        db.upsert("ret", [{"ret_number": "R1", "fac_number": "FAC1", "ret_value": "0.30",
+                           "fecha_emision": "06/01/2024"}], str(folder))
+        _assert_aggregates(db, (3, [("", 1, 100), ("2024-01", 2, 1250)]))
+
+        # Re-upsert: cambia monto y mes; sale de enero y entra en febrero.
+        db.upsert("fac", [_fac("FAC2", "7.25", "01/02/2024")], str(folder))
+        _assert_aggregates(db, (3, [("", 1, 100), ("2024-01", 1, 1000), ("2024-02", 1, 725)]))
+
+        assert db.delete("fac", ["FAC1"]) == 1
+        _assert_aggregates(db, (2, [("", 1, 100), ("2024-02", 1, 725)]))
+
+        # FAC3 ya no aparece en la carpeta: prune la borra.
+        list(db.tap("fac", [_fac("FAC2", "7.25", "01/02/2024"), _fac("FAC4", "3.00", "15/03/2024")],
+                    str(folder), prune=True))
+        _assert_aggregates(db, (2, [("2024-02", 1, 725), ("2024-03", 1, 300)]))
+        assert sorted(r["number_fac"] for r in db.records("fac", str(folder))) == ["FAC2", "FAC4"]
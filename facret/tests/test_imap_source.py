@@ -0,0 +1,48 @@
+# =============================
+# tests/test_imap_source.py
+# =============================
+from datetime import datetime, timedelta
+
+from fake_imap import DEFAULT_MAILBOX, DEFAULT_SENDER, FakeImapServer
+from logic import facs_downloader
+from logic.download_state import DownloadState
+from logic.mail_sources import ImapSource
+
+
+def test_batch_fetches_only_messages_to_open(tmp_path, monkeypatch):
+    monkeypatch.setattr(facs_downloader, "record_download", lambda *a: None)
+    t0 = datetime(2024, 3, 1, 8, 0)
+    with FakeImapServer() as server:
+        mails = [
+            ("<m1@x>", [("m1.xml", b"<f>1</f>"), ("m1.pdf", b"%PDF-1")]),
+            ("<m2@x>", []),                                 # sin adjuntos
+            ("<m3@x>", [("m3.xml", b"<f>3</f>"), ("m3.pdf", b"%PDF-3")]),   # ya procesado
+            ("<m4@x>", [("logo.png", b"\x89PNG")]),         # sin XML/PDF
+        ]
+        for i, (message_id, files) in enumerate(mails):
+            server.add_message(DEFAULT_MAILBOX, DEFAULT_SENDER, f"Correo {i}", t0 + timedelta(minutes=i),
+                               files, message_id=message_id)
+
+        source = ImapSource("127.0.0.1", server.user, server.password, port=server.port, ssl=False)
+        state_path, dest = tmp_path / "downloads.sqlite", tmp_path / "descargas"
+        with DownloadState(state_path) as state:
+            state.record_message(source.name, "m3@x", str(dest), 2)
+
+        fetches = []
+        uid = source._uid
+
+        def spy(command, *args):
+            if command == "FETCH" and "BODYSTRUCTURE" not in args[-1]:
+                fetches.append(args)
+            return uid(command, *args)
+
+        monkeypatch.setattr(source, "_uid", spy)
+        try:
+            descargador = facs_downloader.DescargadorFacturas(lambda _m: None, state_path=state_path, source=source)
+            assert descargador.descargar_facturas_etapa(carpeta_guardar=str(dest),
+                                                        correo_remitente=DEFAULT_SENDER) == 2
+        finally:
+            source.close()
+
+    assert fetches == [("1", "(UID BODY.PEEK[2] BODY.PEEK[3])")]
+    assert sorted(p.name for p in dest.iterdir()) == ["m1.pdf", "m1.xml"]
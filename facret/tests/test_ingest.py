@@ -0,0 +1,84 @@
+# =============================
+# tests/test_ingest.py
+# =============================
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from fake_outlook import DEFAULT_FOLDER, DEFAULT_SENDER, FakeOutlook
+from logic import facs_downloader
+from logic.download_state import DownloadState
+from logic.facs_manager import fac_record, get_file_hash, process_all_xml_facs
+from logic.facs_store import FacsStore
+from logic.ingest import IngestPipeline, download_and_ingest
+from logic.mail_sources import OutlookSource
+
+
+def test_export_order_matches_process_all(corpus, tmp_path):
+    folder = corpus / "facturas"
+    process_all_xml_facs(str(folder), lambda _m: None)
+    expected = (folder / "facturas.json").read_text()
+
+    records = [fac_record(str(p)) for p in sorted(folder.glob("*.xml"))]
+    assert len({r["code_inst"] for r in records}) < len(records)   # hay empates por code_inst
+    with FacsStore(tmp_path / "facret.sqlite") as db:
+        db.upsert("fac", reversed(records), str(folder))
+    with IngestPipeline(str(folder), lambda _m: None, db_path=tmp_path / "facret.sqlite",
+                        cache_path=tmp_path / "parse_cache.sqlite"):
+        pass
+    assert (folder / "facturas.json").read_text() == expected
+
+
+def test_download_error_is_not_hidden_by_close(tmp_path):
+    logs = []
+    with pytest.raises(RuntimeError, match="descarga"):
+        # db_path es una carpeta: la etapa del almacén falla y close() relanzaría.
+        with IngestPipeline(str(tmp_path), logs.append, db_path=tmp_path,
+                            cache_path=tmp_path / "parse_cache.sqlite"):
+            raise RuntimeError("descarga")
+    assert any("error al cerrar" in line for line in logs)
+
+    with pytest.raises(Exception) as info:
+        with IngestPipeline(str(tmp_path), logs.append, db_path=tmp_path,
+                            cache_path=tmp_path / "parse_cache.sqlite"):
+            pass
+    assert "descarga" not in str(info.value)
+
+
+def test_same_attachments_in_two_messages_after_rename(corpus, tmp_path, monkeypatch):
+    monkeypatch.setattr(facs_downloader, "record_download", lambda *a: None)
+    xml = next(p for p in sorted((corpus / "facturas").glob("*.xml")) if p.with_suffix(".pdf").exists())
+    record = fac_record(str(xml))
+    files = [(xml.name, xml.read_bytes()), (xml.with_suffix(".pdf").name, xml.with_suffix(".pdf").read_bytes())]
+    outlook = FakeOutlook()
+    t0 = datetime(2024, 3, 1, 8, 0)
+    outlook.add_message(DEFAULT_FOLDER, DEFAULT_SENDER, "m1", t0, files)
+    second = outlook.add_message(DEFAULT_FOLDER, DEFAULT_SENDER, "m2", t0 + timedelta(minutes=1), files)
+
+    dest = tmp_path / "descargas"
+    renamed = dest / f"{record['number_fac']}-{record['code_inst']}.xml"
+    attachment = second._attachments[0]
+    save = attachment.SaveAsFile
+
+    def save_after_rename(path):
+        # El segundo correo llega cuando la ingesta ya renombró el par del primero.
+        deadline = time.monotonic() + 5
+        while not renamed.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        save(path)
+
+    attachment.SaveAsFile = save_after_rename
+    source = OutlookSource(outlook, log_fn=lambda _m: None)
+    descargador = facs_downloader.DescargadorFacturas(lambda _m: None, state_path=tmp_path / "downloads.sqlite",
+                                                     source=source)
+    summary = download_and_ingest(descargador, str(dest), lambda _m: None, db_path=tmp_path / "facret.sqlite",
+                                  cache_path=tmp_path / "parse_cache.sqlite", carpeta_outlook=DEFAULT_FOLDER,
+                                  correo_remitente=DEFAULT_SENDER)
+
+    assert summary.renamed == 1 and not summary.problems
+    assert sorted(p.name for p in dest.iterdir() if not p.name.startswith("facturas.")) == [
+        renamed.with_suffix(".pdf").name, renamed.name,
+    ]
+    with DownloadState(tmp_path / "downloads.sqlite") as state:
+        assert state.saved_with_hash(get_file_hash(str(renamed)), str(dest)) == str(renamed)
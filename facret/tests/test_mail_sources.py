@@ -0,0 +1,121 @@
+# =============================
+# tests/test_mail_sources.py
+# =============================
+"""
+Separación MIME sobre bytes (_leaf_parts, MimeAttachment) y lectura de mbox
+(MboxSource), comparadas con lo que entrega el paquete email.
+"""
+import email
+import re
+from email import policy
+from email.message import EmailMessage
+
+from logic.download_state import SyncState
+from logic.mail_sources import MboxSource, MimeAttachment, _leaf_parts
+
+SENDER = "facturacion@proveedor.test"
+XML = '<?xml version="1.0"?>\n<factura>café = 1 + 1</factura>\n'.encode()
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 4
+
+
+def _message(message_id: str, body: str = "Adjuntamos su factura.") -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = f"Proveedor <{SENDER}>"
+    msg["To"] = "cliente@empresa.test"
+    msg["Subject"] = "Factura"
+    msg["Date"] = "Mon, 04 Mar 2024 10:15:00 -0500"
+    msg["Message-ID"] = f"<{message_id}>"
+    msg.set_content(body)
+    msg.add_alternative(f"<p>{body}</p>", subtype="html")
+    return msg
+
+
+def _nested(message_id: str = "nested@x", body: str = "Adjuntamos su factura.") -> EmailMessage:
+    """mixed → (alternative → text + html) + (mixed → XML quoted-printable) + PDF base64."""
+    msg = _message(message_id, body)
+    inner = EmailMessage()
+    inner.add_attachment(XML, maintype="application", subtype="xml", filename="factura.xml", cte="quoted-printable")
+    msg.make_mixed()
+    msg.attach(inner)
+    msg.add_attachment(PDF, maintype="application", subtype="pdf", filename="factura.pdf")
+    return msg
+
+
+def _leaves(raw: bytes, tmp_path) -> list:
+    """(content-type, contenido decodificado) de cada parte hoja, vía _leaf_parts."""
+    result = []
+    for i, (headers, body) in enumerate(_leaf_parts(raw)):
+        out = tmp_path / f"parte-{i}"
+        MimeAttachment(headers.get("Content-Transfer-Encoding"), body, "").SaveAsFile(str(out))
+        result.append((headers.get_content_type(), out.read_bytes()))
+    return result
+
+
+def _email_leaves(raw: bytes) -> list:
+    msg = email.message_from_bytes(raw, policy=policy.default)
+    return [(p.get_content_type(), p.get_payload(decode=True)) for p in msg.walk() if not p.is_multipart()]
+
+
+def test_nested_multipart_matches_email(tmp_path):
+    raw = _nested().as_bytes(policy=policy.default)
+    leaves = _leaves(raw, tmp_path)
+    assert [ct for ct, _ in leaves] == ["text/plain", "text/html", "application/xml", "application/pdf"]
+    assert leaves == _email_leaves(raw)
+    assert (XML, PDF) == (leaves[2][1], leaves[3][1])
+
+
+def test_crlf_eml_matches_email(tmp_path):
+    raw = _nested().as_bytes(policy=policy.SMTP)
+    assert b"\r\n" in raw and b"\n" not in raw.replace(b"\r\n", b"")
+    assert _leaves(raw, tmp_path) == _email_leaves(raw)
+
+
+def test_quoted_printable_and_base64_parts(tmp_path):
+    raw = _nested().as_bytes(policy=policy.default)
+    encodings = [h.get("Content-Transfer-Encoding") for h, _ in _leaf_parts(raw)]
+    assert encodings[2:] == ["quoted-printable", "base64"]
+    assert _leaves(raw, tmp_path)[2:] == [("application/xml", XML), ("application/pdf", PDF)]
+
+
+def _mboxrd(messages) -> bytes:
+    """mbox con escape mboxrd: un ">" más en cada línea ">*From "."""
+    out = []
+    for msg in messages:
+        raw = msg.as_bytes(policy=policy.default)
+        out.append(b"From " + SENDER.encode() + b" Mon Mar  4 10:15:00 2024\n")
+        out.append(re.sub(rb"^(>*From )", rb">\1", raw, flags=re.M))
+        out.append(b"\n")
+    return b"".join(out)
+
+
+def test_mbox_separators_and_from_unescaping(tmp_path):
+    body = "Adjuntamos su factura.\nFrom here on nothing splits.\n>From quoted stays quoted.\n"
+    originals = [_nested(f"m{i}@x", body) for i in range(3)]
+    mbox = tmp_path / "buzon.mbox"
+    mbox.write_bytes(_mboxrd(originals))
+    assert b"\n>From here" in mbox.read_bytes() and b"\n>>From quoted" in mbox.read_bytes()
+
+    found = list(MboxSource(str(mbox), lambda _m: None).messages("", SENDER, SyncState(), None))
+    assert [entry_id for _, entry_id, _ in found] == ["m0@x", "m1@x", "m2@x"]
+    for original, (_, _, message) in zip(originals, found):
+        raw = message._read_all()
+        parsed = email.message_from_bytes(raw, policy=policy.default)
+        assert parsed.get_body(("plain",)).get_content() == original.get_body(("plain",)).get_content()
+        assert _leaves(raw, tmp_path) == _email_leaves(original.as_bytes(policy=policy.default))
+        names = {a.FileName: a for a in message.Attachments}
+        assert sorted(names) == ["factura.pdf", "factura.xml"]
+        names["factura.xml"].SaveAsFile(str(tmp_path / "factura.xml"))
+        assert (tmp_path / "factura.xml").read_bytes() == XML
+
+
+def test_mbox_from_line_inside_a_paragraph_is_not_a_separator(tmp_path):
+    # mboxo sin escapar: solo un "From " tras una línea en blanco separa.
+    original = _nested("solo@x", "Adjuntamos su factura.\nFrom here on nothing splits.\n")
+    raw = original.as_bytes(policy=policy.default)
+    assert b"\nFrom here" in raw
+    mbox = tmp_path / "buzon.mbox"
+    mbox.write_bytes(b"From " + SENDER.encode() + b" Mon Mar  4 10:15:00 2024\n" + raw)
+
+    found = list(MboxSource(str(mbox), lambda _m: None).messages("", SENDER, SyncState(), None))
+    assert [entry_id for _, entry_id, _ in found] == ["solo@x"]
+    assert _leaves(found[0][2]._read_all(), tmp_path) == _email_leaves(raw)
@@ -0,0 +1,52 @@
+# =============================
+# tests/test_outlook_source.py
+# =============================
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from fake_outlook import DEFAULT_FOLDER, DEFAULT_SENDER, FakeOutlook
+from logic import facs_downloader
+from logic.mail_sources import OutlookSource, restrict_filter
+
+
+@pytest.fixture
+def guayaquil(monkeypatch):
+    # Hora local UTC-5: la marca de agua (local) debe llegar a Outlook en UTC.
+    monkeypatch.setenv("TZ", "America/Guayaquil")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_filter_is_dasl_with_utc_date(guayaquil):
+    dasl = restrict_filter("it's@x.com", datetime(2024, 3, 1, 23, 30, 59))
+    assert dasl == ("@SQL=\"http://schemas.microsoft.com/mapi/proptag/0x0C1F001F\" like '%it''s@x.com%'"
+                    " AND \"urn:schemas:httpmail:datereceived\" >= '2024-03-02 04:30'")
+
+
+@pytest.mark.parametrize("enumeration", ["table", "items"])
+def test_incremental_run_matches_sender_by_substring(tmp_path, monkeypatch, guayaquil, enumeration):
+    monkeypatch.setattr(facs_downloader, "record_download", lambda *a: None)
+    outlook = FakeOutlook()
+    t0 = datetime(2024, 3, 1, 22, 15)
+
+    def mail(sender, when, stem):
+        outlook.add_message(DEFAULT_FOLDER, sender, stem, when,
+                            [(f"{stem}.xml", stem.encode()), (f"{stem}.pdf", stem.encode() * 2)])
+
+    mail(DEFAULT_SENDER.upper(), t0, "a")
+    mail("ventas." + DEFAULT_SENDER, t0 + timedelta(minutes=5), "b")
+    mail("otro@example.com", t0 + timedelta(minutes=6), "c")
+
+    dest = tmp_path / "descargas"
+    source = OutlookSource(outlook, log_fn=lambda _m: None, enumeration=enumeration)
+    descargador = facs_downloader.DescargadorFacturas(lambda _m: None, state_path=tmp_path / "downloads.sqlite",
+                                                     source=source)
+    assert descargador.descargar_facturas_etapa(DEFAULT_FOLDER, str(dest), DEFAULT_SENDER) == 4
+
+    mail(DEFAULT_SENDER, t0 + timedelta(hours=3), "d")
+    assert descargador.descargar_facturas_etapa(DEFAULT_FOLDER, str(dest), DEFAULT_SENDER) == 2
+    assert sorted(p.name for p in dest.iterdir()) == ["a.pdf", "a.xml", "b.pdf", "b.xml", "d.pdf", "d.xml"]
@@ -0,0 +1,43 @@
+# =============================
+# tests/test_parallel_parse.py
+# =============================
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from logic import facs_manager
+from logic.facs_manager import process_all_xml_facs, process_all_xml_rets
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Baja los umbrales para que el corpus chico use el pool, en varios lotes."""
+    started = []
+
+    class CountingPool(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            started.append(kwargs.get("max_workers"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(facs_manager, "PARALLEL_MIN_FILES", 2)
+    monkeypatch.setattr(facs_manager, "PARSE_BATCH", 16)
+    monkeypatch.setattr(facs_manager, "ProcessPoolExecutor", CountingPool)
+    return started
+
+
+@pytest.mark.parametrize("kind", ["facturas", "retenciones"])
+def test_workers_produce_identical_exports(corpus, pools, kind):
+    folder = corpus / kind
+    (folder / "roto.xml").write_text("<factura>")   # el error no altera el orden del resto
+    process = process_all_xml_facs if kind == "facturas" else process_all_xml_rets
+
+    outputs = []
+    for workers in (1, 2):
+        logs = []
+        assert process(str(folder), logs.append, workers=workers) > 0
+        errors = [line for line in logs if "Error en" in line]
+        outputs.append(((folder / f"{kind}.json").read_bytes(), (folder / f"{kind}.csv").read_bytes(), errors))
+
+    assert pools == [2]
+    assert outputs[0] == outputs[1]
+    assert outputs[0][2] and "roto.xml" in outputs[0][2][0]
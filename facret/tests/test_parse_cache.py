@@ -0,0 +1,63 @@
+# =============================
+# tests/test_parse_cache.py
+# =============================
+import json
+
+from logic import facs_manager
+from logic.parse_cache import ParseCache
+
+
+def _export(folder) -> list:
+    return json.loads((folder / "facturas.json").read_text())
+
+
+def test_cached_path_matches_uncached_and_works_in_batches(corpus, tmp_path, monkeypatch):
+    folder = corpus / "facturas"
+    cache_path = tmp_path / "cache.sqlite"
+    facs_manager.process_all_xml_facs(str(folder), lambda m: None)
+    expected = _export(folder)
+
+    # Lotes chicos: ninguna consulta a la caché puede traer más de un lote.
+    monkeypatch.setattr(facs_manager, "PARSE_BATCH", 7)
+    sizes = []
+    load_paths = ParseCache.load_paths
+
+    def spy(self, kind, paths):
+        sizes.append(len(paths))
+        return load_paths(self, kind, paths)
+
+    monkeypatch.setattr(ParseCache, "load_paths", spy)
+
+    logs = []
+    for _ in range(2):   # en frío y con la caché completa
+        facs_manager.process_all_xml_facs(str(folder), logs.append, use_cache=True, cache_path=cache_path)
+        assert _export(folder) == expected
+    assert sizes and max(sizes) <= 7
+    assert "Caché: 60 acierto(s), 0 fallo(s)." in logs
+
+
+def test_cache_prunes_removed_files(corpus, tmp_path):
+    folder = corpus / "facturas"
+    cache_path = tmp_path / "cache.sqlite"
+    facs_manager.process_all_xml_facs(str(folder), lambda m: None, use_cache=True, cache_path=cache_path)
+    next(folder.glob("*.xml")).unlink()
+    facs_manager.process_all_xml_facs(str(folder), lambda m: None, use_cache=True, cache_path=cache_path)
+    with ParseCache(cache_path) as cache:
+        rows = cache._conn.execute("SELECT COUNT(*) FROM parsed").fetchone()[0]
+    assert rows == 59
+
+
+def test_file_removed_after_listing_is_reported_not_raised(corpus, tmp_path):
+    folder = corpus / "facturas"
+    cache_path = tmp_path / "cache.sqlite"
+    filenames = facs_manager.get_files_extension(str(folder), ".xml")
+    gone = filenames[3]
+    (folder / gone).unlink()            # entre el listado y la firma
+
+    logs = []
+    for _ in range(2):   # en frío y con la caché completa
+        records = facs_manager.parse_xml_records_cached(
+            str(folder), filenames, "fac", facs_manager.fac_record, log_fn=logs.append, cache_path=cache_path
+        )
+        assert len(records) == len(filenames) - 1
+    assert sum(f"Error en {gone}" in line for line in logs) == 2
@@ -0,0 +1,38 @@
+# =============================
+# tests/test_reconcile.py
+# =============================
+import csv
+import json
+import os
+
+from logic.facs_manager import fac_record, process_all_xml_facs, ret_record
+from logic.reconcile import load_records, reconcile, write_reports
+
+
+def test_write_reports_on_extracted_records(corpus, tmp_path):
+    facturas = [fac_record(str(p)) for p in sorted((corpus / "facturas").glob("*.xml"))]
+    retenciones = [ret_record(str(p)) for p in sorted((corpus / "retenciones").glob("*.xml"))]
+    assert "fecha_emision" in facturas[0]
+
+    result = reconcile(facturas, retenciones)
+    assert result.matched and result.unmatched_facturas
+    paths = write_reports(result, tmp_path / "reports")
+
+    with open(tmp_path / "reports" / "conciliacion_facturas_sin_retencion.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ["code_inst", "number_fac", "value_serv"]
+    assert len(rows) == len(result.unmatched_facturas)
+    assert all(path.exists() for path in paths)
+
+
+def test_load_records_prefers_the_newest_export(corpus):
+    folder = corpus / "facturas"
+    stale = folder / "facturas.json"
+    stale.write_text("[]")                      # de una corrida anterior
+    os.utime(stale, (1, 1))
+    process_all_xml_facs(str(folder), lambda _m: None, json_format="ndjson")
+    fresh = load_records(str(folder), "facturas")
+    assert fresh and fresh == [json.loads(line) for line in (folder / "facturas.ndjson").read_text().splitlines()]
+
+    stale.write_text("[]")                      # ahora el .json es el más nuevo
+    assert load_records(str(folder), "facturas") == []
@@ -0,0 +1,48 @@
+# =============================
+# tests/test_rename_journal.py
+# =============================
+import os
+
+import pytest
+
+from logic import facs_manager
+from logic.facs_manager import RENAME_JOURNAL, RenamePlan, apply_rename_plan, resume_renames, rollback_renames
+
+
+def _crash_after_first_rename(monkeypatch, tmp_path):
+    """Aplica un plan de dos pares y corta justo después del primer os.rename."""
+    for name in ("a.xml", "a.pdf", "b.xml", "b.pdf"):
+        (tmp_path / name).write_text(name)
+    plan = RenamePlan(
+        folder=str(tmp_path), pairs=2,
+        ops=[("a.xml", "A-1.xml"), ("a.pdf", "A-1.pdf"), ("b.xml", "B-2.xml"), ("b.pdf", "B-2.pdf")],
+    )
+    real_rename = os.rename
+
+    def rename_then_crash(src, dst):
+        real_rename(src, dst)
+        raise KeyboardInterrupt   # antes de escribir la línea "done"
+
+    monkeypatch.setattr(facs_manager.os, "rename", rename_then_crash)
+    with pytest.raises(KeyboardInterrupt):
+        apply_rename_plan(plan)
+    monkeypatch.setattr(facs_manager.os, "rename", real_rename)
+    assert (tmp_path / "A-1.xml").exists() and not (tmp_path / "a.xml").exists()
+    assert (tmp_path / RENAME_JOURNAL).exists()
+
+
+def _names(folder) -> set:
+    return {p.name for p in folder.iterdir()}
+
+
+def test_resume_after_crash_before_done_line(monkeypatch, tmp_path):
+    _crash_after_first_rename(monkeypatch, tmp_path)
+    assert resume_renames(str(tmp_path)) == 4
+    assert _names(tmp_path) == {"A-1.xml", "A-1.pdf", "B-2.xml", "B-2.pdf"}
+
+
+def test_rollback_after_crash_before_done_line(monkeypatch, tmp_path):
+    _crash_after_first_rename(monkeypatch, tmp_path)
+    assert rollback_renames(str(tmp_path)) == 1
+    assert _names(tmp_path) == {"a.xml", "a.pdf", "b.xml", "b.pdf"}
+    assert (tmp_path / "a.xml").read_text() == "a.xml"
@@ -0,0 +1,47 @@
+# =============================
+# tests/test_xml_backend.py
+# =============================
+import os
+
+import pytest
+
+from logic import xml_backend
+from logic.xml_backend import available_backends, get_backend, set_backend
+from logic.xml_schema import extract_document
+
+pytestmark = pytest.mark.skipif("lxml" not in available_backends(), reason="lxml no está instalado")
+
+
+@pytest.fixture
+def restore_backend(monkeypatch):
+    # set_backend también escribe la variable de entorno.
+    monkeypatch.setenv(xml_backend.ENV_VAR, os.environ.get(xml_backend.ENV_VAR, "auto"))
+    previous = get_backend()
+    yield
+    set_backend(previous)
+
+
+def _extract_all(paths: list) -> list:
+    results = []
+    for path in paths:
+        try:
+            results.append(extract_document(str(path)))
+        except Exception:
+            results.append("error")
+    return results
+
+
+def test_etree_and_lxml_extract_the_same(corpus, restore_backend):
+    paths = sorted((corpus / "facturas").glob("*.xml")) + sorted((corpus / "retenciones").glob("*.xml"))
+    truncated = corpus / "truncado.xml"
+    truncated.write_bytes(paths[0].read_bytes()[:400])
+    paths.append(truncated)
+
+    by_backend = {}
+    for name in ("etree", "lxml"):
+        assert set_backend(name) == name
+        by_backend[name] = _extract_all(paths)
+
+    assert by_backend["etree"] == by_backend["lxml"]
+    assert by_backend["etree"][-1] == "error"
+    assert {doc_type for doc_type, _ in by_backend["etree"][:-1]} == {"factura", "comprobanteRetencion"}